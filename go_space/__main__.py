@@ -0,0 +1,54 @@
+"""Command-line entry point: `python -m go_space <command> [args]`.
+
+Each command lives in its own module with a `main(argv)` function.  Modules are
+only imported once their command is chosen, so heavy dependencies (Keras,
+TensorFlow, sklearn, ...) are only loaded by the commands that need them.
+"""
+
+import argparse
+import importlib
+import sys
+from typing import List, Optional
+
+
+# Command name -> (module, description)
+COMMANDS = {
+    "benchmark": ("go_space.validation.benchmark", "Score embeddings on the classes"),
+    "build-nn-data": ("go_space.nn.build_nn_data", "Translate SGFs into training data"),
+    "build-tseumego": ("go_space.build_tseumego", "Embed and pickle tseumego problems"),
+    "export-model": ("go_space.nn.numpy_model", "Export a Keras model for NumPy inference"),
+    "load-test": ("go_space.load_harness", "Load test the web app locally"),
+    "nearest-neighbor": ("go_space.validation.nearest_neighbor", "Browse tseumego by neighbor"),
+    "page-benchmark": ("go_space.nn.page_benchmark", "Compare the data page formats"),
+    "pattern-search": ("go_space.pattern_lib", "Find boards containing a shape"),
+    "position-index": ("go_space.position_index", "Index and search corner positions in SGFs"),
+    "print-class": ("go_space.validation.print_class", "Print the boards in a class"),
+    "project": ("go_space.validation.projection", "Plot a t-SNE or UMAP of the embeddings"),
+    "train": ("go_space.nn.nn", "Train the corner-move model"),
+    "trajectory": ("go_space.trajectory", "Embed every position along a game"),
+    "tsne": ("go_space.validation.projection", "Same as project"),
+}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(
+        prog="go_space",
+        description="go-space tools",
+        epilog="\n".join(f"  {k:20} {v[1]}" for k, v in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS.keys(), metavar="command")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the command")
+    args = parser.parse_args(argv[:1])
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    # So that the command's own usage messages read "go_space <command>"
+    sys.argv[0] = f"go_space {args.command}"
+    module.main(argv[1:])
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ representing either a tsumego problem or a game at a point in time."""
 
 from typing import Iterator, Dict, List, Optional
 
+import numpy as np
+
 from go_space import consts, exceptions, go_types
 
 
@@ -64,9 +66,33 @@ class Board(object):
             result._grid[go_types.Point.from_dict(k)] = chonks[v]
         return result
 
+    @staticmethod
+    def from_array(array: np.ndarray) -> "Board":
+        """Rebuild from to_array output.
+
+        Chonks are found by flood fill on the bitboards, rather than by replaying
+        moves, so the array must not contain captured stones.
+        """
+        result = Board()
+        result._grid = go_types.Grid.from_array(array, groups=True)
+        return result
+
+    def to_bytes(self) -> bytes:
+        """See Grid.to_bytes."""
+        return self._grid.to_bytes()
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "Board":
+        result = Board()
+        result._grid = go_types.Grid.from_bytes(data)
+        return result
+
+    def __reduce__(self):
+        return Board.from_bytes, (self.to_bytes(),)
+
     def copy(self) -> "Board":
         """Deep copies"""
-        return Board.from_dict(self.to_dict())
+        return Board.from_array(self.to_array())
 
     def place(self, point: go_types.Point, player: go_types.Player) -> None:
         if point not in self._grid:
@@ -128,6 +154,15 @@ class Board(object):
         """Returns ASCII art for board"""
         return self._grid.ascii_board()
 
+    def to_array(self) -> np.ndarray:
+        """A (size, size) array of Player values, with 0 where empty."""
+        return self._grid.to_array()
+
+
+def stack_boards(boards: List[Board]) -> np.ndarray:
+    """Stacks boards into an (n, size, size) board tensor."""
+    return np.stack([brd.to_array() for brd in boards], axis=0)
+
 
 class MalformedJsonError(Exception):
     pass
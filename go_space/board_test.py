@@ -1,4 +1,5 @@
 import json
+import pickle
 import unittest
 import unittest.mock
 
@@ -129,3 +130,28 @@ class BoardTest(unittest.TestCase):
                 " ", ""
             ),
         )
+
+    def test_from_array(self):
+        board = board_lib.Board()
+        for label in ("aa", "ab", "dd", "de", "ed"):
+            board.place(go_types.Point.fromLabel(label), go_types.Player.Black)
+        for label in ("ba", "cc", "ee"):
+            board.place(go_types.Point.fromLabel(label), go_types.Player.White)
+
+        for rebuilt in (
+            board_lib.Board.from_array(board.to_array()),
+            board_lib.Board.from_bytes(board.to_bytes()),
+            pickle.loads(pickle.dumps(board)),
+            board.copy(),
+        ):
+            self.assertEqual(len(rebuilt._grid), len(board._grid))
+            for point, chonk in board._grid.items():
+                self.assertEqual(rebuilt._grid[point].player, chonk.player)
+                self.assertEqual(rebuilt._grid[point].points, chonk.points)
+                self.assertEqual(rebuilt._grid[point].liberties, chonk.liberties)
+            # Still plays
+            for label in ("ca", "bb"):
+                rebuilt.place(go_types.Point.fromLabel(label), go_types.Player.Black)
+            self.assertFalse(rebuilt._grid[go_types.Point.fromLabel("ba")])
+        self.assertTrue(board._grid[go_types.Point.fromLabel("ba")])
+        self.assertLess(len(pickle.dumps(board)), 200)
@@ -1,10 +1,23 @@
 """These are unclassified problems.  We embed these and pickle all of them.
+
+Run with `python -m go_space build-tseumego`.
+
+A pool of processes parses the problem files, and sends the boards through a
+bounded queue to this process, which embeds them in batches.  Embedded problems
+are pickled in chunks of CHUNK_SIZE, so memory use doesn't grow with the
+corpus.  Files that fail to parse are listed in errors.json, next to the chunks.
+The output folder is only replaced once every chunk has been written.
 """
 
+import argparse
+import glob
 import json
+import multiprocessing
 import os
 import pickle
-from typing import Any, Dict
+import queue as queue_lib
+import shutil
+from typing import Any, Callable, Dict, List, Optional
 
 import attr
 import numpy as np
@@ -13,11 +26,19 @@ from go_space import board_lib, consts, embeddings, exceptions
 from go_space.go_types import chonk_lib, grid_lib, player_lib, point_lib, tseumego_lib
 
 
-TseumegoString = Dict[str, Any]
+SOURCE_PATH = os.path.join(consts.TOP_LEVEL_PATH, "data", "_tseumego_problems")
+OUTPUT_PATH = os.path.join(consts.TOP_LEVEL_PATH, "data", "_pickled_tseumego", "basics")
+ERRORS_FILE = "errors.json"
 
+# Parsed problems waiting to be embedded, across all parser processes
+PARSED_IN_FLIGHT = 1024
+EMBED_BATCH_SIZE = 256
+CHUNK_SIZE = 2048
+# Seconds to wait on the parsers before checking that they're still alive
+QUEUE_TIMEOUT = 5
 
-nn_embed = embeddings.NNEmbed()
-embedding_func = nn_embed.nn_embedding
+
+TseumegoString = Dict[str, Any]
 
 
 def board_from_tseumego_string(tseumego: TseumegoString) -> board_lib.Board:
@@ -25,7 +46,8 @@ def board_from_tseumego_string(tseumego: TseumegoString) -> board_lib.Board:
     return board_lib.boardFromBwBoardStr(tseumego, translation_layer)
 
 
-def tseumego_from_file(fn: str) -> tseumego_lib.Tseumego:
+def board_from_file(fn: str) -> board_lib.Board:
+    """Reads the problem, with its first solution move marked on the grid."""
     with open(fn, "r") as f:
         tseumego = json.loads(f.read())
 
@@ -57,29 +79,213 @@ def tseumego_from_file(fn: str) -> tseumego_lib.Tseumego:
     grid[point_lib.Point.fromLabel(next_pt)] = chonk_lib.Chonk(
         player=player_lib.Player.Spec1, points=set(), liberties=set()
     )
+    return board
+
+
+def tseumego_from_file(
+    fn: str, embedding_func: embeddings.Embedding
+) -> tseumego_lib.Tseumego:
+    board = board_from_file(fn)
+    return tseumego_lib.Tseumego(file_name=fn, grid=board._grid, embedding=embedding_func(board))
+
+
+@attr.s
+class ParsedFile(object):
+    file_name: str = attr.ib()
+    grid: Optional[grid_lib.Grid] = attr.ib(default=None)
+    # See embeddings.nn_feature
+    feature: Optional[np.ndarray] = attr.ib(default=None)
+    # Set instead of grid and feature, if the file failed to parse
+    error: Optional[str] = attr.ib(default=None)
+
+
+def _parse_worker(files: List[str], queue: multiprocessing.Queue) -> None:
+    try:
+        for fn in files:
+            try:
+                board = board_from_file(fn)
+                queue.put(ParsedFile(fn, grid=board._grid, feature=embeddings.nn_feature(board)))
+            except Exception as e:
+                queue.put(ParsedFile(fn, error=repr(e)))
+    except Exception as e:
+        queue.put(e)
+    # Marks this worker as done
+    queue.put(None)
+
+
+class ChunkWriter(object):
+    """Pickles lists of up to chunk_size Tseumego to out_dir/chunk_<n>.pickle.
+
+    Chunks are written to staging_dir, which replaces out_dir on close().  Until
+    then, out_dir keeps whatever an earlier run wrote.
+    """
+
+    def __init__(self, out_dir: str, chunk_size: int = CHUNK_SIZE):
+        self.out_dir = out_dir
+        self.staging_dir = os.path.normpath(out_dir) + ".staging"
+        self.chunk_size = chunk_size
+        self.num_chunks = 0
+        self.num_written = 0
+        self._buffer: List[tseumego_lib.Tseumego] = list()
+
+        # Left over from a run that didn't finish
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        os.makedirs(self.staging_dir)
+
+    def add(self, tseumego: tseumego_lib.Tseumego) -> None:
+        self._buffer.append(tseumego)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        path = os.path.join(self.staging_dir, f"chunk_{self.num_chunks:05d}.pickle")
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(self._buffer, f)
+        os.replace(path + ".tmp", path)
+        self.num_chunks += 1
+        self.num_written += len(self._buffer)
+        self._buffer = list()
+        print(f"Wrote {self.num_written} problems")
+
+    def close(self) -> None:
+        """Writes what's left, and swaps the chunks in for out_dir."""
+        self.flush()
+        old_dir = os.path.normpath(self.out_dir) + ".old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(self.out_dir):
+            os.rename(self.out_dir, old_dir)
+        os.rename(self.staging_dir, self.out_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
 
-    embedding = embedding_func(board)
+def chunk_files(out_dir: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(out_dir, "chunk_*.pickle")))
 
-    return tseumego_lib.Tseumego(file_name=fn, grid=grid, embedding=embedding)
 
+def read_chunks(out_dir: str) -> List[tseumego_lib.Tseumego]:
+    result = list()
+    for chunk in chunk_files(out_dir):
+        with open(chunk, "rb") as f:
+            result.extend(pickle.load(f))
+    return result
+
+
+def _next_parsed(queue: multiprocessing.Queue, workers: List[multiprocessing.Process]) -> Any:
+    """The next item from the parsers.  Raises if they died without finishing."""
+    while True:
+        try:
+            return queue.get(timeout=QUEUE_TIMEOUT)
+        except queue_lib.Empty:
+            for worker in workers:
+                if worker.exitcode not in (None, 0):
+                    raise RuntimeError(f"A parser process exited with code {worker.exitcode}")
+            if not any(worker.is_alive() for worker in workers):
+                raise RuntimeError("The parser processes exited without finishing")
+
+
+def problem_files(src_dir: str = SOURCE_PATH) -> List[str]:
+    return sorted(
+        os.path.join(root, file) for root, _, files in os.walk(src_dir) for file in files
+    )
+
+
+def embed_corpus(
+    files: List[str],
+    out_dir: str,
+    embed_features: Callable[[np.ndarray], np.ndarray],
+    num_workers: int = 1,
+    batch_size: int = EMBED_BATCH_SIZE,
+    chunk_size: int = CHUNK_SIZE,
+) -> List[Dict[str, str]]:
+    """Embeds files in chunks to out_dir, and returns the files that failed to parse.
+
+    The failures are also saved to out_dir/errors.json.
+    """
+    writer = ChunkWriter(out_dir, chunk_size)
+    errors = list()
+    pending: List[ParsedFile] = list()
+
+    def embed_pending() -> None:
+        if not pending:
+            return
+        embedded = embed_features(np.stack([p.feature for p in pending], axis=0))
+        for parsed, embedding in zip(pending, embedded):
+            writer.add(tseumego_lib.Tseumego(parsed.file_name, parsed.grid, embedding))
+        pending.clear()
+
+    queue = multiprocessing.Queue(maxsize=PARSED_IN_FLIGHT)
+    workers = [
+        multiprocessing.Process(
+            target=_parse_worker, args=(files[i::num_workers], queue), daemon=True
+        )
+        for i in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        running = num_workers
+        while running:
+            parsed = _next_parsed(queue, workers)
+            if isinstance(parsed, Exception):
+                raise parsed
+            if parsed is None:
+                running -= 1
+                continue
+            if parsed.error is not None:
+                errors.append({"file_name": parsed.file_name, "error": parsed.error})
+                continue
+            pending.append(parsed)
+            if len(pending) >= batch_size:
+                embed_pending()
+        embed_pending()
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.join()
+
+    errors.sort(key=lambda e: e["file_name"])
+    with open(os.path.join(writer.staging_dir, ERRORS_FILE), "w") as f:
+        json.dump(errors, f, indent=2)
+    writer.close()
+    return errors
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Embeds and pickles the tseumego problems.")
+    parser.add_argument("--src_dir", type=str, default=SOURCE_PATH)
+    parser.add_argument("--out_dir", type=str, default=OUTPUT_PATH)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        # Leave a core for the model
+        default=max(1, (os.cpu_count() or 2) - 1),
+        help="Processes parsing problem files",
+    )
+    parser.add_argument("--batch_size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--chunk_size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    nn_embed = embeddings.NNEmbed()
+
+    print("Start")
+    files = problem_files(args.src_dir)
+    print(f"Embedding {len(files)} files")
+    errors = embed_corpus(
+        files,
+        args.out_dir,
+        nn_embed.embed_features,
+        num_workers=args.workers,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+    )
+    if errors:
+        print(f"{len(errors)} files failed to parse, see {os.path.join(args.out_dir, ERRORS_FILE)}")
 
-print("Start")
-all_files = list()
-ct = 0
-for root, dirs, files in os.walk(
-    os.path.join(consts.TOP_LEVEL_PATH, "data", "_tseumego_problems")
-):
-    for file in files:
-        if ct % 25 == 0:
-            print(f"On file num {ct}")
-        ct += 1
-        all_files.append(tseumego_from_file(os.path.join(root, file)))
+    print("End")
 
-print("Pickle")
-with open(
-    os.path.join(consts.TOP_LEVEL_PATH, "data", "_pickled_tseumego", "basics.pickle"),
-    "wb",
-) as f:
-    pickle.dump(all_files, f)
 
-print("End")
+if __name__ == "__main__":
+    main()
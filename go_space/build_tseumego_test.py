@@ -0,0 +1,84 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from go_space import build_tseumego, embeddings
+
+
+def _fake_embed_features(features: np.ndarray) -> np.ndarray:
+    """Stands in for the model, which isn't part of the repo."""
+    return features.reshape(len(features), -1)[:, :40].astype(np.float32)
+
+
+def _write_problem(path: str, i: int) -> None:
+    letters = "abcdefg"
+    problem = {
+        "AB": ["aa", f"b{letters[i % 7]}"],
+        "AW": [f"c{letters[(i + 3) % 7]}"],
+        "SOL": [["B" if i % 2 else "W", "dd"]],
+    }
+    with open(path, "w") as f:
+        json.dump(problem, f)
+
+
+class EmbedCorpusTest(unittest.TestCase):
+    def test_embed_corpus(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src_dir, out_dir = os.path.join(tmp, "src"), os.path.join(tmp, "out")
+            os.makedirs(os.path.join(src_dir, "sub"))
+            for i in range(23):
+                _write_problem(os.path.join(src_dir, "sub" if i % 3 else "", f"p{i}.json"), i)
+            with open(os.path.join(src_dir, "missing_sol.json"), "w") as f:
+                json.dump({"AB": ["aa"], "AW": []}, f)
+            with open(os.path.join(src_dir, "not_json.json"), "w") as f:
+                f.write("{")
+
+            files = build_tseumego.problem_files(src_dir)
+            errors = build_tseumego.embed_corpus(
+                files, out_dir, _fake_embed_features, num_workers=3, batch_size=4, chunk_size=5
+            )
+
+            self.assertEqual(
+                [os.path.basename(e["file_name"]) for e in errors],
+                ["missing_sol.json", "not_json.json"],
+            )
+            with open(os.path.join(out_dir, build_tseumego.ERRORS_FILE)) as f:
+                self.assertEqual(json.load(f), errors)
+
+            # 23 problems in chunks of 5
+            self.assertEqual(len(os.listdir(out_dir)), 5 + 1)
+            result = build_tseumego.read_chunks(out_dir)
+            self.assertEqual(len(result), 23)
+
+            # Matches embedding one problem at a time
+            def embedding_func(brd):
+                return _fake_embed_features(embeddings.nn_feature(brd)[np.newaxis])[0]
+
+            for tseumego in result:
+                expected = build_tseumego.tseumego_from_file(tseumego.file_name, embedding_func)
+                np.testing.assert_array_equal(tseumego.embedding, expected.embedding)
+                self.assertEqual(tseumego.grid.ascii_board(), expected.grid.ascii_board())
+
+            # A second run replaces the first
+            build_tseumego.embed_corpus(
+                files[-4:], out_dir, _fake_embed_features, num_workers=2, chunk_size=5
+            )
+            self.assertEqual(len(build_tseumego.read_chunks(out_dir)), 4)
+
+            # A run that fails leaves the last one in place
+            def failing_embed_features(features):
+                raise ValueError
+
+            with self.assertRaises(ValueError):
+                build_tseumego.embed_corpus(
+                    files, out_dir, failing_embed_features, num_workers=2, chunk_size=5
+                )
+            self.assertEqual(len(build_tseumego.read_chunks(out_dir)), 4)
+            self.assertEqual(sorted(os.listdir(tmp)), ["out", "out.staging", "src"])
+
+
+if __name__ == "__main__":
+    unittest.main()
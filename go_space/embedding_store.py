@@ -0,0 +1,182 @@
+"""A matrix of embeddings held in memory at reduced precision, with cosine search.
+
+Vectors are normalized on the way in, so cosine similarity is a dot product.
+They're then stored as float32, float16, or int8 with a scale per dimension:
+
+    vector[d] ~= codes[d] * scale[d],   codes in [-127, 127]
+
+A query is scored against int8 codes as codes @ (scale * query), so the matrix is
+never turned back into floats all at once.  Scans go a chunk of rows at a time.
+
+The store can also keep the float32 vectors, memory-mapped from disk, to re-rank
+the best candidates of a quantized search exactly.
+"""
+
+import enum
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from go_space import exceptions
+
+
+# Rows scored at once.  Bounds the temporary floats made from int8 codes.
+CHUNK_ROWS = 4096
+
+
+class Precision(enum.Enum):
+    FLOAT32 = "float32"
+    FLOAT16 = "float16"
+    INT8 = "int8"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    # Leave zero vectors at zero, rather than dividing by zero.
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first."""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=int)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class EmbeddingStore(object):
+    def __init__(
+        self,
+        codes: np.ndarray,
+        precision: Precision,
+        scale: Optional[np.ndarray] = None,
+        originals: Optional[np.ndarray] = None,
+    ):
+        """Use from_vectors or load, rather than calling this directly."""
+        self.codes = codes
+        self.precision = precision
+        self.scale = scale
+        # Normalized float32 vectors, if kept for re-ranking
+        self.originals = originals
+
+    @staticmethod
+    def from_vectors(
+        vectors: np.ndarray, precision: Precision = Precision.INT8, keep_originals: bool = False
+    ) -> "EmbeddingStore":
+        vectors = _normalize(vectors)
+        scale = None
+        if precision == Precision.INT8:
+            scale = np.abs(vectors).max(axis=0) / 127
+            scale[scale == 0] = 1
+            codes = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+            scale = scale.astype(np.float32)
+        else:
+            codes = vectors.astype(precision.value)
+        return EmbeddingStore(
+            codes, precision, scale=scale, originals=vectors if keep_originals else None
+        )
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def dim(self) -> int:
+        return self.codes.shape[1]
+
+    def nbytes(self) -> int:
+        """Memory used by the quantized matrix."""
+        return self.codes.nbytes + (0 if self.scale is None else self.scale.nbytes)
+
+    def vectors(self) -> np.ndarray:
+        """The stored vectors, turned back into float32."""
+        result = self.codes.astype(np.float32)
+        if self.scale is not None:
+            result *= self.scale
+        return result
+
+    def vector(self, i: int) -> np.ndarray:
+        """The i-th stored vector, turned back into float32."""
+        result = self.codes[i].astype(np.float32)
+        if self.scale is not None:
+            result *= self.scale
+        return result
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Approximate cosine similarity of each query against each stored vector.
+
+        Takes an (m, dim) matrix of queries, and returns an (m, len(self)) matrix.
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        if self.scale is not None:
+            # codes * scale @ q == codes @ (scale * q)
+            queries = queries * self.scale
+        result = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), CHUNK_ROWS):
+            chunk = self.codes[start : start + CHUNK_ROWS].astype(np.float32)
+            result[:, start : start + CHUNK_ROWS] = queries @ chunk.T
+        return result
+
+    def search(
+        self, query: np.ndarray, k: int, rerank: int = 0, exclude: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """The k stored vectors most similar to query, as (indices, scores), best first.
+
+        If rerank > k, the best rerank candidates of the quantized search are
+        re-scored with the float32 vectors, which must have been kept.
+        """
+        scores = self.scores(query)[0]
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        if rerank <= k:
+            top = _top_k(scores, k)
+            return top, scores[top]
+
+        if self.originals is None:
+            raise exceptions.DataException("Re-ranking needs the float32 vectors.")
+        candidates = _top_k(scores, rerank)
+        if exclude is not None:
+            candidates = candidates[candidates != exclude]
+        exact = np.asarray(self.originals[candidates]) @ _normalize(query)
+        top = _top_k(exact, k)
+        return candidates[top], exact[top]
+
+    def save(self, path: str) -> None:
+        """Saves to path (an .npz), and the float32 vectors to path + ".f32.npy" if kept."""
+        arrays = {"codes": self.codes, "precision": np.array(self.precision.value)}
+        if self.scale is not None:
+            arrays["scale"] = self.scale
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(path + ".tmp", path)
+        if self.originals is not None:
+            with open(path + ".f32.npy.tmp", "wb") as f:
+                np.save(f, np.asarray(self.originals))
+            os.replace(path + ".f32.npy.tmp", path + ".f32.npy")
+
+    @staticmethod
+    def load(path: str) -> "EmbeddingStore":
+        """The float32 vectors, if saved, are memory-mapped rather than read."""
+        with np.load(path) as data:
+            precision = Precision(str(data["precision"]))
+            codes = data["codes"]
+            scale = data["scale"] if "scale" in data else None
+        originals = None
+        if os.path.exists(path + ".f32.npy"):
+            originals = np.load(path + ".f32.npy", mmap_mode="r")
+        return EmbeddingStore(codes, precision, scale=scale, originals=originals)
+
+
+def recall_at_k(
+    store: EmbeddingStore, vectors: np.ndarray, queries: np.ndarray, k: int, rerank: int = 0
+) -> float:
+    """The share of the exact top k (by float32 search over vectors) that store finds."""
+    exact = _normalize(vectors) @ _normalize(queries).T
+    found = 0
+    for i in range(len(queries)):
+        truth = set(_top_k(exact[:, i], k).tolist())
+        approx = set(store.search(queries[i], k, rerank=rerank)[0].tolist())
+        found += len(truth & approx)
+    return found / (len(queries) * min(k, len(store)))
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from go_space import embedding_store, exceptions
+from go_space.embedding_store import EmbeddingStore, Precision
+
+
+def _clustered_vectors(num: int, dim: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, dim))
+    return (centers[rng.integers(20, size=num)] + 0.3 * rng.normal(size=(num, dim))).astype(
+        np.float32
+    )
+
+
+class EmbeddingStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.vectors = _clustered_vectors(500, 64)
+        self.queries = self.vectors[:50]
+
+    def test_memory(self):
+        float32 = EmbeddingStore.from_vectors(self.vectors, Precision.FLOAT32)
+        int8 = EmbeddingStore.from_vectors(self.vectors, Precision.INT8)
+        float16 = EmbeddingStore.from_vectors(self.vectors, Precision.FLOAT16)
+        self.assertLess(int8.nbytes(), float32.nbytes() / 3.9)
+        self.assertEqual(float16.nbytes(), float32.nbytes() // 2)
+
+    def test_scores_match_cosine(self):
+        normalized = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        exact = normalized[:5] @ normalized.T
+        for precision, atol in [
+            (Precision.FLOAT32, 1e-5),
+            (Precision.FLOAT16, 1e-2),
+            (Precision.INT8, 5e-2),
+        ]:
+            store = EmbeddingStore.from_vectors(self.vectors, precision)
+            np.testing.assert_allclose(store.scores(self.vectors[:5]), exact, atol=atol)
+
+    def test_scores_in_chunks(self):
+        store = EmbeddingStore.from_vectors(self.vectors, Precision.INT8)
+        whole = store.scores(self.queries)
+        old_chunk_rows = embedding_store.CHUNK_ROWS
+        embedding_store.CHUNK_ROWS = 7
+        try:
+            np.testing.assert_allclose(store.scores(self.queries), whole, rtol=1e-5, atol=1e-6)
+        finally:
+            embedding_store.CHUNK_ROWS = old_chunk_rows
+
+    def test_recall(self):
+        exact = EmbeddingStore.from_vectors(self.vectors, Precision.FLOAT32)
+        self.assertEqual(embedding_store.recall_at_k(exact, self.vectors, self.queries, 10), 1.0)
+
+        int8 = EmbeddingStore.from_vectors(self.vectors, Precision.INT8, keep_originals=True)
+        recall = embedding_store.recall_at_k(int8, self.vectors, self.queries, 10)
+        reranked = embedding_store.recall_at_k(int8, self.vectors, self.queries, 10, rerank=50)
+        self.assertGreater(recall, 0.8)
+        self.assertGreaterEqual(reranked, recall)
+        self.assertEqual(reranked, 1.0)
+
+    def test_search_excludes(self):
+        store = EmbeddingStore.from_vectors(self.vectors, Precision.INT8, keep_originals=True)
+        for rerank in (0, 20):
+            inds, scores = store.search(self.vectors[3], 5, rerank=rerank, exclude=3)
+            self.assertNotIn(3, inds)
+            self.assertEqual(len(inds), 5)
+            self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_vector(self):
+        for precision in Precision:
+            store = EmbeddingStore.from_vectors(self.vectors, precision)
+            np.testing.assert_array_equal(store.vector(7), store.vectors()[7])
+            inds, _ = store.search(store.vector(7), 1)
+            self.assertEqual(inds.tolist(), [7])
+
+    def test_rerank_needs_originals(self):
+        store = EmbeddingStore.from_vectors(self.vectors, Precision.INT8)
+        with self.assertRaises(exceptions.DataException):
+            store.search(self.vectors[0], 5, rerank=20)
+
+    def test_save_load(self):
+        store = EmbeddingStore.from_vectors(self.vectors, Precision.INT8, keep_originals=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "store.npz")
+            store.save(path)
+            loaded = EmbeddingStore.load(path)
+            self.assertEqual(loaded.precision, Precision.INT8)
+            np.testing.assert_array_equal(loaded.codes, store.codes)
+            np.testing.assert_array_equal(loaded.scale, store.scale)
+            np.testing.assert_array_equal(
+                loaded.search(self.vectors[0], 5, rerank=20)[0],
+                store.search(self.vectors[0], 5, rerank=20)[0],
+            )
+            del loaded
+
+
+if __name__ == "__main__":
+    unittest.main()
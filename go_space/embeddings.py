@@ -1,73 +1,174 @@
 """This file contains the Embedding type and some sample embeddings."""
 
-import os
-from typing import Callable
+import functools
+from typing import Callable, Tuple
 
-from keras.models import load_model, Sequential
 import numpy as np
 
-from go_space import board_lib, consts
-from go_space.go_types import stone_lib, player_lib, point_lib
-from go_space.nn import datum_lib
+from go_space import board_lib, symmetry, zobrist
+from go_space.go_types import player_lib
+from go_space.nn import datum_lib, numpy_model
 
 # Must be a constant dimension
 Embedding = Callable[[board_lib.Board], np.ndarray]
+# Maps an (n, SIZE, SIZE) board tensor (see board_lib.stack_boards) to an (n, d) matrix
+BatchEmbedding = Callable[[np.ndarray], np.ndarray]
 
 
-def make_random_embedding(dim: int) -> Embedding:
-    PRECISION = 1000
+def unbatched(batch_embedding: BatchEmbedding) -> Embedding:
+    def embedding(brd: board_lib.Board) -> np.ndarray:
+        return batch_embedding(brd.to_array()[np.newaxis])[0]
+
+    return embedding
+
+
+def _splitmix64(seeds: np.ndarray, length: int) -> np.ndarray:
+    """The first `length` outputs of a SplitMix64 generator for each seed.
+
+    Returns an (n, length) matrix of floats in [0, 1).
+    """
+    golden = np.uint64(0x9E3779B97F4A7C15)
+    steps = np.arange(1, length + 1, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        z = seeds[:, np.newaxis] + steps[np.newaxis, :] * golden
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    # Top 53 bits make a float in [0, 1)
+    return (z >> np.uint64(11)).astype(np.float64) / float(2 ** 53)
+
 
-    def infoless_embedding(brd: board_lib.Board) -> np.ndarray:
-        """Just complete non-sense."""
-        result = np.zeros(dim)  # Will fill in below
+def make_random_embedding_batch(dim: int) -> BatchEmbedding:
+    def infoless_embedding_batch(boards: np.ndarray) -> np.ndarray:
+        """Just complete non-sense, seeded by the position hash."""
+        return _splitmix64(zobrist.hash_boards(boards), dim)
 
-        scratch = hash(brd.ascii_board())
-        for _ in range(dim):
-            result[_] = (scratch % PRECISION) / PRECISION
-            scratch = hash(str(scratch))
+    return infoless_embedding_batch
 
-        return result
 
-    return infoless_embedding
+def make_random_embedding(dim: int) -> Embedding:
+    return unbatched(make_random_embedding_batch(dim))
+
+
+@functools.lru_cache(maxsize=None)
+def _dumb_embedding_bins(size: int) -> np.ndarray:
+    """The embedding index of a non-Black stone on each point.
 
+    Points are folded into the low-index quarter, as in Point.mod_row_col.
+    """
+    half_board = size // 2 + 1
+    ind = np.arange(size)
+    fold = np.where(ind >= half_board, size - 1 - ind, ind)
+    # Only record up to symmetry: index is col * half_board + row
+    return (fold[np.newaxis, :] * half_board + fold[:, np.newaxis]).ravel()
 
-def dumb_embedding(brd: board_lib.Board) -> np.ndarray:
+
+def dumb_embedding_batch(boards: np.ndarray) -> np.ndarray:
     """Simple encoding of boards, probably won't be good."""
-    half_board = consts.SIZE // 2 + 1
+    n, size = boards.shape[0], boards.shape[-1]
+    half_board = size // 2 + 1
+    dim = 2 * (half_board ** 2)
+
+    flat = boards.reshape(n, size * size)
+    brd_ind, pt_ind = np.nonzero(flat)
+    ind = _dumb_embedding_bins(size)[pt_ind]
+    ind[flat[brd_ind, pt_ind] == player_lib.Player.Black.value] += half_board ** 2
+
+    counts = np.bincount(brd_ind * dim + ind, minlength=n * dim)
+    return counts.reshape(n, dim).astype(np.float64)
 
-    def _embed_ind(stone: stone_lib.Stone):
-        player = stone.player
-        row, col = stone.point.mod_row_col()
 
-        # Only record up to symmetry
-        ind = col * half_board + row
-        if player == player_lib.Player.Black:
-            ind += half_board ** 2
+dumb_embedding = unbatched(dumb_embedding_batch)
 
-        return ind
 
-    result = np.zeros(2 * (half_board ** 2))
-    for stone in brd.stones():
-        result[_embed_ind(stone)] += 1
+# The embedding is the output of the first dense layer, before its activation.
+EMBEDDING_LAYERS = 8
 
-    return result
+
+def nn_feature(brd: board_lib.Board) -> np.ndarray:
+    """The model input for brd.  Cheap, so it can be made away from the model."""
+    # Pick a point in the corner, just so that it won't rotate
+    pt = next(brd._grid.sparse_iter())
+    datum = datum_lib.Datum(grid=brd._grid, next_pt=pt)
+    return datum.np_feature()
+
+
+# Ways to combine the corner embeddings of a board.  concat keeps the corners in
+# the order of datum_lib.CORNER_POINTS, with zeros for empty corners.
+POOLINGS = ("mean", "max", "concat")
+
+
+def whole_board_features(boards: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Model inputs for every occupied corner of an (n, SIZE, SIZE) board tensor.
+
+    Each corner is flipped to the top-left, then reflected across the diagonal
+    if that's lexicographically smaller, so a board's corners give the same
+    features under any symmetry of the board.
+
+    Returns the (m, *FEATURE_SHAPE) features, and the slot of each, which is
+    board * NUM_CORNERS + corner.
+    """
+    crops = datum_lib.corner_crops(boards)
+    crops = crops.reshape((-1,) + crops.shape[-2:])
+    slots = np.flatnonzero(crops.reshape(len(crops), -1).any(axis=1))
+    canonical, _ = symmetry.canonical(crops[slots], symmetry.CORNER_TRANSFORMS)
+    return datum_lib.crop_features(canonical), slots
+
+
+def pool_corners(
+    vectors: np.ndarray, slots: np.ndarray, num_boards: int, pooling: str = "mean"
+) -> np.ndarray:
+    """Combines corner embeddings, as from whole_board_features, into one row per board.
+
+    Boards with no stones get zeros.
+    """
+    dim = vectors.shape[1]
+    board_ids = slots // datum_lib.NUM_CORNERS
+    if pooling == "concat":
+        result = np.zeros((num_boards * datum_lib.NUM_CORNERS, dim))
+        result[slots] = vectors
+        return result.reshape(num_boards, datum_lib.NUM_CORNERS * dim)
+    counts = np.bincount(board_ids, minlength=num_boards)[:, np.newaxis]
+    if pooling == "mean":
+        result = np.zeros((num_boards, dim))
+        np.add.at(result, board_ids, vectors)
+        return result / np.maximum(counts, 1)
+    if pooling == "max":
+        result = np.full((num_boards, dim), -np.inf)
+        np.maximum.at(result, board_ids, vectors)
+        return np.where(counts > 0, result, 0.0)
+    raise ValueError(f"Unknown pooling {pooling}")
 
 
 class NNEmbed(object):
-    def __init__(self):
-        full_model = load_model(
-            os.path.join(consts.TOP_LEVEL_PATH, "saved_models", "v1")
-        )
-        layers = [full_model.get_layer(index=i) for i in range(8)]
-        self.new_model = Sequential()
-        for layer in layers:
-            self.new_model.add(layer)
+    def __init__(self, model_path: str = numpy_model.NPZ_MODEL_PATH):
+        # Runs on the NumPy export of the model, so that TensorFlow isn't needed.
+        full_model = numpy_model.NumpyModel.load(model_path)
+        self.new_model = full_model.truncated(EMBEDDING_LAYERS)
 
-    def nn_embedding(self, brd: board_lib.Board) -> np.ndarray:
-        # Pick a point in the corner, just so that it won't rotate
-        pt = next(brd._grid.sparse_iter())
-        datum = datum_lib.Datum(grid=brd._grid, next_pt=pt)
-        x = np.stack([datum.np_feature()], axis=0)
+    def embed_features(self, features: np.ndarray) -> np.ndarray:
+        """Embeds a stack of nn_feature outputs in one pass through the model."""
+        return self.new_model.predict(features)
 
-        y = self.new_model.predict(x)
-        return y[0]
+    def nn_embedding(self, brd: board_lib.Board) -> np.ndarray:
+        return self.embed_features(nn_feature(brd)[np.newaxis])[0]
+
+    def nn_embedding_batch(self, boards: np.ndarray) -> np.ndarray:
+        """A BatchEmbedding version of nn_embedding."""
+        features = [nn_feature(board_lib.Board.from_array(brd)) for brd in boards]
+        return self.embed_features(np.stack(features, axis=0))
+
+    def whole_board_embedding_batch(self, boards: np.ndarray, pooling: str = "mean") -> np.ndarray:
+        """Embeds all the occupied corners of each board, unlike nn_embedding_batch.
+
+        The corners of every board go through the model in a single pass.
+        """
+        features, slots = whole_board_features(boards)
+        if not len(slots):
+            # Still run the model on something, to get the dimension
+            features = np.zeros((1,) + datum_lib.FEATURE_SHAPE)
+        vectors = self.embed_features(features)[: len(slots)]
+        return pool_corners(vectors, slots, len(boards), pooling)
+
+    def whole_board_embedding(self, brd: board_lib.Board, pooling: str = "mean") -> np.ndarray:
+        return self.whole_board_embedding_batch(brd.to_array()[np.newaxis], pooling)[0]
@@ -0,0 +1,133 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from go_space import board_lib, consts, embeddings, go_types, symmetry
+from go_space.nn import datum_lib, numpy_model
+
+
+def _random_board(num_stones: int) -> board_lib.Board:
+    board = board_lib.Board()
+    for _ in range(num_stones):
+        pt = go_types.Point(random.randrange(consts.SIZE), random.randrange(consts.SIZE))
+        if not board._grid[pt]:
+            board.place(pt, random.choice([go_types.Player.Black, go_types.Player.White]))
+    return board
+
+
+def _loop_dumb_embedding(brd: board_lib.Board) -> np.ndarray:
+    """The stone-by-stone implementation that dumb_embedding_batch replaces."""
+    half_board = consts.SIZE // 2 + 1
+    result = np.zeros(2 * (half_board ** 2))
+    for stone in brd.stones():
+        row, col = stone.point.mod_row_col()
+        ind = col * half_board + row
+        if stone.player == go_types.Player.Black:
+            ind += half_board ** 2
+        result[ind] += 1
+    return result
+
+
+class EmbeddingsTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.boards = [_random_board(n) for n in (0, 5, 40, 120)]
+        self.tensor = board_lib.stack_boards(self.boards)
+
+    def test_dumb_embedding_batch(self):
+        result = embeddings.dumb_embedding_batch(self.tensor)
+        self.assertEqual(result.shape, (4, 2 * 10 ** 2))
+        for brd, row in zip(self.boards, result):
+            np.testing.assert_array_equal(row, _loop_dumb_embedding(brd))
+            np.testing.assert_array_equal(embeddings.dumb_embedding(brd), row)
+
+    def test_random_embedding_batch(self):
+        result = embeddings.make_random_embedding_batch(30)(self.tensor)
+        self.assertEqual(result.shape, (4, 30))
+        self.assertTrue(np.all((0 <= result) & (result < 1)))
+        # Deterministic per position, and different across positions
+        np.testing.assert_array_equal(
+            embeddings.make_random_embedding(30)(self.boards[2]), result[2]
+        )
+        self.assertEqual(len({tuple(row) for row in result}), 4)
+
+
+class WholeBoardTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        rng = np.random.default_rng(0)
+        specs = [
+            {"type": "Conv2D", "padding": "same", "activation": "relu"},
+            {"type": "Flatten"},
+            {"type": "Dense", "activation": "linear"},
+        ]
+        weights = [
+            [rng.normal(size=(3, 3, 1, 2)), rng.normal(size=2)],
+            [],
+            [rng.normal(size=(consts.DATA_BOARD_SIZE ** 2 * 2, 5)), rng.normal(size=5)],
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "model.npz")
+            numpy_model.NumpyModel(specs, weights).save(path)
+            self.nn_embed = embeddings.NNEmbed(path)
+
+        self.boards = [_random_board(n) for n in (0, 3, 40, 150)]
+        # Stones in just one corner
+        self.boards.append(board_lib.Board())
+        self.boards[-1].place(go_types.Point(16, 2), go_types.Player.White)
+        self.tensor = board_lib.stack_boards(self.boards)
+
+    def _corner_embeddings(self, board: np.ndarray):
+        """The embedding of each occupied corner, one at a time."""
+        result = dict()
+        for corner, pt in enumerate(datum_lib.CORNER_POINTS):
+            crop = datum_lib.corner_crop(board, pt)
+            if np.any(crop):
+                crop = min(crop, crop.T, key=lambda c: c.ravel().tolist())
+                feature = datum_lib.crop_features(crop)[np.newaxis]
+                result[corner] = self.nn_embed.embed_features(feature)[0]
+        return result
+
+    def test_pooling(self):
+        for pooling in embeddings.POOLINGS:
+            result = self.nn_embed.whole_board_embedding_batch(self.tensor, pooling)
+            for board, row in zip(self.tensor, result):
+                corners = self._corner_embeddings(board)
+                if pooling == "concat":
+                    expected = np.zeros((datum_lib.NUM_CORNERS, 5))
+                    for corner, vector in corners.items():
+                        expected[corner] = vector
+                    expected = expected.ravel()
+                elif not corners:
+                    expected = np.zeros(5)
+                else:
+                    stacked = np.stack(list(corners.values()), axis=0)
+                    expected = stacked.mean(axis=0) if pooling == "mean" else stacked.max(axis=0)
+                np.testing.assert_allclose(row, expected, rtol=1e-6, atol=1e-6)
+
+    def test_one_pass(self):
+        calls = list()
+        embed_features = self.nn_embed.embed_features
+
+        def counting(features):
+            calls.append(len(features))
+            return embed_features(features)
+
+        self.nn_embed.embed_features = counting
+        self.nn_embed.whole_board_embedding_batch(self.tensor)
+        self.nn_embed.whole_board_embedding_batch(self.tensor[:1])
+        self.assertEqual(len(calls), 2)
+
+    def test_symmetric(self):
+        expected = self.nn_embed.whole_board_embedding_batch(self.tensor, "max")
+        for k in range(symmetry.NUM_TRANSFORMS):
+            transformed = symmetry.transform_boards(self.tensor, k)
+            np.testing.assert_allclose(
+                self.nn_embed.whole_board_embedding_batch(transformed, "max"), expected, atol=1e-6
+            )
+        np.testing.assert_allclose(
+            self.nn_embed.whole_board_embedding(self.boards[3], "max"), expected[3]
+        )
@@ -0,0 +1,114 @@
+"""Bitboards: sets of points stored as the bits of a Python int.
+
+On a size x size board, point (row, col) is bit row * size + col.  Unions,
+intersections and counts of regions are then single integer operations, and a
+shift moves every point in a set at once.
+"""
+
+import functools
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+
+from . import point_lib
+
+
+Bitboard = int
+
+
+@functools.lru_cache(maxsize=None)
+def _masks(size: int) -> Tuple[Bitboard, Bitboard, Bitboard]:
+    """Returns the full board, and the board without its first or last column."""
+    full = (1 << (size * size)) - 1
+    first_col = sum(1 << (r * size) for r in range(size))
+    last_col = first_col << (size - 1)
+    return full, full & ~first_col, full & ~last_col
+
+
+def bit(row: int, col: int, size: int) -> Bitboard:
+    return 1 << (row * size + col)
+
+
+def from_points(points: Iterable[point_lib.Point], size: int) -> Bitboard:
+    result = 0
+    for point in points:
+        result |= 1 << (point.row * size + point.col)
+    return result
+
+
+def from_mask(mask: np.ndarray) -> Bitboard:
+    """The set points of a (size, size) boolean array."""
+    packed = np.packbits(mask.reshape(-1), bitorder="little")
+    return int.from_bytes(packed.tobytes(), "little")
+
+
+def to_points(bb: Bitboard, size: int) -> Iterator[point_lib.Point]:
+    """Loops through the points in bb, in row-major order."""
+    while bb:
+        low = bb & -bb
+        ind = low.bit_length() - 1
+        yield point_lib.Point(row=ind // size, col=ind % size)
+        bb ^= low
+
+
+def contains(bb: Bitboard, point: point_lib.Point, size: int) -> bool:
+    return bool(bb >> (point.row * size + point.col) & 1)
+
+
+def popcount(bb: Bitboard) -> int:
+    # int.bit_count needs Python 3.10
+    return bin(bb).count("1")
+
+
+def full(size: int) -> Bitboard:
+    return _masks(size)[0]
+
+
+def dilate(bb: Bitboard, size: int) -> Bitboard:
+    """bb plus all points adjacent to it."""
+    full, not_first_col, not_last_col = _masks(size)
+    return (
+        bb
+        | (bb >> size)
+        | ((bb << size) & full)
+        | ((bb << 1) & not_first_col)
+        | ((bb >> 1) & not_last_col)
+    )
+
+
+def neighbors(bb: Bitboard, size: int) -> Bitboard:
+    """Points adjacent to bb, that aren't in bb."""
+    return dilate(bb, size) & ~bb
+
+
+def liberties(group: Bitboard, empty: Bitboard, size: int) -> Bitboard:
+    return neighbors(group, size) & empty
+
+
+def flood_fill(seed: Bitboard, within: Bitboard, size: int) -> Bitboard:
+    """All points of within connected to seed through within."""
+    result = seed & within
+    while True:
+        grown = dilate(result, size) & within
+        if grown == result:
+            return result
+        result = grown
+
+
+def groups(stones: Bitboard, size: int) -> Iterator[Bitboard]:
+    """Splits stones into connected groups."""
+    while stones:
+        group = flood_fill(stones & -stones, stones, size)
+        yield group
+        stones &= ~group
+
+
+@functools.lru_cache(maxsize=None)
+def box_mask(row_start: int, row_end: int, col_start: int, col_end: int, size: int) -> Bitboard:
+    """The rectangle of rows [row_start, row_end) and cols [col_start, col_end)."""
+    col_start, col_end = max(col_start, 0), min(col_end, size)
+    row = ((1 << max(col_end - col_start, 0)) - 1) << col_start
+    result = 0
+    for r in range(max(row_start, 0), min(row_end, size)):
+        result |= row << (r * size)
+    return result & full(size)
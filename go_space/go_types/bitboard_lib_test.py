@@ -0,0 +1,53 @@
+import random
+import unittest
+
+from go_space import board_lib, go_types
+from go_space.go_types import bitboard_lib
+
+
+class BitboardTest(unittest.TestCase):
+    def test_points_round_trip(self):
+        points = [go_types.Point(0, 4), go_types.Point(2, 0), go_types.Point(4, 4)]
+        bb = bitboard_lib.from_points(points, 5)
+        self.assertEqual(bitboard_lib.popcount(bb), 3)
+        self.assertEqual(list(bitboard_lib.to_points(bb, 5)), points)
+        self.assertTrue(bitboard_lib.contains(bb, go_types.Point(2, 0), 5))
+        self.assertFalse(bitboard_lib.contains(bb, go_types.Point(2, 1), 5))
+
+    def test_neighbors_dont_wrap(self):
+        # Right edge of the first row
+        bb = bitboard_lib.bit(0, 4, 5)
+        self.assertEqual(
+            set(bitboard_lib.to_points(bitboard_lib.neighbors(bb, 5), 5)),
+            {go_types.Point(0, 3), go_types.Point(1, 4)},
+        )
+
+    def test_box_mask(self):
+        bb = bitboard_lib.box_mask(1, 3, 3, 7, 5)
+        self.assertEqual(
+            list(bitboard_lib.to_points(bb, 5)),
+            [go_types.Point(1, 3), go_types.Point(1, 4), go_types.Point(2, 3), go_types.Point(2, 4)],
+        )
+
+    def test_matches_board(self):
+        random.seed(0)
+        board = board_lib.Board()
+        for _ in range(200):
+            pt = go_types.Point(random.randrange(19), random.randrange(19))
+            if not board._grid[pt]:
+                board.place(pt, random.choice([go_types.Player.Black, go_types.Player.White]))
+
+        grid = board._grid
+        empty = bitboard_lib.full(19) & ~grid.bitboard()
+        chonks = {chonk for _, chonk in grid.items()}
+        for player in (go_types.Player.Black, go_types.Player.White):
+            groups = list(bitboard_lib.groups(grid.bitboard(player), 19))
+            player_chonks = [c for c in chonks if c.player == player]
+            self.assertEqual(len(groups), len(player_chonks))
+            for chonk in player_chonks:
+                group = bitboard_lib.from_points(chonk.points, 19)
+                self.assertIn(group, groups)
+                self.assertEqual(
+                    bitboard_lib.liberties(group, empty, 19),
+                    bitboard_lib.from_points(chonk.liberties, 19),
+                )
@@ -1,76 +1,166 @@
+import struct
 from typing import Dict, Iterator, List, Optional, Tuple
 
-from go_space import consts
+import numpy as np
 
-from . import chonk_lib, player_lib, point_lib
+from go_space import consts, exceptions, symmetry
+
+from . import bitboard_lib, chonk_lib, player_lib, point_lib
 from go_space import go_types
 
 
-def _all_points(size: int) -> Iterator[point_lib.Point]:
-    """Loops through all the points on the board."""
-    for i in range(size):
-        for j in range(size):
-            yield point_lib.Point(row=i, col=j)
+# Header of to_bytes: format version, board size, bits per point
+_HEADER = struct.Struct("<BBB")
+_BYTES_VERSION = 1
+
+
+def _pack(array: np.ndarray) -> bytes:
+    """Packs a (size, size) array of Player values, 2 bits per point.
+
+    Spec2 doesn't fit in 2 bits, so boards with it take 4 bits per point.
+    """
+    bits = 2 if array.max(initial=0) < 4 else 4
+    per_byte = 8 // bits
+    flat = array.reshape(-1).astype(np.uint8)
+    flat = np.concatenate([flat, np.zeros(-len(flat) % per_byte, dtype=np.uint8)])
+    shifts = np.arange(0, 8, bits, dtype=np.uint8)
+    packed = np.bitwise_or.reduce(flat.reshape(-1, per_byte) << shifts, axis=1)
+    return _HEADER.pack(_BYTES_VERSION, array.shape[0], bits) + packed.astype(np.uint8).tobytes()
+
+
+def _unpack(data: bytes) -> np.ndarray:
+    """Inverse of _pack."""
+    try:
+        version, size, bits = _HEADER.unpack_from(data)
+    except struct.error:
+        raise exceptions.FormatError("Grid bytes too short")
+    if version != _BYTES_VERSION or bits not in (2, 4):
+        raise exceptions.FormatError(f"Unknown grid bytes version {version}, {bits} bits")
+    per_byte = 8 // bits
+    packed = np.frombuffer(data, dtype=np.uint8, offset=_HEADER.size)
+    if len(packed) != -(-size * size // per_byte):
+        raise exceptions.FormatError(f"Wrong length of grid bytes for size {size}")
+    shifts = np.arange(0, 8, bits, dtype=np.uint8)
+    flat = (packed[:, np.newaxis] >> shifts) & ((1 << bits) - 1)
+    return flat.reshape(-1)[: size * size].reshape(size, size).astype(np.int8)
 
 
 class Grid(object):
+    """Maps each point on the board to the chonk on it.
+
+    Only occupied points are stored, so that memory and iteration are
+    proportional to the number of stones.  Every other point on the board maps
+    to NULL_CHUNK.
+
+    Alongside, we keep a bitboard of each player's stones, so that region
+    checks are integer operations.
+    """
+
     def _clear(self):
-        """Fills in NULL_CHUNK.  Clear or initialize."""
-        for point in _all_points(self.size):
-            # No pieces placed yet
-            self._grid[point] = chonk_lib.NULL_CHUNK
+        """Removes all stones.  Clear or initialize."""
+        self._grid: Dict[point_lib.Point, chonk_lib.Chonk] = dict()
+        self._bits: Dict[player_lib.Player, bitboard_lib.Bitboard] = dict()
+
+    def _set_grid(self, grid: Dict[point_lib.Point, chonk_lib.Chonk]) -> None:
+        """Replaces all stones, and rebuilds the bitboards."""
+        self._grid = grid
+        self._bits = dict()
+        for point, chonk in grid.items():
+            self._bits[chonk.player] = self._bits.get(chonk.player, 0) | bitboard_lib.bit(
+                point.row, point.col, self.size
+            )
 
     def __init__(self, size: int = consts.SIZE):
         self.size = size
-        self._grid: Dict[point_lib.Point, Optional[chonk_lib.Chonk]] = dict()
         self._clear()
 
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        # Grids pickled before the sparse representation stored every point.
+        self._set_grid({k: v for k, v in self._grid.items() if v})
+
     def __setitem__(
         self, key: point_lib.Point, value: Optional[chonk_lib.Chonk]
     ) -> None:
         assert isinstance(key, point_lib.Point)
-        self._grid[key] = value
+        if key not in self:
+            raise KeyError(key)
+        bit = bitboard_lib.bit(key.row, key.col, self.size)
+        if (old := self._grid.get(key)) is not None:
+            self._bits[old.player] &= ~bit
+        if value:
+            self._grid[key] = value
+            self._bits[value.player] = self._bits.get(value.player, 0) | bit
+        else:
+            self._grid.pop(key, None)
 
     def __getitem__(self, key: point_lib.Point) -> Optional[chonk_lib.Chonk]:
-        return self._grid[key]
+        if (chonk := self._grid.get(key)) is not None:
+            return chonk
+        if key in self:
+            return chonk_lib.NULL_CHUNK
+        raise KeyError(key)
 
     def __contains__(self, key: point_lib.Point) -> bool:
-        return key in self._grid
+        return 0 <= key.row < self.size and 0 <= key.col < self.size
+
+    def __len__(self) -> int:
+        """Number of stones."""
+        return len(self._grid)
 
-    def _copy_grid(self) -> Dict[point_lib.Point, Optional[chonk_lib.Chonk]]:
-        return {k: v for k, v in self.items()}
+    def _copy_grid(self) -> Dict[point_lib.Point, chonk_lib.Chonk]:
+        return dict(self._grid)
+
+    def bitboard(self, player: Optional[player_lib.Player] = None) -> bitboard_lib.Bitboard:
+        """The stones of player, or of all players if None."""
+        if player is not None:
+            return self._bits.get(player, 0)
+        result = 0
+        for bb in self._bits.values():
+            result |= bb
+        return result
 
     def rotate(self, flip_x: bool, flip_y: bool) -> None:
-        x, y, dx, dy = 0, 0, 1, 1
-        if flip_x:
-            x, dx = self.size - 1, -1
-        if flip_y:
-            y, dy = self.size - 1, -1
-
-        grid_copy = self._copy_grid()
-        for i in range(self.size):
-            for j in range(self.size):
-                to_point = point_lib.Point(i, j)
-                from_point = point_lib.Point(x + i * dx, y + j * dy)
-                self[to_point] = grid_copy[from_point]
+        """Flips the rows if flip_x, and the columns if flip_y."""
+        self.transform(symmetry.index(flip_rows=flip_x, flip_cols=flip_y))
+
+    def transform(self, k: int) -> None:
+        """Applies symmetry.TRANSFORMS[k]."""
+        if k == 0 or not self._grid:
+            return
+        points = list(self._grid)
+        indices = np.array([p.row * self.size + p.col for p in points])
+        moved = symmetry.transform_indices(indices, k, self.size).tolist()
+        self._set_grid(
+            {
+                point_lib.Point(*divmod(ind, self.size)): self._grid[p]
+                for p, ind in zip(points, moved)
+            }
+        )
 
     def mask(self, points: Iterator[point_lib.Point]) -> None:
         """Remove all points except those passed"""
-        grid_copy = self._copy_grid()
-        self._clear()
-        for point in points:
-            self[point] = grid_copy[point]
+        self.mask_bitboard(bitboard_lib.from_points(points, self.size))
+
+    def mask_bitboard(self, keep: bitboard_lib.Bitboard) -> None:
+        """Remove all points except those in keep"""
+        if self.bitboard() & ~keep == 0:
+            return
+        self._set_grid(
+            {
+                k: v
+                for k, v in self._grid.items()
+                if bitboard_lib.contains(keep, k, self.size)
+            }
+        )
 
     def resize(self, size: int) -> None:
-        grid_copy = self._copy_grid()
-        self.grid = dict()
         self.size = size
-        self._clear()
-
-        for point in _all_points(self.size):
-            self[point] = grid_copy[point]
+        # Bit indices depend on the size
+        self._set_grid({k: v for k, v in self._grid.items() if k in self})
 
-    def items(self) -> Iterator[Tuple[point_lib.Point, Optional[chonk_lib.Chonk]]]:
+    def items(self) -> Iterator[Tuple[point_lib.Point, chonk_lib.Chonk]]:
+        """Loops through the occupied points."""
         for k, v in self._grid.items():
             yield k, v
 
@@ -78,6 +168,7 @@ class Grid(object):
         """Deep copy."""
         result = Grid(size=self.size)
         result._grid = self._copy_grid()
+        result._bits = dict(self._bits)
         return result
 
     def ascii_board(self) -> str:
@@ -93,19 +184,23 @@ class Grid(object):
             BLANK_CHAR = "."
             return STONE_CHAR.get(stone, BLANK_CHAR)
 
-        result_rows = list()
-        for r in range(consts.SIZE):
-            row = list()
-            for c in range(consts.SIZE):
-                piece = self._grid[go_types.Point(row=r, col=c)].player
-                row.append(stone_char(piece))
-            result_rows.append("".join(row))
-        return "\n".join(result_rows)
+        result_rows = [[stone_char(None)] * consts.SIZE for _ in range(consts.SIZE)]
+        for point, chonk in self._grid.items():
+            if point.row < consts.SIZE and point.col < consts.SIZE:
+                result_rows[point.row][point.col] = stone_char(chonk.player)
+        return "\n".join("".join(row) for row in result_rows)
 
     def sparse_iter(self) -> Iterator[point_lib.Point]:
-        for point in _all_points(self.size):
-            if self[point]:
-                yield point
+        """Loops through the occupied points, in row-major order."""
+        for point in sorted(self._grid):
+            yield point
+
+    def to_array(self) -> np.ndarray:
+        """A (size, size) array of Player values, with 0 where empty."""
+        result = np.zeros([self.size, self.size], dtype=np.int8)
+        for point, chonk in self._grid.items():
+            result[point.row, point.col] = chonk.player.value
+        return result
 
     def to_dict(self) -> Dict:
         result = dict()
@@ -125,6 +220,60 @@ class Grid(object):
         result = Grid(data_dict["size"])
         for point, player in data_dict["sparse_grid"]:
             result[go_types.Point.from_dict(point)] = (
-                black_stones if player == go_types.Player.Black else white_stones
+                black_stones if player == go_types.Player.Black.value else white_stones
             )
         return result
+
+    @staticmethod
+    def from_array(array: np.ndarray, groups: bool = False) -> "Grid":
+        """Rebuild from to_array output.
+
+        Like from_dict, all stones of a player share a signal chonk, so this
+        won't be a working grid.  Unless groups is set, in which case chonks
+        are found by flood fill on the bitboards.  Then the array must not
+        contain captured stones.
+        """
+        result = Grid(array.shape[0])
+        grid = dict()
+        if groups:
+            size = result.size
+            empty = bitboard_lib.from_mask(array == 0)
+            for value in np.unique(array[array != 0]).tolist():
+                player = player_lib.Player(value)
+                stones = bitboard_lib.from_mask(array == value)
+                for group in bitboard_lib.groups(stones, size):
+                    liberties = bitboard_lib.liberties(group, empty, size)
+                    chonk = chonk_lib.Chonk(
+                        player=player,
+                        points=set(bitboard_lib.to_points(group, size)),
+                        liberties=set(bitboard_lib.to_points(liberties, size)),
+                    )
+                    for point in chonk.points:
+                        grid[point] = chonk
+            result._set_grid(grid)
+            return result
+
+        chonks: Dict[int, chonk_lib.Chonk] = dict()
+        rows, cols = np.nonzero(array)
+        for row, col, value in zip(rows.tolist(), cols.tolist(), array[rows, cols].tolist()):
+            if value not in chonks:
+                chonks[value] = chonk_lib.Chonk(player_lib.Player(value), set(), set())
+            grid[point_lib.Point(row, col)] = chonks[value]
+        result._set_grid(grid)
+        return result
+
+    def to_bytes(self) -> bytes:
+        """A compact encoding: a 3 byte header, then 2 bits per point.
+
+        About 100 bytes for a full board, whatever the number of stones.
+        """
+        return _pack(self.to_array())
+
+    @staticmethod
+    def from_bytes(data: bytes, groups: bool = True) -> "Grid":
+        """Rebuild from to_bytes output.  See from_array for groups."""
+        return Grid.from_array(_unpack(data), groups=groups)
+
+    def __reduce__(self):
+        # Pickles as to_bytes, with the chonks rebuilt on load.
+        return Grid.from_bytes, (self.to_bytes(),)
@@ -0,0 +1,93 @@
+import copyreg
+import io
+import pickle
+import unittest
+
+import numpy as np
+
+from go_space import exceptions, go_types
+
+
+def _stone(player: go_types.Player) -> go_types.Chonk:
+    return go_types.Chonk(player=player, points=set(), liberties=set())
+
+
+class _OldPickler(pickle.Pickler):
+    """Pickles grids as their __dict__, as before Grid.__reduce__."""
+
+    def reducer_override(self, obj):
+        if isinstance(obj, go_types.Grid):
+            return copyreg.__newobj__, (go_types.Grid,), obj.__dict__
+        return NotImplemented
+
+
+class GridTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = go_types.Grid(size=5)
+        self.grid[go_types.Point(0, 1)] = _stone(go_types.Player.Black)
+        self.grid[go_types.Point(3, 4)] = _stone(go_types.Player.White)
+
+    def test_only_stores_stones(self):
+        self.assertEqual(len(self.grid), 2)
+        self.assertFalse(self.grid[go_types.Point(2, 2)])
+        self.grid[go_types.Point(0, 1)] = go_types.NULL_CHUNK
+        self.assertEqual(len(self.grid), 1)
+        self.assertEqual(list(self.grid.sparse_iter()), [go_types.Point(3, 4)])
+
+    def test_out_of_bounds(self):
+        self.assertNotIn(go_types.Point(5, 0), self.grid)
+        with self.assertRaises(KeyError):
+            self.grid[go_types.Point(5, 0)]
+
+    def test_rotate_mask_resize(self):
+        self.grid.rotate(flip_x=True, flip_y=False)
+        self.assertEqual(
+            list(self.grid.sparse_iter()), [go_types.Point(1, 4), go_types.Point(4, 1)]
+        )
+        self.grid.mask([go_types.Point(4, 1), go_types.Point(0, 0)])
+        self.assertEqual(list(self.grid.sparse_iter()), [go_types.Point(4, 1)])
+        self.grid.resize(3)
+        self.assertEqual(len(self.grid), 0)
+
+    def test_dict_round_trip(self):
+        grid = go_types.Grid.from_dict(self.grid.to_dict())
+        self.assertEqual(list(grid.sparse_iter()), list(self.grid.sparse_iter()))
+
+    def test_array_round_trip(self):
+        self.grid[go_types.Point(2, 2)] = _stone(go_types.Player.Spec1)
+        grid = go_types.Grid.from_array(self.grid.to_array())
+        self.assertEqual(grid.to_dict(), self.grid.to_dict())
+        self.assertEqual(grid.bitboard(go_types.Player.White), 1 << 19)
+
+    def test_unpickle_dense_grid(self):
+        # Grids used to store NULL_CHUNK on every empty point, and were pickled
+        # as their __dict__.
+        self.grid._grid[go_types.Point(2, 2)] = go_types.NULL_CHUNK
+        f = io.BytesIO()
+        _OldPickler(f).dump(self.grid)
+        self.assertEqual(len(pickle.loads(f.getvalue())), 2)
+
+    def test_bytes_round_trip(self):
+        for size in (3, 5, 19):
+            grid = go_types.Grid(size)
+            for i, player in enumerate(go_types.Player):
+                grid[go_types.Point(i % size, (2 * i) % size)] = _stone(player)
+            data = grid.to_bytes()
+            self.assertEqual(len(data), 3 + -(-size * size // 2))
+            np.testing.assert_array_equal(
+                go_types.Grid.from_bytes(data, groups=False).to_array(), grid.to_array()
+            )
+        self.assertEqual(len(self.grid.to_bytes()), 3 + -(-25 // 4))
+        self.assertEqual(len(go_types.Grid().to_bytes()), 3 + 91)
+        with self.assertRaises(exceptions.FormatError):
+            go_types.Grid.from_bytes(self.grid.to_bytes()[:-1])
+
+    def test_pickle(self):
+        grid = pickle.loads(pickle.dumps(self.grid))
+        np.testing.assert_array_equal(grid.to_array(), self.grid.to_array())
+        self.assertEqual(grid.bitboard(), self.grid.bitboard())
+        # The chonks are rebuilt
+        self.assertEqual(
+            grid[go_types.Point(0, 1)].liberties,
+            {go_types.Point(0, 0), go_types.Point(0, 2), go_types.Point(1, 1)},
+        )
@@ -0,0 +1,285 @@
+"""Load tests the web app in app/, locally.
+
+Run with `python -m go_space load-test --concurrency 8 --requests 2000`.
+
+Requests are drawn from a weighted mix (by default, the page and its static
+files; add others with --request name path weight) and sent by concurrency
+threads, either through Flask's test client (--server client), which measures
+the app alone, or over HTTP to a threaded wsgiref server on localhost
+(--server wsgi), which adds the socket and server overhead.  Threads share the
+GIL, so this measures latency under concurrent load, not multi-core throughput.
+
+We report throughput and p50/p95/p99 latency, overall and per request name.
+--save writes the report as a JSON baseline, and --baseline compares against
+one.  With --slo_p99_ms, the command fails if the overall p99 is above it.
+"""
+
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import socketserver
+import sys
+import threading
+import time
+import wsgiref.simple_server
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import attr
+import numpy as np
+
+from go_space import consts
+
+
+APP_PATH = os.path.join(consts.TOP_LEVEL_PATH, "app", "main.py")
+PERCENTILES = (50, 95, 99)
+
+# Sends a GET for a path, and returns the status code
+Sender = Callable[[str], int]
+# Makes a Sender for each thread
+SenderFactory = Callable[[], Sender]
+
+
+@attr.s(frozen=True)
+class Request(object):
+    name: str = attr.ib()
+    path: str = attr.ib()
+    weight: float = attr.ib(default=1.0)
+
+
+DEFAULT_MIX = (
+    Request("page", "/", 4),
+    Request("script", "/static/loader.js", 4),
+    Request("image", "/static/img/bg.png", 4),
+    Request("image", "/static/img/B_stone.png", 2),
+    Request("image", "/static/img/W_stone.png", 2),
+)
+
+
+@attr.s(frozen=True)
+class Result(object):
+    name: str = attr.ib()
+    seconds: float = attr.ib()
+    # 0 if the request raised
+    status: int = attr.ib()
+
+
+def load_app(path: str = APP_PATH):
+    """Imports the Flask app from app/main.py, which isn't part of the package."""
+    spec = importlib.util.spec_from_file_location("go_space_app", path)
+    module = importlib.util.module_from_spec(spec)
+    # Flask finds the templates and static files through sys.modules.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module.app
+
+
+def schedule(mix: Sequence[Request], num_requests: int, seed: int = 0) -> List[Request]:
+    """The requests to send, in order, drawn from the mix by weight."""
+    rng = random.Random(seed)
+    return rng.choices(list(mix), weights=[r.weight for r in mix], k=num_requests)
+
+
+def flask_client_senders(app) -> SenderFactory:
+    def factory() -> Sender:
+        client = app.test_client()
+
+        def send(path: str) -> int:
+            response = client.get(path)
+            response.close()
+            return response.status_code
+
+        return send
+
+    return factory
+
+
+def http_senders(host: str, port: int) -> SenderFactory:
+    def factory() -> Sender:
+        def send(path: str) -> int:
+            conn = http.client.HTTPConnection(host, port)
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                return response.status
+            finally:
+                conn.close()
+
+        return send
+
+    return factory
+
+
+class _ThreadingWSGIServer(socketserver.ThreadingMixIn, wsgiref.simple_server.WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(wsgiref.simple_server.WSGIRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+class LocalServer(object):
+    """Serves a WSGI app on a free localhost port, from a background thread."""
+
+    def __init__(self, app):
+        self.server = wsgiref.simple_server.make_server(
+            "127.0.0.1", 0, app, server_class=_ThreadingWSGIServer, handler_class=_QuietHandler
+        )
+        self.server.request_queue_size = 128
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.server.server_port
+
+    def __enter__(self) -> "LocalServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+
+def run(
+    requests: List[Request], senders: SenderFactory, concurrency: int
+) -> Tuple[List[Result], float]:
+    """Sends requests from concurrency threads.  Returns the results and wall seconds."""
+    results: List[Optional[Result]] = [None] * len(requests)
+    next_ind = iter(range(len(requests)))
+    lock = threading.Lock()
+
+    def worker() -> None:
+        send = senders()
+        while True:
+            with lock:
+                i = next(next_ind, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                status = send(requests[i].path)
+            except Exception:
+                status = 0
+            results[i] = Result(requests[i].name, time.perf_counter() - start, status)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def _stats(results: List[Result], wall_seconds: float) -> Dict[str, float]:
+    ms = 1000 * np.array([r.seconds for r in results])
+    result = {
+        "requests": len(results),
+        "errors": sum(1 for r in results if not 200 <= r.status < 400),
+        "requests_per_second": len(results) / wall_seconds,
+    }
+    for p in PERCENTILES:
+        result[f"p{p}_ms"] = float(np.percentile(ms, p))
+    return result
+
+
+def summarize(results: List[Result], wall_seconds: float) -> Dict[str, Dict[str, float]]:
+    """Stats for all requests under "all", and for each request name.
+
+    Throughput per name is that name's share of the total.
+    """
+    summary = {"all": _stats(results, wall_seconds)}
+    for name in sorted({r.name for r in results}):
+        summary[name] = _stats([r for r in results if r.name == name], wall_seconds)
+    return summary
+
+
+def compare(summary: Dict, baseline: Dict) -> List[str]:
+    """Lines of the change in each percentile, for names in both."""
+    lines = list()
+    for name, stats in summary.items():
+        if name not in baseline:
+            continue
+        changes = list()
+        for key in ["requests_per_second"] + [f"p{p}_ms" for p in PERCENTILES]:
+            old, new = baseline[name][key], stats[key]
+            change = f"{100 * (new - old) / old:+.0f}%" if old else "n/a"
+            changes.append(f"{key} {old:.2f} -> {new:.2f} ({change})")
+        lines.append(f"{name}: " + ", ".join(changes))
+    return lines
+
+
+def _print_summary(summary: Dict[str, Dict[str, float]]) -> None:
+    header = ["name", "requests", "errors", "req/s"] + [f"p{p} ms" for p in PERCENTILES]
+    print("".join(f"{h:>12}" for h in header))
+    for name, stats in summary.items():
+        row = [name, stats["requests"], stats["errors"], f"{stats['requests_per_second']:.1f}"]
+        row += [f"{stats[f'p{p}_ms']:.2f}" for p in PERCENTILES]
+        print("".join(f"{str(v):>12}" for v in row))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load tests the web app locally.")
+    parser.add_argument("--server", choices=["client", "wsgi"], default="client")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=50, help="Requests sent before timing")
+    parser.add_argument(
+        "--request",
+        nargs=3,
+        action="append",
+        metavar=("NAME", "PATH", "WEIGHT"),
+        help="Add to the request mix.  If given, replaces the default mix.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app_path", type=str, default=APP_PATH)
+    parser.add_argument("--save", type=str, default=None, help="Write the report here as JSON")
+    parser.add_argument("--baseline", type=str, default=None, help="A report to compare with")
+    parser.add_argument("--slo_p99_ms", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    mix = DEFAULT_MIX
+    if args.request:
+        mix = [Request(name, path, float(weight)) for name, path, weight in args.request]
+    requests = schedule(mix, args.warmup + args.requests, args.seed)
+
+    app = load_app(args.app_path)
+
+    def measure(senders: SenderFactory) -> Tuple[List[Result], float]:
+        run(requests[: args.warmup], senders, args.concurrency)
+        return run(requests[args.warmup :], senders, args.concurrency)
+
+    if args.server == "client":
+        results, wall_seconds = measure(flask_client_senders(app))
+    else:
+        with LocalServer(app) as server:
+            results, wall_seconds = measure(http_senders("127.0.0.1", server.port))
+
+    summary = summarize(results, wall_seconds)
+    _print_summary(summary)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["summary"]
+        print()
+        print("\n".join(compare(summary, baseline)))
+    if args.save:
+        report = {"config": vars(args), "mix": [attr.asdict(r) for r in mix], "summary": summary}
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.slo_p99_ms is not None:
+        p99 = summary["all"]["p99_ms"]
+        ok = p99 <= args.slo_p99_ms
+        print(f"p99 {p99:.2f} ms, SLO {args.slo_p99_ms:.2f} ms: {'met' if ok else 'missed'}")
+        if not ok:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import collections
+import json
+import unittest
+
+from go_space import load_harness
+
+
+def _wsgi_app(environ, start_response):
+    """Stands in for the Flask app."""
+    path = environ["PATH_INFO"]
+    if path == "/missing":
+        start_response("404 Not Found", [("Content-Type", "text/plain")])
+        return [b"missing"]
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [path.encode()]
+
+
+class LoadHarnessTest(unittest.TestCase):
+    def setUp(self):
+        self.mix = [
+            load_harness.Request("page", "/", 3),
+            load_harness.Request("image", "/static/img/bg.png", 1),
+            load_harness.Request("missing", "/missing", 1),
+        ]
+
+    def test_schedule(self):
+        requests = load_harness.schedule(self.mix, 5000)
+        self.assertEqual(requests, load_harness.schedule(self.mix, 5000))
+        counts = collections.Counter(r.name for r in requests)
+        self.assertAlmostEqual(counts["page"] / 5000, 0.6, delta=0.03)
+
+    def test_wsgi_server(self):
+        requests = load_harness.schedule(self.mix, 200)
+        with load_harness.LocalServer(_wsgi_app) as server:
+            senders = load_harness.http_senders("127.0.0.1", server.port)
+            results, wall_seconds = load_harness.run(requests, senders, concurrency=4)
+
+        self.assertEqual([r.name for r in results], [r.name for r in requests])
+        summary = load_harness.summarize(results, wall_seconds)
+        self.assertEqual(summary["all"]["requests"], 200)
+        self.assertEqual(summary["missing"]["errors"], summary["missing"]["requests"])
+        self.assertEqual(summary["page"]["errors"], 0)
+        stats = summary["all"]
+        self.assertTrue(0 < stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"])
+        self.assertAlmostEqual(
+            sum(summary[name]["requests_per_second"] for name in ("page", "image", "missing")),
+            stats["requests_per_second"],
+        )
+
+        # Round trips through JSON, and compares against itself
+        baseline = json.loads(json.dumps(summary))
+        lines = load_harness.compare(summary, baseline)
+        self.assertEqual(len(lines), 4)
+        self.assertIn("(+0%)", lines[0])
+
+    def test_failed_requests(self):
+        def senders():
+            def send(path):
+                raise ConnectionError
+
+            return send
+
+        results, _ = load_harness.run(load_harness.schedule(self.mix, 10), senders, 2)
+        self.assertEqual({r.status for r in results}, {0})
+
+
+if __name__ == "__main__":
+    unittest.main()
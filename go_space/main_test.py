@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+from go_space import __main__, consts
+
+
+REPO_PATH = os.path.dirname(consts.TOP_LEVEL_PATH)
+
+HEAVY_MODULES = ("keras", "tensorflow", "sklearn", "matplotlib", "pandas", "seaborn")
+
+# Generous, so that slow CI machines don't flake.
+IMPORT_BUDGET_SECONDS = 1.0
+
+
+def _run_python(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout
+
+
+class MainTest(unittest.TestCase):
+    def test_imports_are_light(self):
+        modules = sorted({module for module, _ in __main__.COMMANDS.values()})
+        code = "\n".join(
+            ["import sys, time", "start = time.time()"]
+            + [f"import {module}" for module in modules]
+            + [
+                "print(time.time() - start)",
+                f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+            ]
+        )
+        seconds, heavy = _run_python(code).splitlines()
+        self.assertEqual(heavy, "")
+        self.assertLess(float(seconds), IMPORT_BUDGET_SECONDS)
+
+    def test_print_class_is_quick(self):
+        start = time.time()
+        result = subprocess.run(
+            [sys.executable, "-m", "go_space", "print-class", "make-eye-space"],
+            cwd=REPO_PATH,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertLess(time.time() - start, IMPORT_BUDGET_SECONDS)
+        self.assertIn("#", result.stdout)
@@ -1,6 +1,8 @@
 # We translate boards into corner plays.  We'l consider a move a "corner play"
-# when it's played in the corner 4x4 board.  Whenever one happens, we record a
-# big surrounding portion, labeled by x's.
+# when it's played in the 4x4 box of any corner.  Whenever one happens, we record a
+# big surrounding portion, labeled by x's, flipped into the top-left corner.
+# White's moves are recorded with the colors swapped, so that the player to
+# move is always Black.
 # xxxxxxxx.
 # xxxxxxxx.
 # xxxxxxxx.
@@ -13,15 +15,21 @@
 #
 # Expand this to an 11x11 before saving.  This is so that the CNN doesn't think
 # the non-edges are edges.
+#
+# Run with `python -m go_space build-nn-data`.
 
+import argparse
+import functools
 import glob
+import multiprocessing
 import os
-from typing import Iterator, Tuple
+from typing import Iterator, List, Optional, Tuple
 
-import chardet
+import attr
 
 from go_space import board_lib, consts, exceptions, go_types
-from go_space.nn import data_manager, datum_lib
+from go_space.go_types import bitboard_lib
+from go_space.nn import data_manager, datum_lib, manifest_lib, shard_lib
 
 
 Path = str
@@ -34,27 +42,77 @@ class SgfFormatError(exceptions.FormatError):
     pass
 
 
+def decode_game(bites: bytes) -> str:
+    import chardet
+
+    return bites.decode(encoding=chardet.detect(bites)["encoding"])
+
+
 def read_game(fn):
     with open(fn, "rb") as f:
         bites = f.read()
-    return bites.decode(encoding=chardet.detect(bites)["encoding"])
+    return decode_game(bites)
+
+
+@functools.lru_cache(maxsize=None)
+def _trigger_box(box_size: int, size: int) -> bitboard_lib.Bitboard:
+    """The box_size x box_size box in each of the four corners."""
+    far = size - box_size
+    return (
+        bitboard_lib.box_mask(0, box_size, 0, box_size, size)
+        | bitboard_lib.box_mask(0, box_size, far, size, size)
+        | bitboard_lib.box_mask(far, size, 0, box_size, size)
+        | bitboard_lib.box_mask(far, size, far, size, size)
+    )
 
 
-def _triggering_move(datum: datum_lib.Datum, player: go_types.Player) -> bool:
-    if player == go_types.Player.White:
-        return False
-    r, c = datum.next_pt.row, datum.next_pt.col
-    # TODO: Magic numbers, bad
-    return (r < 4 and c < 4) and datum.data_size() >= 8
+@attr.s(frozen=True)
+class TriggerConfig(object):
+    """Which moves we record a datum for.
 
+    These are checked against the live board, before the (much more expensive)
+    Datum is built.
+    """
 
-def _get_data_from_sgf(sgf: str) -> Iterator[datum_lib.Datum]:
+    # Whose moves to record.  White's are recorded with the colors swapped.
+    players: Tuple[go_types.Player, ...] = attr.ib(
+        default=(go_types.Player.Black, go_types.Player.White)
+    )
+    # The move must be in the box_size x box_size box of a corner.  At most 4,
+    # because the model's target is the 4x4 corner.
+    box_size: int = attr.ib(default=4)
+    # Stones already in the move's corner region (see datum_lib.CORNER_ROWS)
+    min_stones: int = attr.ib(default=8)
+
+    @box_size.validator
+    def _check_box_size(self, attribute, value):
+        if not 1 <= value <= 4:
+            raise ValueError(f"box_size must be between 1 and 4, not {value}")
+
+    def triggers(self, grid: go_types.Grid, pt: go_types.Point, player: go_types.Player) -> bool:
+        if player not in self.players:
+            return False
+        if not bitboard_lib.contains(_trigger_box(self.box_size, grid.size), pt, grid.size):
+            return False
+        # The grid keeps its bitboards up to date as stones are placed and
+        # captured, so this count is cheap.
+        region = datum_lib.flipped_corner_mask(*datum_lib.corner_flips(pt), grid.size)
+        return bitboard_lib.popcount(grid.bitboard() & region) >= self.min_stones
+
+
+DEFAULT_TRIGGER = TriggerConfig()
+
+
+def _get_data_from_sgf(
+    sgf: str, trigger: TriggerConfig = DEFAULT_TRIGGER
+) -> Iterator[datum_lib.Datum]:
     """Loops through the moves played, yielding the "triggering moves"""
     board = board_lib.Board()
     for pt, player in loop_game(sgf):
-        datum = datum_lib.Datum(grid=board._grid.copy(), next_pt=pt)
-        if _triggering_move(datum, player):
-            yield datum
+        if trigger.triggers(board._grid, pt, player):
+            yield datum_lib.Datum.from_board_array(
+                board._grid.to_array(), pt, swap=player == go_types.Player.White
+            )
         board.place(pt, player)
 
 
@@ -86,31 +144,184 @@ def loop_game(sgf: str) -> Iterator[Tuple[go_types.Point, go_types.Player]]:
 
 
 NO_DATA_TO_SAVE = 40000
+# Save the manifest after this many source files.  A crash loses at most this much work.
+CHECKPOINT_EVERY = 20
 
 
-# TODO: Read tasks expect zero-indexed files.
-def translate_files(src_dir: Path, tgt_dir: Path) -> None:
-    dm = data_manager.DataManager(tgt_dir)
-    batch_num = 0
+def sgf_files(src_dir: Path) -> List[Path]:
+    """The .sgf files directly in src_dir, sorted."""
+    return sorted(glob.glob(os.path.join(src_dir, "*.sgf")))
 
-    for file in glob.glob(os.path.join(src_dir, "*.sgf")):
-        try:
-            # Queue because _get_data_from_sgf may fail part way
-            data_queue = list()
 
-            for datum in _get_data_from_sgf(read_game(file)):
-                if batch_num >= NO_DATA_TO_SAVE:
-                    return
-                data_queue.append(datum)
-                batch_num += 1
+def translate_files(
+    src_dir: Path,
+    tgt_dir: Path,
+    max_records: int = NO_DATA_TO_SAVE,
+    trigger: TriggerConfig = DEFAULT_TRIGGER,
+    page_format: Optional[str] = None,
+) -> None:
+    """Adds the data from any SGFs in src_dir that aren't yet in tgt_dir.
+
+    Sources are recognized by a hash of their content, so re-running on a
+    growing folder only processes the new games.  Stops once tgt_dir holds
+    max_records records.  See DataManager for page_format.
+    """
+    translate_sources(sgf_files(src_dir), tgt_dir, max_records, trigger, page_format)
+
+
+def translate_files_to_shards(
+    src_dir: Path,
+    shard_index: Path,
+    max_records: int = NO_DATA_TO_SAVE,
+    num_workers: int = 1,
+    trigger: TriggerConfig = DEFAULT_TRIGGER,
+    page_format: Optional[str] = None,
+) -> None:
+    """Like translate_files, but spreads the SGFs over the shards in shard_index.
+
+    Each shard is written by its own process, up to num_workers at a time.
+    """
+    index = shard_lib.ShardIndex.load(shard_index)
+    files_by_shard = [list() for _ in range(len(index))]
+    for file in sgf_files(src_dir):
+        files_by_shard[index.shard_for_file(file)].append(file)
+
+    shard_max = shard_lib.records_per_shard(index, max_records)
+    tasks = [
+        (files, index.shard_path(i), shard_max, trigger, page_format)
+        for i, files in enumerate(files_by_shard)
+    ]
+    with multiprocessing.Pool(num_workers) as pool:
+        pool.starmap(translate_sources, tasks)
+
+
+def translate_sources(
+    files: List[Path],
+    tgt_dir: Path,
+    max_records: int = NO_DATA_TO_SAVE,
+    trigger: TriggerConfig = DEFAULT_TRIGGER,
+    page_format: Optional[str] = None,
+) -> None:
+    dm = data_manager.DataManager(tgt_dir, page_format=page_format)
+
+    with dm.writer() as writer:
+        files_since_checkpoint = 0
+        for file in files:
+            if writer.size() >= max_records:
+                break
+
+            with open(file, "rb") as f:
+                bites = f.read()
+            source_id = manifest_lib.sha1(bites)
+            if dm.has_source(source_id):
+                continue
+
+            try:
+                # Listed first, because _get_data_from_sgf may fail part way
+                data = list(_get_data_from_sgf(decode_game(bites), trigger))
+            except Exception as e:
+                print(f"Failed to parse file: {file}")
+                dm.note_source(source_id, os.path.basename(file), 0, error=repr(e))
+            else:
+                writer.save_many(data)
+                dm.note_source(source_id, os.path.basename(file), len(data))
+
+            files_since_checkpoint += 1
+            if files_since_checkpoint == CHECKPOINT_EVERY:
+                writer.checkpoint()
+                files_since_checkpoint = 0
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Translates SGFs into training data.")
+    parser.add_argument(
+        "--src_dir",
+        type=str,
+        default=os.path.join(consts.TOP_LEVEL_PATH, "data", "_data"),
+        help="Folder of SGF files",
+    )
+    parser.add_argument(
+        "--tgt_dir",
+        type=str,
+        default=os.path.join(consts.TOP_LEVEL_PATH, "data", "_processed_data"),
+        help="Folder to write pages of data to",
+    )
+    parser.add_argument(
+        "--max_records",
+        type=int,
+        default=NO_DATA_TO_SAVE,
+        help="Stop once the target holds this many records",
+    )
+    parser.add_argument(
+        "--shard_index",
+        type=str,
+        default=None,
+        help="Write to the shards in this index instead of tgt_dir",
+    )
+    parser.add_argument(
+        "--shard_dirs",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Create the shard index, with shards spread over these folders",
+    )
+    parser.add_argument("--num_shards", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--trigger_players",
+        choices=["B", "W"],
+        nargs="+",
+        default=["B", "W"],
+        help="Record the moves of these players",
+    )
+    parser.add_argument(
+        "--trigger_box",
+        type=int,
+        default=DEFAULT_TRIGGER.box_size,
+        help="Record moves within this many lines of a corner",
+    )
+    parser.add_argument(
+        "--min_stones",
+        type=int,
+        default=DEFAULT_TRIGGER.min_stones,
+        help="Record moves with at least this many stones in the corner region",
+    )
+    parser.add_argument(
+        "--page_format",
+        choices=data_manager.PAGE_FORMATS,
+        default=None,
+        help="How to store new pages.  Existing folders keep their format.",
+    )
+    args = parser.parse_args(argv)
+
+    players = {"B": go_types.Player.Black, "W": go_types.Player.White}
+    trigger = TriggerConfig(
+        players=tuple(players[p] for p in args.trigger_players),
+        box_size=args.trigger_box,
+        min_stones=args.min_stones,
+    )
+
+    if args.shard_index is None:
+        translate_files(
+            src_dir=args.src_dir,
+            tgt_dir=args.tgt_dir,
+            max_records=args.max_records,
+            trigger=trigger,
+            page_format=args.page_format,
+        )
+        return
 
-            for datum in data_queue:
-                dm.save_datum(datum)
-        except:
-            print(f"Failed to parse file: {file}")
+    if args.shard_dirs:
+        shard_lib.ShardIndex.create(args.shard_index, args.shard_dirs, args.num_shards)
+    translate_files_to_shards(
+        src_dir=args.src_dir,
+        shard_index=args.shard_index,
+        max_records=args.max_records,
+        num_workers=args.workers,
+        trigger=trigger,
+        page_format=args.page_format,
+    )
 
 
-translate_files(
-    src_dir=os.path.join(consts.TOP_LEVEL_PATH, "data", "_data"),
-    tgt_dir=os.path.join(consts.TOP_LEVEL_PATH, "data", "_processed_data"),
-)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import random
+import unittest
+
+from go_space import board_lib, consts, go_types
+from go_space.nn import build_nn_data, datum_lib
+
+
+def _random_sgf(num_moves: int) -> str:
+    """A game played mostly in the corners, so that it triggers data."""
+    points = random.sample(
+        [(r, c) for r in range(19) for c in range(19) if min(r, 18 - r) < 7 and min(c, 18 - c) < 7],
+        num_moves,
+    )
+    moves = [
+        f"{'BW'[i % 2]}[{chr(ord('a') + c)}{chr(ord('a') + r)}]" for i, (r, c) in enumerate(points)
+    ]
+    return "(;GM[1]SZ[19];" + ";".join(moves) + ")"
+
+
+def _other(player: go_types.Player) -> go_types.Player:
+    return go_types.Player.White if player == go_types.Player.Black else go_types.Player.Black
+
+
+def _datum_first(sgf: str, trigger: build_nn_data.TriggerConfig):
+    """Builds a Datum for every move, and checks the trigger on it afterwards.
+
+    White's moves come from a second board, replayed with the colors swapped.
+    """
+    board, swapped = board_lib.Board(), board_lib.Board()
+    for pt, player in build_nn_data.loop_game(sgf):
+        grid = swapped._grid if player == go_types.Player.White else board._grid
+        datum = datum_lib.Datum(grid=grid.copy(), next_pt=pt)
+        if (
+            player in trigger.players
+            and datum.next_pt.row < trigger.box_size
+            and datum.next_pt.col < trigger.box_size
+            and datum.data_size() >= trigger.min_stones
+        ):
+            yield datum
+        board.place(pt, player)
+        swapped.place(pt, _other(player))
+
+
+class TriggerTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+
+    def test_matches_datum_first(self):
+        configs = [
+            build_nn_data.DEFAULT_TRIGGER,
+            build_nn_data.TriggerConfig(players=(go_types.Player.Black,)),
+            build_nn_data.TriggerConfig(min_stones=0),
+            build_nn_data.TriggerConfig(box_size=2, min_stones=3),
+        ]
+        for _ in range(10):
+            sgf = _random_sgf(120)
+            for trigger in configs:
+                expected = [d.to_json() for d in _datum_first(sgf, trigger)]
+                actual = [d.to_json() for d in build_nn_data._get_data_from_sgf(sgf, trigger)]
+                self.assertEqual(actual, expected)
+
+    def test_default_triggers_some(self):
+        total = sum(len(list(build_nn_data._get_data_from_sgf(_random_sgf(150)))) for _ in range(5))
+        self.assertGreater(total, 0)
+
+    def test_box_size_limit(self):
+        with self.assertRaises(ValueError):
+            build_nn_data.TriggerConfig(box_size=5)
+
+    def test_trigger_box(self):
+        box = build_nn_data._trigger_box(4, consts.SIZE)
+        for r in range(consts.SIZE):
+            for c in range(consts.SIZE):
+                folded_r, folded_c = go_types.Point(r, c).mod_row_col()
+                self.assertEqual(
+                    bool(box >> (r * consts.SIZE + c) & 1), folded_r < 4 and folded_c < 4
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
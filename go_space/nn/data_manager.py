@@ -4,7 +4,7 @@ import enum
 import math
 import os
 import random
-from typing import Any, Iterator, List, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import attr
 import glob
@@ -12,7 +12,7 @@ import numpy as np
 
 from go_space import exceptions
 
-from . import datum_lib
+from . import datum_lib, manifest_lib, page_lib, sampler_lib
 
 
 Batch = Any  # List[np.ndarray, np.ndarray]
@@ -20,6 +20,14 @@ Data = List[datum_lib.Datum]
 
 PAGE_SIZE = 200
 PAGES_IN_MEMORY = 10
+# Blocks of compressed pages, read by _read_entry
+BLOCKS_IN_MEMORY = 40
+
+# How pages are stored.  TEXT_FORMAT pages are a line of JSON per record.  The
+# others are block-compressed pages of Datum.to_bytes records (see page_lib),
+# where reading a single entry only decompresses its block.
+TEXT_FORMAT = "text"
+PAGE_FORMATS = (TEXT_FORMAT,) + tuple(page_lib.CODECS)
 
 
 class TrainTest(enum.Enum):
@@ -38,31 +46,190 @@ class Page(object):
 
 # TODO: Clean up
 class DataManager(object):
-    def __init__(self, tgt_dir):
+    def __init__(self, tgt_dir, seed: Optional[int] = None, page_format: Optional[str] = None):
+        """Opens the folder tgt_dir.
+
+        page_format is one of PAGE_FORMATS, and is only needed to make a new
+        folder (or an empty one) in something other than TEXT_FORMAT.  A folder
+        keeps the format it was made with.
+        """
         # TODO: Rename cursors to be include "write".  These are a mess.
+        # The page being written, and the number of entries on it.
         self.page_cursor = -1
         self.entry_cursor = 0
         self.test_pages = set()
         self._page_cache = list()
+        self._block_cache = list()
+        self._page_indexes: Dict[int, page_lib.PageIndex] = dict()
 
         self.data_path = tgt_dir
 
         # Used in the course of generating batches
-        self.reset()
-
-        self._note_existing_pages()
-
-    def _note_existing_pages(self) -> None:
-        # Assumes files are written 1, 2, ..., n
-        num_files = len(glob.glob(os.path.join(self.data_path, "*.txt")))
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self._samplers: Dict[TrainTest, sampler_lib.EpochSampler] = dict()
+
+        # Whether pages written since the last checkpoint have been rolled back
+        self._rolled_back = False
+        self._note_existing_pages(page_format)
+
+    @property
+    def page_format(self) -> str:
+        return self.manifest.page_format
+
+    def _page_extension(self) -> str:
+        return ".txt" if self.page_format == TEXT_FORMAT else ".blk"
+
+    def _page_path(self, page_num: int) -> str:
+        return os.path.join(self.data_path, str(page_num) + self._page_extension())
+
+    def _pages_on_disk(self) -> Iterator[Tuple[int, str]]:
+        extension = self._page_extension()
+        for path in glob.glob(os.path.join(self.data_path, "*" + extension)):
+            name = os.path.basename(path)[: -len(extension)]
+            if name.isdigit():
+                yield int(name), path
+
+    def _note_existing_pages(self, page_format: Optional[str]) -> None:
+        """Loads the manifest.  Pages it doesn't list are ignored until a writer is opened."""
+        if page_format not in (None,) + PAGE_FORMATS:
+            raise exceptions.DataException(f"Unknown page format {page_format}")
+        self.manifest = manifest_lib.Manifest.load(self.data_path)
+        if self.manifest is None:
+            self.manifest = manifest_lib.Manifest(page_format=page_format or self._format_on_disk())
+            self._note_pages_on_disk()
+        if page_format is not None and page_format != self.page_format:
+            if self.manifest.pages:
+                raise exceptions.DataException(
+                    f"{self.data_path} holds {self.page_format} pages, not {page_format}"
+                )
+            self.manifest.page_format = page_format
+        self._set_cursors()
+
+    def _set_cursors(self) -> None:
+        """Points the cursors at the end of the last page in the manifest."""
+        self.page_cursor, self.entry_cursor = -1, 0
+        if self.manifest.pages:
+            self.page_cursor = max(self.manifest.pages)
+            self.entry_cursor = self.manifest.pages[self.page_cursor].records
+
+    def _format_on_disk(self) -> str:
+        """For a folder without a manifest, the format of its compressed pages, if any."""
+        for path in sorted(glob.glob(os.path.join(self.data_path, "*.blk"))):
+            if os.path.basename(path)[: -len(".blk")].isdigit():
+                with open(path, "rb") as f:
+                    try:
+                        return page_lib.read_index(f).codec
+                    except exceptions.FormatError as e:
+                        raise exceptions.DataException(f"{path} is corrupt: {e}")
+        return TEXT_FORMAT
+
+    def _note_pages_on_disk(self) -> None:
+        """For folders written before we kept manifests, or that lost theirs.
+
+        Trusts the pages on disk.
+        """
+        for page_num, _ in self._pages_on_disk():
+            records = self._read_records(page_num)
+            self.manifest.pages[page_num] = manifest_lib.PageInfo(
+                records=len(records), sha1=manifest_lib.sha1(b"".join(records))
+            )
 
-        self.page_cursor = num_files
-        self.entry_cursor = 0
-        if os.path.exists(os.path.join(self.data_path, str(self.page_cursor) + ".txt")):
-            self.entry_cursor = len(self._read_page(self.page_cursor))
+    def _roll_back(self) -> None:
+        """Undoes anything written since the last checkpoint, before writing more."""
+        if self._rolled_back:
+            return
+        on_disk = set()
+        for page_num, path in self._pages_on_disk():
+            info = self.manifest.pages.get(page_num)
+            if info is None:
+                # Started after the last checkpoint
+                os.remove(path)
+                continue
+            on_disk.add(page_num)
+
+            records = self._read_records(page_num)
+            if len(records) > info.records:
+                records = records[: info.records]
+                self._write_page_file(page_num, records)
+            if manifest_lib.sha1(b"".join(records)) != info.sha1:
+                raise exceptions.DataException(f"Page {page_num} doesn't match the manifest")
+
+        if missing := set(self.manifest.pages) - on_disk:
+            raise exceptions.DataException(f"Pages {sorted(missing)} are missing")
+        if not os.path.exists(os.path.join(self.data_path, manifest_lib.MANIFEST_FILE)):
+            # So that _reload has a checkpoint to go back to
+            self.manifest.save(self.data_path)
+        self._rolled_back = True
+
+    def _reload(self) -> None:
+        """Forgets everything since the last checkpoint, after a writer failed."""
+        self.manifest = manifest_lib.Manifest.load(self.data_path)
+        self._set_cursors()
+        self._page_cache, self._block_cache, self._page_indexes = list(), list(), dict()
+        self._samplers = dict()
+        self._rolled_back = False
+
+    def num_pages(self) -> int:
+        return len(self.manifest.pages)
+
+    def has_source(self, source_id: str) -> bool:
+        return source_id in self.manifest.sources
+
+    def note_source(
+        self, source_id: str, file_name: str, records: int, error: Optional[str] = None
+    ) -> None:
+        """Records that a source has been processed.  Saved at the next checkpoint."""
+        self.manifest.sources[source_id] = manifest_lib.SourceInfo(
+            file_name=file_name, records=records, error=error
+        )
+
+    def writer(self) -> "PageWriter":
+        return PageWriter(self)
+
+    def _encode(self, datum: datum_lib.Datum) -> bytes:
+        if self.page_format == TEXT_FORMAT:
+            return (datum.to_json() + "\n").encode()
+        return datum.to_bytes()
+
+    def _decode(self, record: bytes) -> datum_lib.Datum:
+        if self.page_format == TEXT_FORMAT:
+            return datum_lib.Datum.from_json(record)
+        return datum_lib.Datum.from_bytes(record)
+
+    def _read_records(self, page_num: int) -> List[bytes]:
+        """The encoded records on a page, as written by _write_page."""
+        if self.page_format == TEXT_FORMAT:
+            with open(self._page_path(page_num), "rb") as f:
+                return f.readlines()
+        try:
+            return page_lib.read_page(self._page_path(page_num))
+        except exceptions.FormatError as e:
+            raise exceptions.DataException(f"Page {page_num} is corrupt: {e}")
+
+    def _write_page_file(self, page_num: int, records: List[bytes]) -> None:
+        """Writes a whole page at once, replacing any old version atomically."""
+        if self.page_format == TEXT_FORMAT:
+            content = b"".join(records)
+        else:
+            content = page_lib.encode_page(records, self.page_format)
+        path = self._page_path(page_num)
+        with open(path + ".tmp", "wb") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+
+        self._page_cache = [p for p in self._page_cache if p.page_num != page_num]
+        self._block_cache = [b for b in self._block_cache if b[0] != page_num]
+        self._page_indexes.pop(page_num, None)
+
+    def _write_page(self, page_num: int, records: List[bytes]) -> None:
+        self._write_page_file(page_num, records)
+        self.manifest.pages[page_num] = manifest_lib.PageInfo(
+            records=len(records), sha1=manifest_lib.sha1(b"".join(records))
+        )
 
     def _read_page(self, page_num: int) -> Page:
-        if page_num > self.page_cursor:
+        info = self.manifest.pages.get(page_num)
+        if info is None:
             raise exceptions.DataException(f"Page {page_num} doesn't exist")
 
         # Check cache first
@@ -70,101 +237,102 @@ class DataManager(object):
             if page.page_num == page_num:
                 return page
 
-        # Read with an LRU cache
-        page_data = list()
-        with open(os.path.join(self.data_path, str(page_num) + ".txt"), "r") as f:
-            for line in f.readlines():
-                page_data.append(datum_lib.Datum.from_json(line))
+        # Read with an LRU cache.  Records past the last checkpoint are ignored.
+        records = self._read_records(page_num)[: info.records]
+        if manifest_lib.sha1(b"".join(records)) != info.sha1:
+            raise exceptions.DataException(f"Page {page_num} doesn't match the manifest")
+        page_data = [self._decode(record) for record in records]
         page = Page(page_num=page_num, content=page_data)
         self._page_cache = [page] + self._page_cache
         self._page_cache = self._page_cache[:PAGES_IN_MEMORY]
         return page
 
+    def _read_block_entry(self, page_num: int, entry_num: int) -> datum_lib.Datum:
+        """An entry of a compressed page.  Only decompresses its block, with an LRU cache."""
+        index = self._page_indexes.get(page_num)
+        if index is not None:
+            block, position = index.block_of(entry_num)
+            for cached_page, cached_block, data in self._block_cache:
+                if (cached_page, cached_block) == (page_num, block):
+                    return data[position]
+
+        with open(self._page_path(page_num), "rb") as f:
+            if index is None:
+                index = self._page_indexes[page_num] = page_lib.read_index(f)
+                block, position = index.block_of(entry_num)
+            records = page_lib.read_block(f, index, block)
+        data = [self._decode(record) for record in records]
+        self._block_cache = [(page_num, block, data)] + self._block_cache
+        self._block_cache = self._block_cache[:BLOCKS_IN_MEMORY]
+        return data[position]
+
     def _read_entry(self, page_num: int, entry_num: int) -> datum_lib.Datum:
-        page = self._read_page(page_num)
-        if entry_num >= len(page):
+        if page_num not in self.manifest.pages:
+            raise exceptions.DataException(f"Page {page_num} doesn't exist")
+        num_entries = self.manifest.pages[page_num].records
+        if entry_num >= num_entries:
             raise exceptions.DataException(
-                f"Trying to read entry {entry_num} off of page {page_num}, but entries only go to {len(page)-1}."
+                f"Trying to read entry {entry_num} off of page {page_num}, but entries only go to {num_entries-1}."
             )
-        return page.content[entry_num]
+
+        if self.page_format != TEXT_FORMAT:
+            # Unless the whole page is in memory, just decompress the entry's block.
+            if not any(page.page_num == page_num for page in self._page_cache):
+                return self._read_block_entry(page_num, entry_num)
+        return self._read_page(page_num).content[entry_num]
+
+    def sampler(self, data_split: TrainTest) -> sampler_lib.EpochSampler:
+        """Decides the order that get_batch reads the data_split pages in."""
+        if data_split not in self._samplers:
+            page_sizes = [(p, self.manifest.pages[p].records) for p in self.pages(data_split)]
+            self._samplers[data_split] = sampler_lib.EpochSampler(page_sizes, seed=self.seed)
+        return self._samplers[data_split]
+
+    def steps_per_epoch(self, batch_size: int, data_split: TrainTest) -> int:
+        return self.sampler(data_split).steps_per_epoch(batch_size)
 
     def _choose_next(self, data_split: TrainTest) -> Tuple[int, int]:
-        # Pick a random page, then go through the data on that page in order.  Subject to change, I suppose.
-        def choose_new_page() -> int:
-            if data_split == TrainTest.TRAIN:
-                if len(self._read_train_pages | self.test_pages) == self.page_cursor:
-                    raise exceptions.DataException("Tried to read too many pages.")
-            if data_split == TrainTest.TEST:
-                if len(self._read_test_pages) == len(self.test_pages):
-                    raise exceptions.DataException("Tried to read too many pages.")
-
-            def already_read(try_page: Page) -> bool:
-                nonlocal data_split
-                if data_split == TrainTest.TRAIN:
-                    return try_page in self._read_train_pages
-                if data_split == TrainTest.TEST:
-                    return try_page in self._read_test_pages
-
-            def wrong_data(try_page: Page) -> bool:
-                nonlocal data_split
-                if data_split == TrainTest.TRAIN:
-                    return try_page in self.test_pages
-                if data_split == TrainTest.TEST:
-                    return try_page not in self.test_pages
-
-            try_page = random.randint(0, self.page_cursor - 1)
-            while already_read(try_page) or wrong_data(try_page):
-                try_page = random.randint(0, self.page_cursor - 1)
-
-            # Mark as read
-            if data_split == TrainTest.TRAIN:
-                self._read_train_pages.add(try_page)
-            if data_split == TrainTest.TEST:
-                self._read_test_pages.add(try_page)
-
-            return try_page
-
-        if self._on_page == -1:
-            self._on_page = choose_new_page()
-            self._read_cursor = 0
-        if self._read_cursor >= len(self._read_page(self._on_page)):
-            self._on_page = choose_new_page()
-            self._read_cursor = 0
-
-        result = (self._on_page, self._read_cursor)
-        self._read_cursor += 1
-        return result
+        return self.sampler(data_split).next_item()
 
     def size(self) -> int:
-        return (self.page_cursor - 1) * PAGE_SIZE + self.entry_cursor
+        return self.manifest.num_records()
 
     def save_datum(self, datum: datum_lib.Datum) -> None:
-        if self.page_cursor == -1 or self.entry_cursor == PAGE_SIZE:
-            self.page_cursor += 1
-            self.entry_cursor = 0
-
-        with open(
-            os.path.join(self.data_path, str(self.page_cursor) + ".txt"), "a"
-        ) as f:
-            f.write(datum.to_json() + "\n")
-        self.entry_cursor += 1
-
-    def train_test_split(self, portion_test: float) -> None:
-        # Will split on a page level
+        """Saves one datum and checkpoints.
+
+        This rewrites the datum's page and the manifest, so don't call it in a
+        loop.  To save many, use writer() or save_many.
+        """
+        self.save_many([datum])
+
+    def save_many(self, data: Data) -> None:
+        with self.writer() as writer:
+            writer.save_many(data)
+
+    def train_test_split(self, portion_test: float, seed: Optional[Any] = None) -> None:
+        """Will split on a page level.  Passing a seed makes the split repeatable."""
         if len(self.test_pages) > 0:
             raise exceptions.DataException("Ran train_test_split multiple times.")
-        if self.page_cursor == -1:
+        if self.num_pages() == 0:
             raise exceptions.DataException("No data saved.")
 
-        num_test_pages = math.ceil(self.page_cursor * portion_test)
-        for page in random.sample(range(self.page_cursor), num_test_pages):
+        rng = random if seed is None else random.Random(seed)
+        num_test_pages = math.ceil(self.num_pages() * portion_test)
+        for page in rng.sample(sorted(self.manifest.pages), num_test_pages):
             self.test_pages.add(page)
+        self._samplers = dict()
+
+    def pages(self, data_split: TrainTest) -> List[int]:
+        """Page numbers in the given split, in order."""
+        if data_split == TrainTest.TEST:
+            return sorted(self.test_pages)
+        return [p for p in sorted(self.manifest.pages) if p not in self.test_pages]
 
     def get_batch(
         self, batch_size: int, data_split: TrainTest, reset: bool = True
     ) -> Batch:
         # Should be semi-random.
-        if self.page_cursor == -1:
+        if self.num_pages() == 0:
             raise exceptions.DataException("No data saved.")
 
         if reset:
@@ -178,15 +346,81 @@ class DataManager(object):
         return np.stack(features, axis=0), np.stack(targets, axis=0)
 
     def reset(self) -> None:
-        """Needs to be called between looping batches"""
-        print("RESET")
-        self._read_train_pages = set()
-        self._read_test_pages = set()
-        self._on_page = -1
-        self._read_cursor = 0
+        """Starts the next epoch.  Needs to be called between looping batches"""
+        for sampler in self._samplers.values():
+            sampler.next_epoch()
 
     def generate_batches(
         self, batch_size: int, data_split: TrainTest
     ) -> Iterator[Batch]:
         while True:
             yield self.get_batch(batch_size, data_split, reset=False)
+
+
+class PageWriter(object):
+    """Buffers a page in memory, and writes it to disk with a single write.
+
+    Pages are written when full, and at checkpoints, which also save the
+    manifest.  Use as a context manager, which checkpoints on a clean exit:
+
+        with data_manager.writer() as writer:
+            writer.save_many(data)
+
+    If anything goes wrong, whatever wasn't checkpointed is ignored by readers,
+    and rolled back the next time a writer is opened on the folder.  Because
+    pages are replaced atomically, there's never a half-written page on disk.
+    On an exception, the DataManager itself goes back to the last checkpoint.
+    """
+
+    def __init__(self, data_manager: DataManager):
+        self._dm = data_manager
+        self._dm._roll_back()
+        self._records: List[bytes] = list()
+        # Whether _records has anything that isn't on disk yet
+        self._dirty = False
+        if self._dm.page_cursor != -1 and self._dm.entry_cursor < PAGE_SIZE:
+            # Continue the partially filled last page.
+            self._records = self._dm._read_records(self._dm.page_cursor)
+
+    def __enter__(self) -> "PageWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.checkpoint()
+        else:
+            self._dm._reload()
+
+    def save(self, datum: datum_lib.Datum) -> None:
+        dm = self._dm
+        if dm.page_cursor == -1 or dm.entry_cursor == PAGE_SIZE:
+            self.flush()
+            dm.page_cursor += 1
+            dm.entry_cursor = 0
+            self._records = list()
+
+        self._records.append(dm._encode(datum))
+        self._dirty = True
+        dm.entry_cursor += 1
+
+    def save_many(self, data: Data) -> None:
+        for datum in data:
+            self.save(datum)
+
+    def size(self) -> int:
+        """Records in the folder, including any not yet written."""
+        dm = self._dm
+        if not self._dirty:
+            return dm.size()
+        info = dm.manifest.pages.get(dm.page_cursor)
+        return dm.size() - (info.records if info else 0) + len(self._records)
+
+    def flush(self) -> None:
+        """Writes the current page, if it has anything new."""
+        if self._dirty:
+            self._dm._write_page(self._dm.page_cursor, self._records)
+            self._dirty = False
+
+    def checkpoint(self) -> None:
+        self.flush()
+        self._dm.manifest.save(self._dm.data_path)
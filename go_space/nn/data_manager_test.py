@@ -0,0 +1,245 @@
+import os
+import random
+import tempfile
+import unittest
+
+from go_space import exceptions, go_types
+from go_space.nn import build_nn_data, data_manager, datum_lib, manifest_lib
+
+
+def _random_datum() -> datum_lib.Datum:
+    grid = go_types.Grid()
+    for _ in range(10):
+        pt = go_types.Point(random.randrange(8), random.randrange(8))
+        player = random.choice([go_types.Player.Black, go_types.Player.White])
+        grid[pt] = go_types.Chonk(player=player, points={pt}, liberties=set())
+    return datum_lib.Datum(grid=grid, next_pt=go_types.Point(random.randrange(4), random.randrange(4)))
+
+
+def _random_sgf(num_moves: int) -> str:
+    """A game played mostly in the corners, so that it triggers data."""
+    points = random.sample(
+        [(r, c) for r in range(19) for c in range(19) if min(r, 18 - r) < 6 and min(c, 18 - c) < 6],
+        num_moves,
+    )
+    moves = [
+        f"{'BW'[i % 2]}[{chr(ord('a') + c)}{chr(ord('a') + r)}]" for i, (r, c) in enumerate(points)
+    ]
+    return "(;GM[1]SZ[19];" + ";".join(moves) + ")"
+
+
+class DataManagerTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_dir = self._tmp_dir.name
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_rolls_back_to_checkpoint(self):
+        dm = data_manager.DataManager(self.tmp_dir)
+        data = [_random_datum() for _ in range(data_manager.PAGE_SIZE + 50)]
+        dm.save_many(data)
+
+        # Crash after some unsaved writes, which filled and wrote pages
+        with self.assertRaises(RuntimeError):
+            with dm.writer() as writer:
+                writer.save_many([_random_datum() for _ in range(2 * data_manager.PAGE_SIZE + 1)])
+                raise RuntimeError
+        self.assertTrue(os.path.exists(dm._page_path(2)))
+        self.assertFalse(os.path.exists(dm._page_path(3)))
+
+        dm = data_manager.DataManager(self.tmp_dir)
+        self.assertEqual(dm.size(), len(data))
+        self.assertEqual(dm.num_pages(), 2)
+        self.assertEqual(len(dm._read_page(1)), 50)
+        self.assertEqual(dm._read_entry(1, 49).to_json(), data[-1].to_json())
+        # Readers leave the pages alone
+        self.assertTrue(os.path.exists(dm._page_path(2)))
+
+        # A writer rolls back, and picks up where it left off
+        dm.save_datum(data[0])
+        self.assertFalse(os.path.exists(dm._page_path(2)))
+        self.assertEqual((dm.page_cursor, dm.entry_cursor), (1, 51))
+
+    def test_reuse_after_failed_writer(self):
+        for page_format in data_manager.PAGE_FORMATS:
+            tgt_dir = os.path.join(self.tmp_dir, page_format)
+            os.makedirs(tgt_dir)
+            dm = data_manager.DataManager(tgt_dir, page_format=page_format)
+            data = [_random_datum() for _ in range(10)]
+            dm.save_many(data)
+
+            with self.assertRaises(RuntimeError):
+                with dm.writer() as writer:
+                    writer.save_many([_random_datum() for _ in range(data_manager.PAGE_SIZE + 5)])
+                    raise RuntimeError
+            self.assertEqual(dm.size(), 10)
+            self.assertEqual((dm.page_cursor, dm.entry_cursor), (0, 10))
+            self.assertEqual(
+                [d.to_json() for d in dm._read_page(0).content], [d.to_json() for d in data]
+            )
+
+            dm.save_many(data[:3])
+            self.assertEqual(dm.size(), 13)
+            self.assertEqual(dm._read_entry(0, 12).to_json(), data[2].to_json())
+            self.assertEqual(data_manager.DataManager(tgt_dir).size(), 13)
+
+    def test_detects_corrupt_page(self):
+        dm = data_manager.DataManager(self.tmp_dir)
+        dm.save_datum(_random_datum())
+        with open(dm._page_path(0), "w") as f:
+            f.write(_random_datum().to_json() + "\n")
+        dm = data_manager.DataManager(self.tmp_dir)
+        with self.assertRaises(exceptions.DataException):
+            dm._read_page(0)
+        with self.assertRaises(exceptions.DataException):
+            dm.writer()
+
+    def test_writer_buffers_pages(self):
+        dm = data_manager.DataManager(self.tmp_dir)
+        with dm.writer() as writer:
+            writer.save_many([_random_datum() for _ in range(data_manager.PAGE_SIZE + 1)])
+            # Only the full page has been written
+            self.assertEqual(dm.num_pages(), 1)
+            self.assertEqual(writer.size(), data_manager.PAGE_SIZE + 1)
+        self.assertEqual(dm.size(), data_manager.PAGE_SIZE + 1)
+        self.assertEqual(len(dm._read_page(1)), 1)
+        self.assertEqual(os.listdir(self.tmp_dir).count("1.txt.tmp"), 0)
+
+    def test_appends_after_full_page(self):
+        for page_format in data_manager.PAGE_FORMATS:
+            tgt_dir = os.path.join(self.tmp_dir, page_format)
+            os.makedirs(tgt_dir)
+            data = [_random_datum() for _ in range(data_manager.PAGE_SIZE + 1)]
+            data_manager.DataManager(tgt_dir, page_format=page_format).save_many(data[:-1])
+
+            dm = data_manager.DataManager(tgt_dir)
+            with dm.writer() as writer:
+                self.assertEqual(writer.size(), data_manager.PAGE_SIZE)
+                writer.save(data[-1])
+
+            dm = data_manager.DataManager(tgt_dir)
+            self.assertEqual(dm.size(), len(data))
+            self.assertEqual([info.records for info in dm.manifest.pages.values()], [200, 1])
+            self.assertEqual(dm._read_entry(0, 199).to_json(), data[199].to_json())
+            self.assertEqual(dm._read_entry(1, 0).to_json(), data[-1].to_json())
+
+    def test_epoch_of_batches(self):
+        dm = data_manager.DataManager(self.tmp_dir, seed=1)
+        dm.save_many([_random_datum() for _ in range(3 * data_manager.PAGE_SIZE)])
+        dm.train_test_split(0.3)
+
+        split = data_manager.TrainTest.TRAIN
+        self.assertEqual(dm.steps_per_epoch(100, split), 4)
+        batches = dm.generate_batches(100, split)
+        features = [next(batches)[0] for _ in range(dm.steps_per_epoch(100, split))]
+        self.assertEqual(sum(len(f) for f in features), 2 * data_manager.PAGE_SIZE)
+        self.assertEqual(dm.sampler(split).epoch, 0)
+
+        dm.reset()
+        self.assertEqual(dm.sampler(split).epoch, 1)
+
+    def test_folder_without_manifest(self):
+        with open(os.path.join(self.tmp_dir, "0.txt"), "w") as f:
+            for _ in range(3):
+                f.write(_random_datum().to_json() + "\n")
+        dm = data_manager.DataManager(self.tmp_dir)
+        self.assertEqual(dm.size(), 3)
+
+    def test_pages_with_a_gap(self):
+        # As if page 1 was lost along with the manifest
+        for page_num in (0, 2, 3):
+            with open(os.path.join(self.tmp_dir, f"{page_num}.txt"), "w") as f:
+                for _ in range(5):
+                    f.write(_random_datum().to_json() + "\n")
+        dm = data_manager.DataManager(self.tmp_dir, seed=1)
+        dm.train_test_split(0.3, seed=0)
+
+        self.assertEqual(len(dm.test_pages), 1)
+        train, test = data_manager.TrainTest.TRAIN, data_manager.TrainTest.TEST
+        self.assertEqual(sorted(dm.pages(train) + dm.pages(test)), [0, 2, 3])
+        features, _ = dm.get_batch(10, train)
+        self.assertEqual(len(features), 10)
+
+    def test_compressed_folder_without_manifest(self):
+        data = [_random_datum() for _ in range(data_manager.PAGE_SIZE + 50)]
+        data_manager.DataManager(self.tmp_dir, page_format="lzma").save_many(data)
+        os.remove(os.path.join(self.tmp_dir, manifest_lib.MANIFEST_FILE))
+
+        for page_format in (None, "lzma"):
+            dm = data_manager.DataManager(self.tmp_dir, page_format=page_format)
+            self.assertEqual(dm.page_format, "lzma")
+            self.assertEqual(dm.size(), len(data))
+        with dm.writer() as writer:
+            writer.save(data[0])
+        dm = data_manager.DataManager(self.tmp_dir)
+        self.assertEqual(dm.size(), len(data) + 1)
+        self.assertEqual(dm._read_entry(0, 0).to_json(), data[0].to_json())
+
+    def test_translate_skips_processed_games(self):
+        src_dir = os.path.join(self.tmp_dir, "src")
+        tgt_dir = os.path.join(self.tmp_dir, "tgt")
+        os.makedirs(src_dir)
+        os.makedirs(tgt_dir)
+
+        def add_game(name):
+            with open(os.path.join(src_dir, name), "w") as f:
+                f.write(_random_sgf(80))
+
+        add_game("a.sgf")
+        add_game("b.sgf")
+        build_nn_data.translate_files(src_dir, tgt_dir)
+        dm = data_manager.DataManager(tgt_dir)
+        size = dm.size()
+        self.assertGreater(size, 0)
+        self.assertEqual(len(dm.manifest.sources), 2)
+
+        build_nn_data.translate_files(src_dir, tgt_dir)
+        self.assertEqual(data_manager.DataManager(tgt_dir).size(), size)
+
+        add_game("c.sgf")
+        build_nn_data.translate_files(src_dir, tgt_dir)
+        dm = data_manager.DataManager(tgt_dir)
+        self.assertGreater(dm.size(), size)
+        self.assertEqual(len(dm.manifest.sources), 3)
+
+    def test_compressed_pages(self):
+        data = [_random_datum() for _ in range(data_manager.PAGE_SIZE + 50)]
+        dm = data_manager.DataManager(self.tmp_dir, page_format="zlib")
+        dm.save_many(data)
+        self.assertTrue(dm._page_path(0).endswith(".blk"))
+        self.assertEqual(os.listdir(self.tmp_dir).count("0.txt"), 0)
+
+        # The format is kept, and can't be changed once there are pages
+        dm = data_manager.DataManager(self.tmp_dir)
+        self.assertEqual(dm.page_format, "zlib")
+        with self.assertRaises(exceptions.DataException):
+            data_manager.DataManager(self.tmp_dir, page_format="lzma")
+
+        # Random entries only read their block
+        self.assertEqual(dm._read_entry(1, 49).to_json(), data[-1].to_json())
+        self.assertEqual(dm._read_entry(0, 3).to_json(), data[3].to_json())
+        self.assertEqual(len(dm._page_cache), 0)
+        self.assertEqual(len(dm._block_cache), 2)
+        self.assertEqual(
+            [d.to_json() for d in dm._read_page(0).content],
+            [d.to_json() for d in data[: data_manager.PAGE_SIZE]],
+        )
+
+    def test_compressed_pages_roll_back(self):
+        dm = data_manager.DataManager(self.tmp_dir, page_format="lzma")
+        data = [_random_datum() for _ in range(10)]
+        dm.save_many(data)
+        with self.assertRaises(RuntimeError):
+            with dm.writer() as writer:
+                writer.save_many([_random_datum() for _ in range(5)])
+                writer.flush()
+                raise RuntimeError
+
+        dm = data_manager.DataManager(self.tmp_dir)
+        self.assertEqual(dm.size(), 10)
+        self.assertEqual(len(dm._read_page(0)), 10)
+        dm.save_datum(data[0])
+        self.assertEqual(data_manager.DataManager(self.tmp_dir).size(), 11)
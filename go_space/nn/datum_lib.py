@@ -1,9 +1,95 @@
+import functools
 import json
-from typing import Dict, Iterator
+from typing import Dict, Iterator, Tuple
 
 import numpy as np
 
 from go_space import consts, go_types
+from go_space.go_types import bitboard_lib
+
+
+# Shapes of np_feature and np_target
+FEATURE_SHAPE = (consts.DATA_BOARD_SIZE, consts.DATA_BOARD_SIZE, 1)
+TARGET_SHAPE = (16,)
+
+# A point in each corner of the board, so that corner_crop crops that corner
+CORNER_POINTS = tuple(
+    go_types.Point(row, col) for row in (0, consts.SIZE - 1) for col in (0, consts.SIZE - 1)
+)
+NUM_CORNERS = len(CORNER_POINTS)
+
+# Rows of the corner region, as (row, number of columns).  See _iterator_corner.
+CORNER_ROWS = ((0, 8), (1, 8), (2, 8), (3, 8), (4, 6), (5, 5), (6, 4), (7, 4))
+
+
+@functools.lru_cache(maxsize=None)
+def corner_mask(size: int) -> bitboard_lib.Bitboard:
+    """The corner region as a bitboard, on a board of the given size."""
+    result = 0
+    for row, num_cols in CORNER_ROWS:
+        result |= bitboard_lib.box_mask(row, row + 1, 0, num_cols, size)
+    return result
+
+
+def corner_flips(pt: go_types.Point) -> Tuple[bool, bool]:
+    """The flips of the board that bring pt's corner to the top-left."""
+    half_board = consts.SIZE // 2 + 1
+    return pt.row > half_board, pt.col > half_board
+
+
+@functools.lru_cache(maxsize=None)
+def flipped_corner_mask(flip_x: bool, flip_y: bool, size: int) -> bitboard_lib.Bitboard:
+    """The corner region of the corner that (flip_x, flip_y) brings to the top-left."""
+    result = 0
+    for row, num_cols in CORNER_ROWS:
+        if flip_x:
+            row = size - 1 - row
+        col_start, col_end = (size - num_cols, size) if flip_y else (0, num_cols)
+        result |= bitboard_lib.box_mask(row, row + 1, col_start, col_end, size)
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def _corner_region() -> np.ndarray:
+    """The corner region as a (DATA_BOARD_SIZE, DATA_BOARD_SIZE) boolean array."""
+    result = np.zeros((consts.DATA_BOARD_SIZE, consts.DATA_BOARD_SIZE), dtype=bool)
+    for row, num_cols in CORNER_ROWS:
+        result[row, :num_cols] = True
+    return result
+
+
+def corner_crop(board: np.ndarray, pt: go_types.Point) -> np.ndarray:
+    """The corner region around pt, flipped to the top-left, from a board array.
+
+    Works on views of board, so cropping several corners of the same array
+    doesn't copy it.  board may also be a (..., size, size) stack of boards.
+    """
+    flip_x, flip_y = corner_flips(pt)
+    view = board[..., :: -1 if flip_x else 1, :: -1 if flip_y else 1]
+    return np.where(
+        _corner_region(), view[..., : consts.DATA_BOARD_SIZE, : consts.DATA_BOARD_SIZE], 0
+    )
+
+
+def corner_crops(boards: np.ndarray) -> np.ndarray:
+    """corner_crop at each of CORNER_POINTS.
+
+    Returns (..., NUM_CORNERS, DATA_BOARD_SIZE, DATA_BOARD_SIZE) from (..., size, size).
+    """
+    return np.stack([corner_crop(boards, pt) for pt in CORNER_POINTS], axis=-3)
+
+
+def crop_features(crops: np.ndarray) -> np.ndarray:
+    """np_feature of a (..., DATA_BOARD_SIZE, DATA_BOARD_SIZE) stack of corner crops."""
+    black = go_types.Player.Black.value
+    result = np.where(crops == black, 1.0, np.where(crops != 0, -1.0, 0.0))
+    # Add dimension for single "channel"
+    return result[..., np.newaxis]
+
+
+def swap_colors(board: np.ndarray) -> np.ndarray:
+    black, white = go_types.Player.Black.value, go_types.Player.White.value
+    return np.where(board == black, white, np.where(board == white, black, board))
 
 
 class Datum(object):
@@ -14,18 +100,31 @@ class Datum(object):
         # Rotate pt also:
         r, c = next_pt.mod_row_col()
         self.next_pt = go_types.Point(r, c)
-        self.grid.mask(self._iterator_corner())
+        self.grid.mask_bitboard(corner_mask(self.grid.size))
         self.grid.resize(consts.DATA_BOARD_SIZE)
 
+    @staticmethod
+    def from_board_array(
+        board: np.ndarray, next_pt: go_types.Point, swap: bool = False
+    ) -> "Datum":
+        """Same as Datum(grid, next_pt) where board is grid.to_array(), but cheaper.
+
+        If swap, then Black and White are swapped, as if the other player were
+        moving.
+        """
+        crop = corner_crop(board, next_pt)
+        if swap:
+            crop = swap_colors(crop)
+        result = Datum.__new__(Datum)
+        result.grid = go_types.Grid.from_array(crop)
+        result.next_pt = go_types.Point(*next_pt.mod_row_col())
+        return result
+
     def _flip_x(self) -> bool:
-        half_board = consts.SIZE // 2 + 1
-        r = self.next_pt.row
-        return r > half_board
+        return corner_flips(self.next_pt)[0]
 
     def _flip_y(self) -> bool:
-        half_board = consts.SIZE // 2 + 1
-        c = self.next_pt.col
-        return c > half_board
+        return corner_flips(self.next_pt)[1]
 
     def _iterator_corner(self) -> Iterator[go_types.Point]:
         """Sweeps through
@@ -42,21 +141,9 @@ class Datum(object):
 
         in the corner as next_pt
         """
-        x, y, dx, dy = 0, 0, 1, 1
-
-        offsets = (
-            [(0, i) for i in range(8)]
-            + [(1, i) for i in range(8)]
-            + [(2, i) for i in range(8)]
-            + [(3, i) for i in range(8)]
-            + [(4, i) for i in range(6)]
-            + [(5, i) for i in range(5)]
-            + [(6, i) for i in range(4)]
-            + [(7, i) for i in range(4)]
-        )
-
-        for a, b in offsets:
-            yield go_types.Point(row=x + a * dx, col=y + b * dy)
+        for row, num_cols in CORNER_ROWS:
+            for col in range(num_cols):
+                yield go_types.Point(row=row, col=col)
 
     def _to_dict(self) -> Dict:
         """Should contain all the info needed to reconstruct."""
@@ -76,29 +163,32 @@ class Datum(object):
     def to_json(self) -> str:
         return json.dumps(self._to_dict())
 
-    def data_size(self) -> int:
-        result = 0
-        for pt in self._iterator_corner():
-            if self.grid[pt]:
-                result += 1
+    def to_bytes(self) -> bytes:
+        """Grid.to_bytes, followed by the row and column of next_pt."""
+        return self.grid.to_bytes() + bytes([self.next_pt.row, self.next_pt.col])
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "Datum":
+        # Like from_board_array, the grid is already cropped.
+        result = Datum.__new__(Datum)
+        result.grid = go_types.Grid.from_bytes(data[:-2], groups=False)
+        result.next_pt = go_types.Point(data[-2], data[-1])
         return result
 
+    def data_size(self) -> int:
+        """Number of stones in the corner region."""
+        return bitboard_lib.popcount(self.grid.bitboard() & corner_mask(self.grid.size))
+
     @staticmethod
     def from_json(data_str) -> "Datum":
         return Datum._from_dict(json.loads(data_str))
 
     def np_feature(self) -> np.ndarray:
-        # Add dimension for single "channel"
-        result = np.zeros([consts.DATA_BOARD_SIZE, consts.DATA_BOARD_SIZE, 1])
-        for r in range(consts.DATA_BOARD_SIZE):
-            for c in range(consts.DATA_BOARD_SIZE):
-                if chonk := self.grid[go_types.Point(row=r, col=c)]:
-                    result[r, c, 0] = 1 if chonk.player == go_types.Player.Black else -1
-        return result
+        return crop_features(self.grid.to_array())
 
     def np_target(self) -> np.ndarray:
         # TODO: Magic numbers
-        result = [0] * 16
+        result = [0] * TARGET_SHAPE[0]
         r, c = self.next_pt.row, self.next_pt.col
         result[4 * r + c] = 1
         return result
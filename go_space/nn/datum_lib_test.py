@@ -0,0 +1,68 @@
+import random
+import unittest
+
+import numpy as np
+
+from go_space import consts, go_types
+from go_space.nn import datum_lib
+
+
+def _random_grid(num_stones: int) -> go_types.Grid:
+    grid = go_types.Grid()
+    for _ in range(num_stones):
+        pt = go_types.Point(random.randrange(consts.SIZE), random.randrange(consts.SIZE))
+        player = random.choice([go_types.Player.Black, go_types.Player.White])
+        grid[pt] = go_types.Chonk(player=player, points=set(), liberties=set())
+    return grid
+
+
+class DatumTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+
+    def test_from_board_array(self):
+        for _ in range(50):
+            grid = _random_grid(80)
+            board = grid.to_array()
+            for _ in range(10):
+                pt = go_types.Point(random.randrange(consts.SIZE), random.randrange(consts.SIZE))
+                expected = datum_lib.Datum(grid=grid, next_pt=pt)
+                actual = datum_lib.Datum.from_board_array(board, pt)
+                self.assertEqual(actual.to_json(), expected.to_json())
+                np.testing.assert_array_equal(actual.np_feature(), expected.np_feature())
+                self.assertEqual(actual.data_size(), expected.data_size())
+
+    def test_bytes_round_trip(self):
+        grid = _random_grid(80)
+        for pt in (go_types.Point(0, 0), go_types.Point(17, 2), go_types.Point(10, 12)):
+            datum = datum_lib.Datum(grid=grid, next_pt=pt)
+            data = datum.to_bytes()
+            self.assertEqual(len(data), 3 + 31 + 2)
+            self.assertEqual(datum_lib.Datum.from_bytes(data).to_json(), datum.to_json())
+
+    def test_swap_colors(self):
+        grid = _random_grid(80)
+        pt = go_types.Point(17, 2)
+        datum = datum_lib.Datum.from_board_array(grid.to_array(), pt, swap=True)
+        np.testing.assert_array_equal(
+            datum.np_feature(), -datum_lib.Datum(grid=grid, next_pt=pt).np_feature()
+        )
+
+    def test_corner_masks(self):
+        for flip_x in (False, True):
+            for flip_y in (False, True):
+                grid = go_types.Grid()
+                for r in range(consts.SIZE):
+                    for c in range(consts.SIZE):
+                        grid[go_types.Point(r, c)] = go_types.Chonk(
+                            player=go_types.Player.Black, points=set(), liberties=set()
+                        )
+                mask = datum_lib.flipped_corner_mask(flip_x, flip_y, consts.SIZE)
+                grid.rotate(flip_x, flip_y)
+                grid.mask_bitboard(datum_lib.corner_mask(consts.SIZE))
+                grid.rotate(flip_x, flip_y)
+                self.assertEqual(grid.bitboard(), mask)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""Records what a data folder contains, so that dataset builds can resume.
+
+The manifest is a JSON file saved next to the pages.  It lists the source files
+that have been processed, keyed by a hash of their content, and the number of
+records and checksum of each page.  Anything on disk that isn't in the manifest
+was written after the last checkpoint.  Readers ignore it, and it's rolled
+back when a writer next opens the folder.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+import attr
+
+
+MANIFEST_FILE = "manifest.json"
+
+
+def sha1(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest()
+
+
+@attr.s
+class SourceInfo(object):
+    file_name: str = attr.ib()
+    records: int = attr.ib()
+    # Set if the source failed to parse.  We don't retry these.
+    error: Optional[str] = attr.ib(default=None)
+
+
+@attr.s
+class PageInfo(object):
+    records: int = attr.ib()
+    # Of the records, concatenated, before any compression
+    sha1: str = attr.ib()
+
+
+@attr.s
+class Manifest(object):
+    sources: Dict[str, SourceInfo] = attr.ib(factory=dict)
+    pages: Dict[int, PageInfo] = attr.ib(factory=dict)
+    # See data_manager.PAGE_FORMATS
+    page_format: str = attr.ib(default="text")
+
+    def num_records(self) -> int:
+        return sum(page.records for page in self.pages.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            "sources": {k: attr.asdict(v) for k, v in self.sources.items()},
+            # JSON keys must be strings
+            "pages": {str(k): attr.asdict(v) for k, v in self.pages.items()},
+            "page_format": self.page_format,
+        }
+
+    @staticmethod
+    def from_dict(data: Dict) -> "Manifest":
+        return Manifest(
+            sources={k: SourceInfo(**v) for k, v in data["sources"].items()},
+            pages={int(k): PageInfo(**v) for k, v in data["pages"].items()},
+            # Manifests from before there were other formats
+            page_format=data.get("page_format", "text"),
+        )
+
+    def save(self, data_path: str) -> None:
+        """Writes to a temporary file first, so that a crash never leaves half a manifest."""
+        path = os.path.join(data_path, MANIFEST_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def load(data_path: str) -> Optional["Manifest"]:
+        path = os.path.join(data_path, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return Manifest.from_dict(json.load(f))
@@ -1,16 +1,28 @@
+"""Trains the corner-move model.  Run with `python -m go_space train`.
+
+After every epoch, the model (with its optimizer state) and a small state file
+are saved to the checkpoint folder.  Running again picks up after the last
+completed epoch, with the same data order, unless --fresh is passed.
+
+Keras is imported inside the functions, so that importing this module is cheap.
+"""
+
+import argparse
+import json
 import os
+import time
+from typing import Dict, List, Optional
 
-from keras.callbacks import Callback, ModelCheckpoint
-from keras.layers.convolutional import Conv2D, ZeroPadding2D
-from keras.layers.core import Activation, Dense, Flatten
-from keras.models import Sequential
-from tensorflow.keras.optimizers import Adagrad
+import attr
 
 from go_space import consts
 from go_space.nn import data_manager
 
 
 def layers():
+    from keras.layers.convolutional import Conv2D, ZeroPadding2D
+    from keras.layers.core import Activation, Dense, Flatten
+
     return [
         ZeroPadding2D(padding=2, data_format="channels_last"),
         Conv2D(24, (5, 5), data_format="channels_last"),
@@ -24,59 +36,276 @@ def layers():
         Flatten(),
         Dense(64),
         Activation("relu"),
-        Dense(16, activation="softmax"),
+        # Softmax in float32, in case we're training in mixed precision.
+        Dense(16, activation="softmax", dtype="float32"),
     ]
 
 
-data_reader = data_manager.DataManager(
-    os.path.join(consts.TOP_LEVEL_PATH, "data", "_processed_data")
-)
-data_reader.train_test_split(0.2)
+BATCH_SIZE = 256
+VALIDATION_BATCH_SIZE = 128
+PORTION_TEST = 0.2
+DATA_PATH = os.path.join(consts.TOP_LEVEL_PATH, "data", "_processed_data")
+CHECKPOINT_DIR = os.path.join(consts.TOP_LEVEL_PATH, "data", "checkpoints")
+MODEL_PATH = os.path.join(consts.TOP_LEVEL_PATH, "saved_models", "v1")
+
+STATE_FILE = "state.json"
+LATEST_MODEL = "latest.h5"
+BEST_MODEL = "best.h5"
+
+
+@attr.s
+class TrainingConfig(object):
+    data_path: str = attr.ib(default=DATA_PATH)
+    checkpoint_dir: str = attr.ib(default=CHECKPOINT_DIR)
+    model_path: str = attr.ib(default=MODEL_PATH)
+    epochs: int = attr.ib(default=20)
+    batch_size: int = attr.ib(default=BATCH_SIZE)
+    # Stop after this many epochs without a better validation loss
+    patience: int = attr.ib(default=3)
+    # Processes building batches
+    workers: int = attr.ib(default=1)
+    use_tf_data: bool = attr.ib(default=False)
+    # 0 lets TensorFlow decide
+    intra_op_threads: int = attr.ib(default=0)
+    inter_op_threads: int = attr.ib(default=0)
+    mixed_precision: bool = attr.ib(default=False)
+    seed: int = attr.ib(default=0)
+
+
+@attr.s
+class TrainingState(object):
+    """What's needed to resume training, saved alongside the checkpoints."""
+
+    # Seeds the train/test split and the data order.  The data order for an
+    # epoch is fixed by (seed, epoch), so this is the whole sampler state.
+    seed: int = attr.ib()
+    # Epochs completed
+    epoch: int = attr.ib(default=0)
+    best_val_loss: Optional[float] = attr.ib(default=None)
+    epochs_without_improvement: int = attr.ib(default=0)
+    # Per-epoch logs, including examples_per_sec
+    history: List[Dict[str, float]] = attr.ib(factory=list)
+
+    def save(self, checkpoint_dir: str) -> None:
+        path = os.path.join(checkpoint_dir, STATE_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(attr.asdict(self), f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def load(checkpoint_dir: str) -> Optional["TrainingState"]:
+        path = os.path.join(checkpoint_dir, STATE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return TrainingState(**json.load(f))
+
 
+def _save_model(model, path: str) -> None:
+    """Saves to a temporary file first, so that a crash never leaves half a checkpoint."""
+    model.save(path + ".tmp.h5")
+    os.replace(path + ".tmp.h5", path)
 
-class ResetDataReader(Callback):
-    """Does some dumb end-of-epoch work."""
+
+class _Checkpointer(object):
+    """Saves checkpoints, stops early, and records throughput.
+
+    The callback methods of Checkpoint, kept apart from Keras so they can be
+    tested with a stub model.
+    """
+
+    def __init__(self, config: TrainingConfig, state: TrainingState, steps_per_epoch: int):
+        super().__init__()
+        self.config = config
+        self.state = state
+        self.steps_per_epoch = steps_per_epoch
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.time()
+        self._train_seconds = None
+
+    def on_test_begin(self, logs=None):
+        # Don't count validation time in the throughput.
+        if self._train_seconds is None:
+            self._train_seconds = time.time() - self._start
 
     def on_epoch_end(self, epoch, logs=None):
-        # TODO: Can I avoid the global here?
-        global data_reader
-        data_reader.reset()
+        config, state = self.config, self.state
+        logs = logs if logs is not None else dict()
+        train_seconds = self._train_seconds or time.time() - self._start
+        logs["examples_per_sec"] = self.steps_per_epoch * config.batch_size / train_seconds
+        print(f"Epoch {epoch + 1}: {logs['examples_per_sec']:.0f} examples/sec")
 
+        state.epoch = epoch + 1
+        state.history.append({"epoch": epoch + 1, **{k: float(v) for k, v in logs.items()}})
 
-model = Sequential()
-for layer in layers():
-    model.add(layer)
-model.compile(
-    loss="categorical_crossentropy",
-    optimizer=Adagrad(),
-    metrics=["accuracy"],
-)
+        val_loss = logs.get("val_loss")
+        if val_loss is not None:
+            if state.best_val_loss is None or val_loss < state.best_val_loss:
+                state.best_val_loss = float(val_loss)
+                state.epochs_without_improvement = 0
+                _save_model(self.model, os.path.join(config.checkpoint_dir, BEST_MODEL))
+            else:
+                state.epochs_without_improvement += 1
 
-print("ABOUT TO START")
+        # The model before the state, so that the state never runs ahead of it.
+        _save_model(self.model, os.path.join(config.checkpoint_dir, LATEST_MODEL))
+        state.save(config.checkpoint_dir)
 
-BATCH_SIZE = 256
+        if state.epochs_without_improvement >= config.patience:
+            print(f"No improvement in {config.patience} epochs, stopping.")
+            self.model.stop_training = True
+
+
+def _checkpoint_callback(config: TrainingConfig, state: TrainingState, steps_per_epoch: int):
+    from keras.callbacks import Callback
+
+    class Checkpoint(_Checkpointer, Callback):
+        pass
+
+    return Checkpoint(config, state, steps_per_epoch)
+
+
+def _configure_tensorflow(config: TrainingConfig) -> None:
+    """Must run before TensorFlow does any work."""
+    import tensorflow as tf
+    from keras import mixed_precision
+
+    tf.config.threading.set_intra_op_parallelism_threads(config.intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(config.inter_op_threads)
+    if config.mixed_precision:
+        # CPUs have fast bfloat16, but not float16.
+        mixed_precision.set_global_policy("mixed_bfloat16")
 
-model.fit_generator(
-    generator=data_reader.generate_batches(BATCH_SIZE, data_manager.TrainTest.TRAIN),
-    epochs=20,
-    # TODO: Fix off-by-a-few error.  It may not actually be there.
-    steps_per_epoch=40000 * 0.8 // BATCH_SIZE - 5,
-    validation_data=data_reader.generate_batches(128, data_manager.TrainTest.TEST),
-    validation_steps=40000 * 0.2 // BATCH_SIZE - 5,
-    callbacks=[
-        # ModelCheckpoint(os.path.join(consts.TOP_LEVEL_PATH, "data", "checkpoints", "epoch_{epoch}.h5")),
-        ResetDataReader(),
-    ],
-)
-
-data_reader.reset()
-print("=============")
-print("FINAL METRICS")
-print(
-    model.evaluate_generator(
-        generator=data_reader.generate_batches(128, data_manager.TrainTest.TEST),
-        steps=40000 * 0.2 // BATCH_SIZE - 5,
+
+def _new_model():
+    from keras.models import Sequential
+    from tensorflow.keras.optimizers import Adagrad
+
+    model = Sequential()
+    for layer in layers():
+        model.add(layer)
+    model.compile(
+        loss="categorical_crossentropy",
+        optimizer=Adagrad(),
+        metrics=["accuracy"],
+    )
+    return model
+
+
+def train(config: TrainingConfig, resume: bool = True) -> None:
+    from keras.models import load_model
+
+    from go_space.nn import sequence_lib
+
+    _configure_tensorflow(config)
+    os.makedirs(config.checkpoint_dir, exist_ok=True)
+
+    state = TrainingState.load(config.checkpoint_dir) if resume else None
+    if state is not None:
+        print(f"Resuming after epoch {state.epoch}")
+        model = load_model(os.path.join(config.checkpoint_dir, LATEST_MODEL))
+    else:
+        state = TrainingState(seed=config.seed)
+        model = _new_model()
+
+    train_split, test_split = data_manager.TrainTest.TRAIN, data_manager.TrainTest.TEST
+    train_seq = sequence_lib.PageSequence(
+        config.data_path, train_split, config.batch_size, PORTION_TEST, state.seed, state.epoch
     )
-)
+    test_seq = sequence_lib.PageSequence(
+        config.data_path, test_split, VALIDATION_BATCH_SIZE, PORTION_TEST, state.seed
+    )
+    callbacks = [_checkpoint_callback(config, state, len(train_seq))]
+
+    print("ABOUT TO START")
+
+    if state.epochs_without_improvement >= config.patience:
+        print("Already stopped early.")
+    elif config.use_tf_data:
+        remaining = config.epochs - state.epoch
+        model.fit(
+            sequence_lib.make_dataset(train_seq, remaining),
+            initial_epoch=state.epoch,
+            epochs=config.epochs,
+            steps_per_epoch=len(train_seq),
+            validation_data=sequence_lib.make_dataset(test_seq, remaining),
+            validation_steps=len(test_seq),
+            callbacks=callbacks,
+        )
+    else:
+        model.fit(
+            train_seq,
+            initial_epoch=state.epoch,
+            epochs=config.epochs,
+            validation_data=test_seq,
+            workers=config.workers,
+            use_multiprocessing=config.workers > 1,
+            callbacks=callbacks,
+        )
+
+    best_path = os.path.join(config.checkpoint_dir, BEST_MODEL)
+    if os.path.exists(best_path):
+        model = load_model(best_path)
+
+    print("=============")
+    print("FINAL METRICS")
+    print(model.evaluate(test_seq, workers=config.workers, use_multiprocessing=config.workers > 1))
+
+    model.save(config.model_path)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    defaults = TrainingConfig()
+    parser = argparse.ArgumentParser(description="Trains the corner-move model.")
+    parser.add_argument("--data_path", type=str, default=defaults.data_path)
+    parser.add_argument("--checkpoint_dir", type=str, default=defaults.checkpoint_dir)
+    parser.add_argument("--model_path", type=str, default=defaults.model_path)
+    parser.add_argument("--epochs", type=int, default=defaults.epochs)
+    parser.add_argument("--batch_size", type=int, default=defaults.batch_size)
+    parser.add_argument(
+        "--patience",
+        type=int,
+        default=defaults.patience,
+        help="Stop after this many epochs without a better validation loss",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=defaults.workers, help="Processes building batches"
+    )
+    parser.add_argument(
+        "--tf_data", action="store_true", help="Feed the model through a tf.data pipeline"
+    )
+    parser.add_argument(
+        "--intra_op_threads", type=int, default=0, help="Threads per op, 0 for TensorFlow's choice"
+    )
+    parser.add_argument(
+        "--inter_op_threads", type=int, default=0, help="Ops run at once, 0 for TensorFlow's choice"
+    )
+    parser.add_argument(
+        "--mixed_precision", action="store_true", help="Compute in bfloat16 where it's safe"
+    )
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="Seeds the split and data order")
+    parser.add_argument(
+        "--fresh", action="store_true", help="Ignore existing checkpoints and start over"
+    )
+    args = parser.parse_args(argv)
+
+    config = TrainingConfig(
+        data_path=args.data_path,
+        checkpoint_dir=args.checkpoint_dir,
+        model_path=args.model_path,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        patience=args.patience,
+        workers=args.workers,
+        use_tf_data=args.tf_data,
+        intra_op_threads=args.intra_op_threads,
+        inter_op_threads=args.inter_op_threads,
+        mixed_precision=args.mixed_precision,
+        seed=args.seed,
+    )
+    train(config, resume=not args.fresh)
+
 
-model.save(os.path.join(consts.TOP_LEVEL_PATH, "saved_models", "v1"))
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from typing import List
+
+from go_space.nn import nn
+
+
+class _StubModel(object):
+    """Stands in for a Keras model.  Saving writes the number of epochs seen."""
+
+    def __init__(self, epochs_seen: int = 0):
+        self.epochs_seen = epochs_seen
+        self.stop_training = False
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            f.write(str(self.epochs_seen))
+
+
+def _fit(model: _StubModel, callback, initial_epoch: int, epochs: int, val_losses: List[float]):
+    """Calls the callback the way Keras' fit does."""
+    callback.model = model
+    model.stop_training = False
+    for epoch in range(initial_epoch, epochs):
+        callback.on_epoch_begin(epoch)
+        model.epochs_seen += 1
+        callback.on_test_begin()
+        callback.on_epoch_end(epoch, {"loss": 1.0, "val_loss": val_losses[epoch]})
+        if model.stop_training:
+            break
+
+
+def _read(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
+
+class TrainingTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.config = nn.TrainingConfig(checkpoint_dir=self._tmp_dir.name, epochs=6, patience=2)
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.config.checkpoint_dir, name)
+
+    def test_state_round_trip(self):
+        self.assertIsNone(nn.TrainingState.load(self.config.checkpoint_dir))
+        state = nn.TrainingState(
+            seed=5,
+            epoch=2,
+            best_val_loss=0.5,
+            epochs_without_improvement=1,
+            history=[{"epoch": 1, "loss": 0.7}, {"epoch": 2, "loss": 0.6}],
+        )
+        state.save(self.config.checkpoint_dir)
+        self.assertEqual(nn.TrainingState.load(self.config.checkpoint_dir), state)
+        self.assertFalse(os.path.exists(self._path(nn.STATE_FILE + ".tmp")))
+
+    def test_resume(self):
+        val_losses = [0.9, 0.8, 0.7, 0.6, 0.5, 0.4]
+        state = nn.TrainingState(seed=5)
+        _fit(_StubModel(), nn._Checkpointer(self.config, state, 10), 0, 2, val_losses)
+
+        # Picks up from the saved state, as if the process had been restarted
+        state = nn.TrainingState.load(self.config.checkpoint_dir)
+        self.assertEqual(state.epoch, 2)
+        model = _StubModel(int(_read(self._path(nn.LATEST_MODEL))))
+        callback = nn._Checkpointer(self.config, state, 10)
+        _fit(model, callback, state.epoch, self.config.epochs, val_losses)
+
+        state = nn.TrainingState.load(self.config.checkpoint_dir)
+        self.assertEqual(state.epoch, 6)
+        self.assertEqual([h["epoch"] for h in state.history], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(state.best_val_loss, 0.4)
+        self.assertGreater(state.history[-1]["examples_per_sec"], 0)
+        self.assertEqual(_read(self._path(nn.LATEST_MODEL)), "6")
+        self.assertEqual(_read(self._path(nn.BEST_MODEL)), "6")
+
+    def test_patience(self):
+        val_losses = [0.9, 0.5, 0.6, 0.7, 0.4, 0.3]
+        state = nn.TrainingState(seed=5)
+        model = _StubModel()
+        _fit(model, nn._Checkpointer(self.config, state, 10), 0, self.config.epochs, val_losses)
+
+        self.assertTrue(model.stop_training)
+        self.assertEqual(state.epoch, 4)
+        self.assertEqual(state.epochs_without_improvement, 2)
+        self.assertEqual(state.best_val_loss, 0.5)
+        self.assertEqual(_read(self._path(nn.BEST_MODEL)), "2")
+        self.assertEqual(_read(self._path(nn.LATEST_MODEL)), "4")
+        self.assertEqual(nn.TrainingState.load(self.config.checkpoint_dir), state)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+"""A NumPy-only forward pass for the small Keras models built in nn.py.
+
+Keras is only needed once, to export the layer weights to an .npz file.  After
+that, inference runs without importing TensorFlow at all.
+
+To export the saved model and check that both runtimes agree:
+
+    python -m go_space export-model
+"""
+
+import argparse
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from go_space import consts, exceptions
+
+
+# Layer specs are the parts of the Keras config that the forward pass needs.
+LayerSpec = Dict[str, Any]
+
+KERAS_MODEL_PATH = os.path.join(consts.TOP_LEVEL_PATH, "saved_models", "v1")
+NPZ_MODEL_PATH = os.path.join(consts.TOP_LEVEL_PATH, "saved_models", "v1.npz")
+
+
+class ModelFormatError(exceptions.FormatError):
+    pass
+
+
+def _zero_padding(x: np.ndarray, padding) -> np.ndarray:
+    (top, bottom), (left, right) = padding
+    return np.pad(x, ((0, 0), (top, bottom), (left, right), (0, 0)))
+
+
+def _conv2d(x: np.ndarray, kernel: np.ndarray, bias: np.ndarray) -> np.ndarray:
+    """Valid, stride 1, channels_last convolution done as one matrix multiply.
+
+    The im2col columns are ordered (row, col, channel) to match the layout of a
+    Keras kernel, which is (kernel_h, kernel_w, in_channels, out_channels).
+    """
+    kh, kw, c_in, c_out = kernel.shape
+    n, h, w, _ = x.shape
+    # Shape (n, h', w', c_in, kh, kw)
+    windows = np.lib.stride_tricks.sliding_window_view(x, (kh, kw), axis=(1, 2))
+    cols = windows.transpose(0, 1, 2, 4, 5, 3).reshape(-1, kh * kw * c_in)
+    result = cols @ kernel.reshape(kh * kw * c_in, c_out) + bias
+    return result.reshape(n, h - kh + 1, w - kw + 1, c_out)
+
+
+def _activation(x: np.ndarray, name: str) -> np.ndarray:
+    if name == "linear":
+        return x
+    if name == "relu":
+        return np.maximum(x, 0)
+    if name == "tanh":
+        return np.tanh(x)
+    if name == "sigmoid":
+        return 1 / (1 + np.exp(-x))
+    if name == "softmax":
+        e = np.exp(x - x.max(axis=-1, keepdims=True))
+        return e / e.sum(axis=-1, keepdims=True)
+    raise ModelFormatError(f"Unsupported activation {name}")
+
+
+def _apply_layer(x: np.ndarray, spec: LayerSpec, weights: List[np.ndarray]) -> np.ndarray:
+    kind = spec["type"]
+    if kind == "ZeroPadding2D":
+        return _zero_padding(x, spec["padding"])
+    if kind == "Conv2D":
+        kernel, bias = weights
+        if spec["padding"] == "same":
+            kh, kw = kernel.shape[:2]
+            x = _zero_padding(x, (((kh - 1) // 2, kh // 2), ((kw - 1) // 2, kw // 2)))
+        return _activation(_conv2d(x, kernel, bias), spec["activation"])
+    if kind == "Activation":
+        return _activation(x, spec["activation"])
+    if kind == "Flatten":
+        # Keras flattens channels_last tensors in row-major order, same as NumPy.
+        return x.reshape(x.shape[0], -1)
+    if kind == "Dense":
+        kernel, bias = weights
+        return _activation(x @ kernel + bias, spec["activation"])
+    raise ModelFormatError(f"Unsupported layer type {kind}")
+
+
+class NumpyModel(object):
+    """A Sequential model evaluated with NumPy."""
+
+    def __init__(self, specs: List[LayerSpec], weights: List[List[np.ndarray]]):
+        self.specs = specs
+        self.weights = weights
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        y = np.asarray(x, dtype=np.float32)
+        for spec, weights in zip(self.specs, self.weights):
+            y = _apply_layer(y, spec, weights)
+        return y
+
+    def truncated(self, num_layers: int) -> "NumpyModel":
+        """The model made of just the first num_layers layers."""
+        return NumpyModel(self.specs[:num_layers], self.weights[:num_layers])
+
+    def save(self, path: str) -> None:
+        arrays = {"specs": np.array(json.dumps(self.specs))}
+        for i, weights in enumerate(self.weights):
+            for j, w in enumerate(weights):
+                arrays[f"layer_{i}_{j}"] = w
+        np.savez(path, **arrays)
+
+    @staticmethod
+    def load(path: str) -> "NumpyModel":
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"No exported model at {path}.  Run `python -m go_space export-model` to export one."
+            )
+        with np.load(path) as data:
+            specs = json.loads(str(data["specs"]))
+            weights = list()
+            for i in range(len(specs)):
+                layer_weights = list()
+                j = 0
+                while (key := f"layer_{i}_{j}") in data:
+                    layer_weights.append(data[key].astype(np.float32))
+                    j += 1
+                weights.append(layer_weights)
+        return NumpyModel(specs, weights)
+
+
+def _layer_spec(layer) -> LayerSpec:
+    """Pulls the parts of a Keras layer config that _apply_layer understands."""
+    kind = layer.__class__.__name__
+    config = layer.get_config()
+    spec = {"type": kind}
+    if kind == "ZeroPadding2D":
+        spec["padding"] = [list(p) for p in config["padding"]]
+    elif kind == "Conv2D":
+        if tuple(config["strides"]) != (1, 1) or tuple(config["dilation_rate"]) != (1, 1):
+            raise ModelFormatError("Only stride 1, undilated convolutions are supported")
+        if config["data_format"] != "channels_last":
+            raise ModelFormatError("Only channels_last convolutions are supported")
+        spec["padding"] = config["padding"]
+        spec["activation"] = config["activation"]
+    elif kind in ("Activation", "Dense"):
+        spec["activation"] = config["activation"]
+    elif kind != "Flatten":
+        raise ModelFormatError(f"Unsupported layer type {kind}")
+    return spec
+
+
+def from_keras(model) -> NumpyModel:
+    specs, weights = list(), list()
+    for layer in model.layers:
+        specs.append(_layer_spec(layer))
+        weights.append([np.asarray(w, dtype=np.float32) for w in layer.get_weights()])
+    return NumpyModel(specs, weights)
+
+
+def export_weights(keras_path: str = KERAS_MODEL_PATH, npz_path: str = NPZ_MODEL_PATH) -> None:
+    """Exports a saved Keras model, and checks that the NumPy model agrees with it."""
+    from keras.models import load_model
+
+    keras_model = load_model(keras_path)
+    np_model = from_keras(keras_model)
+    np_model.save(npz_path)
+
+    # Random boards, encoded like Datum.np_feature
+    x = np.random.randint(-1, 2, size=(64,) + keras_model.input_shape[1:]).astype(np.float32)
+    keras_y = keras_model.predict(x)
+    np_y = NumpyModel.load(npz_path).predict(x)
+    max_diff = np.abs(keras_y - np_y).max()
+    if not np.allclose(keras_y, np_y, atol=1e-4):
+        raise ModelFormatError(f"Exported model disagrees with Keras by up to {max_diff}")
+    print(f"Exported {keras_path} to {npz_path} (max difference {max_diff:.2e})")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Exports a Keras model for NumPy inference.")
+    parser.add_argument("--keras_path", type=str, default=KERAS_MODEL_PATH)
+    parser.add_argument("--npz_path", type=str, default=NPZ_MODEL_PATH)
+    args = parser.parse_args(argv)
+    export_weights(args.keras_path, args.npz_path)
+
+
+if __name__ == "__main__":
+    main()
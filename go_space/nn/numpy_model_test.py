@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from go_space.nn import numpy_model
+
+
+def _naive_conv2d(x, kernel, bias):
+    kh, kw, _, c_out = kernel.shape
+    n, h, w, _ = x.shape
+    result = np.zeros([n, h - kh + 1, w - kw + 1, c_out])
+    for b in range(n):
+        for i in range(h - kh + 1):
+            for j in range(w - kw + 1):
+                for o in range(c_out):
+                    result[b, i, j, o] = (
+                        np.sum(x[b, i : i + kh, j : j + kw, :] * kernel[:, :, :, o])
+                        + bias[o]
+                    )
+    return result
+
+
+class NumpyModelTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = rng.integers(-1, 2, size=(3, 11, 11, 1)).astype(np.float32)
+        self.specs = [
+            {"type": "ZeroPadding2D", "padding": [[2, 2], [2, 2]]},
+            {"type": "Conv2D", "padding": "valid", "activation": "linear"},
+            {"type": "Activation", "activation": "relu"},
+            {"type": "Conv2D", "padding": "same", "activation": "relu"},
+            {"type": "Flatten"},
+            {"type": "Dense", "activation": "linear"},
+            {"type": "Dense", "activation": "softmax"},
+        ]
+        self.weights = [
+            [],
+            [rng.normal(size=(5, 5, 1, 4)), rng.normal(size=4)],
+            [],
+            [rng.normal(size=(3, 3, 4, 2)), rng.normal(size=2)],
+            [],
+            [rng.normal(size=(11 * 11 * 2, 6)), rng.normal(size=6)],
+            [rng.normal(size=(6, 16)), rng.normal(size=16)],
+        ]
+        self.weights = [[w.astype(np.float32) for w in ws] for ws in self.weights]
+
+    def test_conv_matches_naive(self):
+        kernel, bias = self.weights[1]
+        padded = numpy_model._zero_padding(self.x, [[2, 2], [2, 2]])
+        np.testing.assert_allclose(
+            numpy_model._conv2d(padded, kernel, bias),
+            _naive_conv2d(padded, kernel, bias),
+            rtol=1e-5,
+            atol=1e-5,
+        )
+
+    def test_forward_pass(self):
+        model = numpy_model.NumpyModel(self.specs, self.weights)
+        y = model.predict(self.x)
+        self.assertEqual(y.shape, (3, 16))
+        np.testing.assert_allclose(y.sum(axis=1), np.ones(3), rtol=1e-5)
+
+        embedding = model.truncated(6).predict(self.x)
+        self.assertEqual(embedding.shape, (3, 6))
+
+    def test_save_load(self):
+        model = numpy_model.NumpyModel(self.specs, self.weights)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "model.npz")
+            model.save(path)
+            loaded = numpy_model.NumpyModel.load(path)
+        self.assertEqual(loaded.specs, self.specs)
+        np.testing.assert_allclose(loaded.predict(self.x), model.predict(self.x))
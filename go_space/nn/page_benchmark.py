@@ -0,0 +1,111 @@
+"""Compares the DataManager page formats on a copy of a dataset.
+
+Run with `python -m go_space page-benchmark --src_dir <data folder>`.
+
+The records of src_dir are rewritten in each of PAGE_FORMATS under work_dir,
+then for each we report the size on disk, the throughput of reading every page
+in order, and the latency of reading single entries at random, with the
+DataManager's caches emptied before each read.  Run it with work_dir on the
+storage you care about; the OS file cache still hides some I/O on repeat runs.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from go_space import consts
+
+from . import data_manager
+
+
+def copy_dataset(src_dir: str, tgt_dir: str, page_format: str) -> data_manager.DataManager:
+    src = data_manager.DataManager(src_dir)
+    tgt = data_manager.DataManager(tgt_dir, page_format=page_format)
+    with tgt.writer() as writer:
+        for page_num in sorted(src.manifest.pages):
+            writer.save_many(src._read_page(page_num).content)
+    return tgt
+
+
+def disk_size(dm: data_manager.DataManager) -> int:
+    return sum(os.path.getsize(dm._page_path(p)) for p in dm.manifest.pages)
+
+
+def sequential_read(data_path: str) -> float:
+    """Records per second, reading all the pages in order."""
+    dm = data_manager.DataManager(data_path)
+    start = time.perf_counter()
+    for page_num in sorted(dm.manifest.pages):
+        dm._read_page(page_num)
+    return dm.size() / (time.perf_counter() - start)
+
+
+def random_read(data_path: str, num_reads: int, seed: int = 0) -> np.ndarray:
+    """Seconds for each of num_reads single-entry reads, with cold caches."""
+    dm = data_manager.DataManager(data_path)
+    rng = random.Random(seed)
+    pages = [(p, info.records) for p, info in dm.manifest.pages.items()]
+    result = np.zeros(num_reads)
+    for i in range(num_reads):
+        page_num, records = rng.choice(pages)
+        entry_num = rng.randrange(records)
+        dm._page_cache, dm._block_cache, dm._page_indexes = list(), list(), dict()
+        start = time.perf_counter()
+        dm._read_entry(page_num, entry_num)
+        result[i] = time.perf_counter() - start
+    return result
+
+
+def benchmark(
+    src_dir: str, work_dir: str, formats: List[str], num_reads: int
+) -> Dict[str, Dict[str, float]]:
+    result = dict()
+    for page_format in formats:
+        tgt_dir = os.path.join(work_dir, page_format)
+        os.makedirs(tgt_dir)
+        dm = copy_dataset(src_dir, tgt_dir, page_format)
+        latencies = random_read(tgt_dir, num_reads)
+        result[page_format] = {
+            "bytes": disk_size(dm),
+            "records_per_second": sequential_read(tgt_dir),
+            "random_p50_ms": 1000 * np.percentile(latencies, 50),
+            "random_p99_ms": 1000 * np.percentile(latencies, 99),
+        }
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compares the page formats on a dataset.")
+    parser.add_argument(
+        "--src_dir",
+        type=str,
+        default=os.path.join(consts.TOP_LEVEL_PATH, "data", "_processed_data"),
+        help="A folder written by build-nn-data",
+    )
+    parser.add_argument(
+        "--work_dir", type=str, default=None, help="Where to write the copies.  Defaults to tmp."
+    )
+    parser.add_argument(
+        "--formats", nargs="+", choices=data_manager.PAGE_FORMATS, default=data_manager.PAGE_FORMATS
+    )
+    parser.add_argument("--random_reads", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        results = benchmark(args.src_dir, work_dir, args.formats, args.random_reads)
+
+    print(f"{'format':8} {'MB':>10} {'records/s':>12} {'p50 ms':>8} {'p99 ms':>8}")
+    for page_format, r in results.items():
+        print(
+            f"{page_format:8} {r['bytes'] / 2 ** 20:10.2f} {r['records_per_second']:12.0f} "
+            f"{r['random_p50_ms']:8.3f} {r['random_p99_ms']:8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
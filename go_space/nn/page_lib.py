@@ -0,0 +1,126 @@
+"""Block-compressed pages of records, with an index for random access.
+
+A page is a list of byte strings (for DataManager, Datum.to_bytes).  The
+records are grouped into blocks of block_records, and each block is
+compressed on its own.  The file is
+
+    block 0 | block 1 | ... | index | footer
+
+where the index holds the (offset, length) of each block, and the fixed-size
+footer says how many blocks and records there are, and how they're compressed.
+So reading one record reads the footer, the index and a single block.
+"""
+
+import lzma
+import struct
+import zlib
+from typing import BinaryIO, Callable, Dict, List, Tuple
+
+import attr
+
+from go_space import exceptions
+
+
+# Records per compressed block
+BLOCK_RECORDS = 50
+
+_MAGIC = b"GSBP"
+# Number of records, records per block, number of blocks, codec, magic
+_FOOTER = struct.Struct("<IIIB4s")
+# Offset and length of a block
+_INDEX_ENTRY = struct.Struct("<QI")
+# Each record in a block is prefixed with its length
+_RECORD_LENGTH = struct.Struct("<H")
+
+# Name -> (id in the footer, compress, decompress)
+CODECS: Dict[str, Tuple[int, Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "zlib": (1, zlib.compress, zlib.decompress),
+    "lzma": (2, lzma.compress, lzma.decompress),
+}
+_CODEC_NAMES = {codec_id: name for name, (codec_id, _, _) in CODECS.items()}
+
+
+class PageFormatError(exceptions.FormatError):
+    pass
+
+
+@attr.s(frozen=True)
+class PageIndex(object):
+    num_records: int = attr.ib()
+    block_records: int = attr.ib()
+    codec: str = attr.ib()
+    # (offset, length) of each block
+    blocks: Tuple[Tuple[int, int], ...] = attr.ib()
+
+    def block_of(self, record: int) -> Tuple[int, int]:
+        """The block holding a record, and its position in the block."""
+        if not 0 <= record < self.num_records:
+            raise IndexError(f"Record {record} of a page with {self.num_records}")
+        return divmod(record, self.block_records)
+
+
+def encode_page(records: List[bytes], codec: str, block_records: int = BLOCK_RECORDS) -> bytes:
+    codec_id, compress, _ = CODECS[codec]
+    parts, blocks, offset = list(), list(), 0
+    for start in range(0, len(records), block_records):
+        raw = b"".join(
+            _RECORD_LENGTH.pack(len(record)) + record
+            for record in records[start : start + block_records]
+        )
+        block = compress(raw)
+        parts.append(block)
+        blocks.append((offset, len(block)))
+        offset += len(block)
+    parts.extend(_INDEX_ENTRY.pack(*block) for block in blocks)
+    parts.append(_FOOTER.pack(len(records), block_records, len(blocks), codec_id, _MAGIC))
+    return b"".join(parts)
+
+
+def read_index(f: BinaryIO) -> PageIndex:
+    f.seek(0, 2)
+    file_size = f.tell()
+    if file_size < _FOOTER.size:
+        raise PageFormatError("Page too short for a footer")
+    f.seek(file_size - _FOOTER.size)
+    num_records, block_records, num_blocks, codec_id, magic = _FOOTER.unpack(
+        f.read(_FOOTER.size)
+    )
+    if magic != _MAGIC or codec_id not in _CODEC_NAMES:
+        raise PageFormatError("Not a block-compressed page")
+
+    index_size = num_blocks * _INDEX_ENTRY.size
+    if file_size < _FOOTER.size + index_size:
+        raise PageFormatError("Page too short for its index")
+    f.seek(file_size - _FOOTER.size - index_size)
+    index = f.read(index_size)
+    blocks = tuple(_INDEX_ENTRY.iter_unpack(index))
+    return PageIndex(num_records, block_records, _CODEC_NAMES[codec_id], blocks)
+
+
+def read_block(f: BinaryIO, index: PageIndex, block: int) -> List[bytes]:
+    """The records of one block."""
+    offset, length = index.blocks[block]
+    f.seek(offset)
+    try:
+        raw = CODECS[index.codec][2](f.read(length))
+    except (zlib.error, lzma.LZMAError) as e:
+        raise PageFormatError(f"Block {block} doesn't decompress: {e}")
+    result, pos = list(), 0
+    while pos < len(raw):
+        (length,) = _RECORD_LENGTH.unpack_from(raw, pos)
+        pos += _RECORD_LENGTH.size
+        result.append(raw[pos : pos + length])
+        pos += length
+    return result
+
+
+def read_page(path: str) -> List[bytes]:
+    """All the records of a page."""
+    with open(path, "rb") as f:
+        index = read_index(f)
+        result = list()
+        for block in range(len(index.blocks)):
+            result.extend(read_block(f, index, block))
+    if len(result) != index.num_records:
+        raise PageFormatError(f"Page {path} has {len(result)} records, not {index.num_records}")
+    return result
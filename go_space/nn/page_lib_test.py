@@ -0,0 +1,63 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+
+from go_space.nn import page_lib
+
+
+class _CountingFile(io.BytesIO):
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        result = super().read(size)
+        self.bytes_read += len(result)
+        return result
+
+
+class PageTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        # Redundant, like the real records
+        self.records = [
+            bytes(random.choice([0, 0, 0, 1, 2]) for _ in range(random.randrange(0, 60)))
+            for _ in range(237)
+        ]
+
+    def test_round_trip(self):
+        for codec in page_lib.CODECS:
+            for records in (self.records, self.records[:1], list()):
+                data = page_lib.encode_page(records, codec, block_records=20)
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    path = os.path.join(tmp_dir, "0.blk")
+                    with open(path, "wb") as f:
+                        f.write(data)
+                    self.assertEqual(page_lib.read_page(path), records)
+            self.assertLess(len(data), sum(len(r) for r in self.records) / 2)
+
+    def test_reads_one_block(self):
+        data = page_lib.encode_page(self.records, "zlib", block_records=20)
+        f = _CountingFile(data)
+        index = page_lib.read_index(f)
+        self.assertEqual((index.num_records, len(index.blocks)), (237, 12))
+        self.assertEqual(index.block_of(45), (2, 5))
+        with self.assertRaises(IndexError):
+            index.block_of(237)
+
+        f.bytes_read = 0
+        self.assertEqual(page_lib.read_block(f, index, 2)[5], self.records[45])
+        self.assertEqual(f.bytes_read, index.blocks[2][1])
+
+    def test_corrupt(self):
+        data = page_lib.encode_page(self.records, "lzma")
+        for bad in (data[:-1], b"x" * 10, b"\0" * 10 + data):
+            with self.assertRaises(page_lib.PageFormatError):
+                f = io.BytesIO(bad)
+                page_lib.read_block(f, page_lib.read_index(f), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
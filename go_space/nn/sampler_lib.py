@@ -0,0 +1,88 @@
+"""Shuffled passes over pages of data, one epoch at a time.
+
+Each epoch visits the pages in a seeded random order, and the entries of each
+page in a seeded random order.  Both are fixed by (seed, epoch), so any item of
+an epoch can be looked up directly.  To pick up where another sampler was, make
+one with the same seed, epoch and position.  Training keeps only the seed and
+epoch (see nn.TrainingState), so it resumes at the start of an epoch.
+"""
+
+import bisect
+from typing import List, Tuple
+
+import numpy as np
+
+from go_space import exceptions
+
+
+# (page number, number of entries on the page)
+PageSizes = List[Tuple[int, int]]
+# (page number, entry number)
+Item = Tuple[int, int]
+
+
+class EpochSampler(object):
+    def __init__(self, page_sizes: PageSizes, seed: int, epoch: int = 0, position: int = 0):
+        self.page_sizes = list(page_sizes)
+        self.seed = seed
+        self.position = position
+        self._num_items = sum(size for _, size in self.page_sizes)
+        self._start_epoch(epoch)
+
+    def __len__(self) -> int:
+        """Items per epoch."""
+        return self._num_items
+
+    def steps_per_epoch(self, batch_size: int) -> int:
+        """Number of full batches in an epoch."""
+        return self._num_items // batch_size
+
+    def _start_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+        order = np.random.default_rng([self.seed, epoch]).permutation(len(self.page_sizes))
+        self._pages = [self.page_sizes[i] for i in order]
+        # Index of the first item on each page
+        self._offsets = [0] + np.cumsum([size for _, size in self._pages], dtype=int).tolist()
+        # Shuffled entries of the page looked at last, as (index into _pages, order)
+        self._page_order: Tuple[int, np.ndarray] = (-1, np.zeros(0, dtype=int))
+
+    def _entry_order(self, page_ind: int) -> np.ndarray:
+        # Read once, so that this is safe to call from several threads.
+        cached_ind, order = self._page_order
+        if cached_ind != page_ind:
+            page_num, size = self._pages[page_ind]
+            rng = np.random.default_rng([self.seed, self.epoch, page_num])
+            order = rng.permutation(size)
+            self._page_order = (page_ind, order)
+        return order
+
+    def __getitem__(self, i: int) -> Item:
+        """The i-th item of the current epoch."""
+        if not 0 <= i < self._num_items:
+            raise IndexError(i)
+        page_ind = self._page_order[0]
+        if not (page_ind >= 0 and self._offsets[page_ind] <= i < self._offsets[page_ind + 1]):
+            page_ind = bisect.bisect_right(self._offsets, i) - 1
+        page_num = self._pages[page_ind][0]
+        return page_num, int(self._entry_order(page_ind)[i - self._offsets[page_ind]])
+
+    def next_item(self) -> Item:
+        """Moves on to the next epoch once this one's done."""
+        if self._num_items == 0:
+            raise exceptions.DataException("No data to sample.")
+        if self.position >= self._num_items:
+            self.next_epoch()
+        result = self[self.position]
+        self.position += 1
+        return result
+
+    def next_epoch(self) -> None:
+        self.set_epoch(self.epoch + 1)
+
+    def set_epoch(self, epoch: int) -> None:
+        self._start_epoch(epoch)
+        self.position = 0
+
+    def batch_items(self, step: int, batch_size: int) -> List[Item]:
+        """The items of the step-th batch of the current epoch."""
+        return [self[i] for i in range(step * batch_size, (step + 1) * batch_size)]
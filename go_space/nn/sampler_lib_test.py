@@ -0,0 +1,39 @@
+import unittest
+
+from go_space.nn import sampler_lib
+
+
+PAGE_SIZES = [(0, 5), (1, 3), (2, 7), (4, 2)]
+
+
+class EpochSamplerTest(unittest.TestCase):
+    def test_visits_everything_once_per_epoch(self):
+        sampler = sampler_lib.EpochSampler(PAGE_SIZES, seed=3)
+        expected = sorted((p, e) for p, size in PAGE_SIZES for e in range(size))
+        self.assertEqual(len(sampler), len(expected))
+
+        first = [sampler.next_item() for _ in range(len(sampler))]
+        second = [sampler.next_item() for _ in range(len(sampler))]
+        self.assertEqual(sorted(first), expected)
+        self.assertEqual(sorted(second), expected)
+        self.assertNotEqual(first, second)
+        self.assertEqual(sampler.epoch, 1)
+
+    def test_random_access(self):
+        sampler = sampler_lib.EpochSampler(PAGE_SIZES, seed=3)
+        in_order = [sampler.next_item() for _ in range(len(sampler))]
+        sampler = sampler_lib.EpochSampler(PAGE_SIZES, seed=3)
+        self.assertEqual([sampler[i] for i in reversed(range(len(sampler)))], in_order[::-1])
+        self.assertEqual(sampler.batch_items(2, 4), in_order[8:12])
+        self.assertEqual(sampler.steps_per_epoch(4), 4)
+
+    def test_resume(self):
+        sampler = sampler_lib.EpochSampler(PAGE_SIZES, seed=3)
+        for _ in range(25):
+            sampler.next_item()
+        resumed = sampler_lib.EpochSampler(
+            PAGE_SIZES, seed=3, epoch=sampler.epoch, position=sampler.position
+        )
+        self.assertEqual(
+            [resumed.next_item() for _ in range(20)], [sampler.next_item() for _ in range(20)]
+        )
@@ -0,0 +1,114 @@
+"""Keras and tf.data inputs that read DataManager pages.
+
+Batches are addressed by index into the epoch order of an EpochSampler, so they
+can be built in any order, by any number of workers.  Each process opens its
+own DataManager, so no read cursors are shared between them.
+
+Imports Keras, so only import this where training.
+"""
+
+import os
+from typing import Dict, Optional
+
+import keras
+import numpy as np
+
+from . import data_manager, datum_lib, sampler_lib
+
+
+class PageSequence(keras.utils.Sequence):
+    def __init__(
+        self,
+        data_path: str,
+        data_split: data_manager.TrainTest,
+        batch_size: int,
+        portion_test: float,
+        seed: int,
+        epoch: int = 0,
+    ):
+        self.data_path = data_path
+        self.data_split = data_split
+        self.batch_size = batch_size
+        self.portion_test = portion_test
+        self.seed = seed
+        self.epoch = epoch
+        self._dm: Optional[data_manager.DataManager] = None
+        self._dm_pid = None
+        self._samplers: Dict[int, sampler_lib.EpochSampler] = dict()
+
+    def __getstate__(self):
+        # Worker processes open their own DataManager.
+        state = dict(self.__dict__)
+        state["_dm"] = None
+        state["_samplers"] = dict()
+        return state
+
+    def _data_manager(self) -> data_manager.DataManager:
+        if self._dm is None or self._dm_pid != os.getpid():
+            self._dm = data_manager.DataManager(self.data_path, seed=self.seed)
+            self._dm.train_test_split(self.portion_test, seed=self.seed)
+            self._dm_pid = os.getpid()
+            self._samplers = dict()
+        return self._dm
+
+    def _sampler(self, epoch: int) -> sampler_lib.EpochSampler:
+        """Samplers are per epoch, so that batches of any epoch can be built at once."""
+        if epoch not in self._samplers:
+            page_sizes = self._data_manager().sampler(self.data_split).page_sizes
+            # Only the current epoch and the next are in use at once.
+            self._samplers = {
+                e: sampler for e, sampler in self._samplers.items() if e >= epoch - 1
+            }
+            self._samplers[epoch] = sampler_lib.EpochSampler(page_sizes, self.seed, epoch)
+        return self._samplers[epoch]
+
+    def __len__(self) -> int:
+        return self._data_manager().steps_per_epoch(self.batch_size, self.data_split)
+
+    def __getitem__(self, step: int) -> data_manager.Batch:
+        return self.get_batch(step, self.epoch)
+
+    def get_batch(self, step: int, epoch: int) -> data_manager.Batch:
+        dm = self._data_manager()
+        items = self._sampler(epoch).batch_items(step, self.batch_size)
+
+        features = np.zeros((len(items),) + datum_lib.FEATURE_SHAPE, dtype=np.float32)
+        targets = np.zeros((len(items),) + datum_lib.TARGET_SHAPE, dtype=np.float32)
+        # Read page by page, so that each page is parsed at most once per batch.
+        for i in sorted(range(len(items)), key=lambda i: items[i]):
+            datum = dm._read_entry(*items[i])
+            features[i] = datum.np_feature()
+            targets[i] = datum.np_target()
+        return features, targets
+
+    def on_epoch_end(self) -> None:
+        self.epoch += 1
+
+
+def make_dataset(sequence: PageSequence, epochs: int, num_parallel_calls: Optional[int] = None):
+    """A tf.data pipeline of epochs passes over sequence, starting at sequence.epoch.
+
+    Batches are built in parallel and prefetched, and come out in any order
+    within an epoch.  Pass steps_per_epoch=len(sequence) to fit.  Defaults to
+    letting tf.data tune the parallelism.
+    """
+    import tensorflow as tf
+
+    if num_parallel_calls is None:
+        num_parallel_calls = tf.data.AUTOTUNE
+    steps, first_epoch = len(sequence), sequence.epoch
+
+    def build(i: int) -> data_manager.Batch:
+        return sequence.get_batch(int(i) % steps, first_epoch + int(i) // steps)
+
+    def load(i):
+        features, targets = tf.numpy_function(build, [i], [tf.float32, tf.float32])
+        features.set_shape((None,) + datum_lib.FEATURE_SHAPE)
+        targets.set_shape((None,) + datum_lib.TARGET_SHAPE)
+        return features, targets
+
+    return (
+        tf.data.Dataset.range(epochs * steps)
+        .map(load, num_parallel_calls=num_parallel_calls, deterministic=False)
+        .prefetch(tf.data.AUTOTUNE)
+    )
@@ -0,0 +1,191 @@
+"""Datasets split into shards, spread across several folders or disks.
+
+A shard index is a JSON file listing the shard folders, for example:
+
+    {"shards": ["/disk1/go/shard_0", "/disk2/go/shard_1", "/disk1/go/shard_2"]}
+
+Relative paths are relative to the index file.  Each shard is an ordinary
+DataManager folder with its own pages and manifest, so shards can be written
+and read by separate processes.
+"""
+
+import json
+import math
+import multiprocessing
+import os
+from typing import Iterator, List
+
+import attr
+import numpy as np
+
+from go_space import exceptions
+
+from . import data_manager, datum_lib, manifest_lib
+
+
+# Bounds how far the reader processes can get ahead of the consumer.
+BATCHES_IN_FLIGHT = 8
+
+
+@attr.s
+class ShardIndex(object):
+    path: str = attr.ib()
+    shards: List[str] = attr.ib()
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def shard_path(self, shard: int) -> str:
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), self.shards[shard])
+
+    def shard_for_file(self, file_name: str) -> int:
+        """Stable assignment of source files to shards."""
+        return int(manifest_lib.sha1(os.path.basename(file_name).encode()), 16) % len(self)
+
+    def save(self) -> None:
+        with open(self.path + ".tmp", "w") as f:
+            json.dump({"shards": self.shards}, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    @staticmethod
+    def load(path: str) -> "ShardIndex":
+        with open(path, "r") as f:
+            return ShardIndex(path=path, shards=json.load(f)["shards"])
+
+    @staticmethod
+    def create(path: str, dirs: List[str], num_shards: int) -> "ShardIndex":
+        """Makes num_shards shard folders, spread round-robin over dirs."""
+        if os.path.exists(path):
+            raise exceptions.DataException(f"Shard index {path} already exists.")
+        shards = [os.path.join(dirs[i % len(dirs)], f"shard_{i}") for i in range(num_shards)]
+        result = ShardIndex(path=path, shards=shards)
+        for i in range(num_shards):
+            os.makedirs(result.shard_path(i), exist_ok=True)
+        result.save()
+        return result
+
+
+class ShardedDataset(object):
+    """Reads a sharded dataset, possibly from several processes.
+
+    Every shard is split into train and test pages with a seed derived from
+    the dataset seed and the shard number.  So any process that opens a shard
+    sees the same split, without coordinating with the others.
+    """
+
+    def __init__(self, index_path: str, portion_test: float, seed: int = 0):
+        self.index = ShardIndex.load(index_path)
+        self.portion_test = portion_test
+        self.seed = seed
+
+    def worker_shards(self, worker_id: int, num_workers: int) -> List[int]:
+        """Disjoint sets of shards, which together cover the dataset."""
+        return list(range(worker_id, len(self.index), num_workers))
+
+    def open_shard(self, shard: int) -> data_manager.DataManager:
+        dm = data_manager.DataManager(self.index.shard_path(shard))
+        if dm.num_pages() > 0:
+            dm.train_test_split(self.portion_test, seed=f"{self.seed}:{shard}")
+        return dm
+
+    def size(self) -> int:
+        return sum(
+            data_manager.DataManager(self.index.shard_path(shard)).size()
+            for shard in range(len(self.index))
+        )
+
+    def iter_data(
+        self, data_split: data_manager.TrainTest, worker_id: int = 0, num_workers: int = 1
+    ) -> Iterator[datum_lib.Datum]:
+        """Loops once through the data_split pages of this worker's shards."""
+        for shard in self.worker_shards(worker_id, num_workers):
+            dm = self.open_shard(shard)
+            if dm.num_pages() == 0:
+                continue
+            for page_num in dm.pages(data_split):
+                yield from dm._read_page(page_num).content
+
+    def iter_batches(
+        self,
+        batch_size: int,
+        data_split: data_manager.TrainTest,
+        worker_id: int = 0,
+        num_workers: int = 1,
+    ) -> Iterator[data_manager.Batch]:
+        features, targets = list(), list()
+        for datum in self.iter_data(data_split, worker_id, num_workers):
+            features.append(datum.np_feature())
+            targets.append(datum.np_target())
+            if len(features) == batch_size:
+                yield np.stack(features, axis=0), np.stack(targets, axis=0)
+                features, targets = list(), list()
+        if features:
+            yield np.stack(features, axis=0), np.stack(targets, axis=0)
+
+    def parallel_batches(
+        self, batch_size: int, data_split: data_manager.TrainTest, num_workers: int
+    ) -> Iterator[data_manager.Batch]:
+        """One pass through the data, read by num_workers processes.
+
+        Each process reads its own shards.  Batches arrive in no particular
+        order, and each process's last batch may be short.
+        """
+        queue = multiprocessing.Queue(maxsize=BATCHES_IN_FLIGHT)
+        workers = [
+            multiprocessing.Process(
+                target=_read_worker,
+                args=(
+                    self.index.path,
+                    self.portion_test,
+                    self.seed,
+                    batch_size,
+                    data_split,
+                    i,
+                    num_workers,
+                    queue,
+                ),
+                daemon=True,
+            )
+            for i in range(num_workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            running = num_workers
+            while running:
+                batch = queue.get()
+                if isinstance(batch, Exception):
+                    raise batch
+                if batch is None:
+                    running -= 1
+                    continue
+                yield batch
+        finally:
+            for worker in workers:
+                worker.terminate()
+                worker.join()
+
+
+def _read_worker(
+    index_path: str,
+    portion_test: float,
+    seed: int,
+    batch_size: int,
+    data_split: data_manager.TrainTest,
+    worker_id: int,
+    num_workers: int,
+    queue: multiprocessing.Queue,
+) -> None:
+    try:
+        dataset = ShardedDataset(index_path, portion_test, seed)
+        for batch in dataset.iter_batches(batch_size, data_split, worker_id, num_workers):
+            queue.put(batch)
+    except Exception as e:
+        queue.put(e)
+    # Marks this worker as done
+    queue.put(None)
+
+
+def records_per_shard(index: ShardIndex, max_records: int) -> int:
+    return math.ceil(max_records / len(index))
@@ -0,0 +1,56 @@
+import os
+import random
+import tempfile
+import unittest
+
+from go_space.nn import build_nn_data, data_manager, shard_lib
+from go_space.nn.data_manager_test import _random_sgf
+
+
+class ShardTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        tmp_dir = self._tmp_dir.name
+
+        src_dir = os.path.join(tmp_dir, "src")
+        os.makedirs(src_dir)
+        for i in range(6):
+            with open(os.path.join(src_dir, f"{i}.sgf"), "w") as f:
+                f.write(_random_sgf(80))
+
+        self.index_path = os.path.join(tmp_dir, "index.json")
+        disks = [os.path.join(tmp_dir, "disk_a"), os.path.join(tmp_dir, "disk_b")]
+        shard_lib.ShardIndex.create(self.index_path, disks, num_shards=3)
+        build_nn_data.translate_files_to_shards(src_dir, self.index_path, num_workers=2)
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_workers_split_data(self):
+        dataset = shard_lib.ShardedDataset(self.index_path, portion_test=0.3, seed=1)
+        self.assertEqual(dataset.worker_shards(0, 2), [0, 2])
+        self.assertEqual(dataset.worker_shards(1, 2), [1])
+
+        for split in data_manager.TrainTest:
+            everything = [d.to_json() for d in dataset.iter_data(split)]
+            by_worker = [d.to_json() for w in range(2) for d in dataset.iter_data(split, w, 2)]
+            self.assertEqual(sorted(everything), sorted(by_worker))
+
+        total = sum(len(list(dataset.iter_data(split))) for split in data_manager.TrainTest)
+        self.assertEqual(total, dataset.size())
+        self.assertGreater(total, 0)
+
+    def test_split_is_consistent(self):
+        first = shard_lib.ShardedDataset(self.index_path, portion_test=0.3, seed=1)
+        second = shard_lib.ShardedDataset(self.index_path, portion_test=0.3, seed=1)
+        for shard in range(3):
+            self.assertEqual(
+                first.open_shard(shard).test_pages, second.open_shard(shard).test_pages
+            )
+
+    def test_parallel_batches(self):
+        dataset = shard_lib.ShardedDataset(self.index_path, portion_test=0.3, seed=1)
+        split = data_manager.TrainTest.TRAIN
+        num = sum(len(features) for features, _ in dataset.parallel_batches(16, split, 2))
+        self.assertEqual(num, len(list(dataset.iter_data(split))))
@@ -0,0 +1,232 @@
+"""Finds the boards in a corpus that contain a local shape, in any orientation.
+
+A pattern is a small stencil, written as rows of
+
+    X  black stone
+    O  white stone
+    .  empty point
+    ?  anything
+
+and matches a board if, under any of the 8 symmetries, it fits somewhere on
+the board with every X, O and . agreeing.  Other Player values on the board
+(like the Spec1 marker on tseumego) count as empty.
+
+Queries go in two steps.  A bitmap index records, for each of the 81 possible
+2x2 windows, which boards contain it.  The fully specified 2x2 windows of the
+pattern narrow the corpus down to boards containing all of them.  Then each
+candidate is checked with bitboard rows: each board row is stored as a black and
+a white bitmask, so a pattern row is checked at every column offset of every
+candidate at once.
+
+Run with `python -m go_space pattern-search <pattern file>`.
+"""
+
+import argparse
+import pickle
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from go_space import build_tseumego, go_types, symmetry
+from go_space.validation import cache_lib, class_loader
+
+
+ANY = -1
+_CELLS = {
+    "X": go_types.Player.Black.value,
+    "O": go_types.Player.White.value,
+    ".": 0,
+    "?": ANY,
+}
+# Number of 2x2 window codes, with 3 states per point
+NUM_CODES = 3 ** 4
+# Candidates checked at once
+VERIFY_BATCH = 4096
+
+# (board id, transform of the pattern, row, col) of the pattern's top-left
+Match = Tuple[int, int, int, int]
+
+
+def parse(rows: List[str]) -> np.ndarray:
+    """Reads a pattern from rows of X, O, . and ?.  Spaces are ignored."""
+    rows = [row.replace(" ", "") for row in rows if row.strip()]
+    if not rows or len({len(row) for row in rows}) != 1:
+        raise ValueError("Pattern rows must be non-empty and the same length")
+    try:
+        result = np.array([[_CELLS[c] for c in row] for row in rows], dtype=np.int8)
+    except KeyError as e:
+        raise ValueError(f"Unknown pattern cell {e}")
+    if np.all(result == ANY):
+        raise ValueError("Pattern must have at least one X, O or .")
+    return result
+
+
+def _trim(pattern: np.ndarray) -> np.ndarray:
+    """Drops edge rows and columns that are all ANY."""
+    cares = pattern != ANY
+    rows, cols = np.flatnonzero(cares.any(axis=1)), np.flatnonzero(cares.any(axis=0))
+    return pattern[rows[0] : rows[-1] + 1, cols[0] : cols[-1] + 1]
+
+
+def variants(pattern: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+    """The distinct (transform, pattern) under the 8 symmetries."""
+    h, w = pattern.shape
+    # Pad to a square with ANY, so the symmetry tables apply, then trim.
+    square = np.full((max(h, w), max(h, w)), ANY, dtype=np.int8)
+    square[:h, :w] = pattern
+    result, seen = list(), set()
+    for k in range(symmetry.NUM_TRANSFORMS):
+        variant = _trim(symmetry.transform_boards(square, k))
+        key = (variant.shape, variant.tobytes())
+        if key not in seen:
+            seen.add(key)
+            result.append((k, variant))
+    return result
+
+
+def _normalize(boards: np.ndarray) -> np.ndarray:
+    """Just 0, Black and White."""
+    black, white = go_types.Player.Black.value, go_types.Player.White.value
+    return np.where((boards == black) | (boards == white), boards, 0).astype(np.int8)
+
+
+def _window_codes(boards: np.ndarray) -> np.ndarray:
+    """The code of each 2x2 window, from normalized (..., h, w) boards."""
+    return (
+        boards[..., :-1, :-1]
+        + 3 * boards[..., :-1, 1:]
+        + 9 * boards[..., 1:, :-1]
+        + 27 * boards[..., 1:, 1:]
+    ).astype(np.intp)
+
+
+def _row_bits(boards: np.ndarray, value: int) -> np.ndarray:
+    """Bit c of [..., r] is set if boards[..., r, c] == value."""
+    weights = np.uint64(1) << np.arange(boards.shape[-1], dtype=np.uint64)
+    return np.where(boards == value, weights, np.uint64(0)).sum(axis=-1, dtype=np.uint64)
+
+
+class PatternIndex(object):
+    def __init__(self, boards: np.ndarray):
+        """Indexes an (n, size, size) board tensor."""
+        boards = _normalize(boards)
+        self.num_boards, self.size = boards.shape[0], boards.shape[-1]
+        if self.size > 64:
+            raise ValueError("Boards rows must fit in 64 bits")
+        self._black = _row_bits(boards, go_types.Player.Black.value)
+        self._white = _row_bits(boards, go_types.Player.White.value)
+
+        present = np.zeros((NUM_CODES, self.num_boards), dtype=bool)
+        codes = _window_codes(boards).reshape(self.num_boards, -1)
+        present[codes, np.arange(self.num_boards)[:, np.newaxis]] = True
+        # One bitmap of boards per window code
+        self._postings = np.packbits(present, axis=1)
+
+    def __len__(self) -> int:
+        return self.num_boards
+
+    def candidates(self, pattern: np.ndarray) -> np.ndarray:
+        """Ids of boards that contain all the fully specified 2x2 windows of some variant."""
+        result = np.zeros(self._postings.shape[1], dtype=np.uint8)
+        for _, variant in variants(pattern):
+            bitmap = np.full(self._postings.shape[1], 0xFF, dtype=np.uint8)
+            if variant.shape[0] > 1 and variant.shape[1] > 1:
+                windows = _window_codes(np.maximum(variant, 0))
+                known = _window_codes((variant == ANY).astype(np.int8)) == 0
+                # Every board has empty windows, so they don't narrow anything.
+                for code in np.unique(windows[known & (windows != 0)]):
+                    bitmap &= self._postings[code]
+            result |= bitmap
+        return np.flatnonzero(np.unpackbits(result)[: self.num_boards])
+
+    def _verify(
+        self, ids: np.ndarray, variant: np.ndarray
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """The (id, row, col) where variant fits, for boards ids."""
+        h, w = variant.shape
+        if h > self.size or w > self.size:
+            return
+        num_rows, num_cols = self.size - h + 1, self.size - w + 1
+        shifts = np.arange(num_cols, dtype=np.uint64)
+        for start in range(0, len(ids), VERIFY_BATCH):
+            batch = ids[start : start + VERIFY_BATCH]
+            # (m, size, num_cols): each row shifted so that column c is bit 0
+            black = self._black[batch][:, :, np.newaxis] >> shifts
+            white = self._white[batch][:, :, np.newaxis] >> shifts
+            fits = np.ones((len(batch), num_rows, num_cols), dtype=bool)
+            for i in range(h):
+                care = _row_bits((variant[i] != ANY).astype(np.int8), 1)
+                want_black = _row_bits(variant[i], go_types.Player.Black.value)
+                want_white = _row_bits(variant[i], go_types.Player.White.value)
+                fits &= (black[:, i : i + num_rows] & care) == want_black
+                fits &= (white[:, i : i + num_rows] & care) == want_white
+            board, row, col = np.nonzero(fits)
+            yield batch[board], row, col
+
+    def search(self, pattern: np.ndarray) -> List[Match]:
+        """Every place the pattern fits, in any orientation."""
+        ids = self.candidates(pattern)
+        result = list()
+        for k, variant in variants(pattern):
+            for board, row, col in self._verify(ids, variant):
+                result.extend(zip(board.tolist(), [k] * len(board), row.tolist(), col.tolist()))
+        return sorted(result)
+
+    def matching_boards(self, pattern: np.ndarray) -> np.ndarray:
+        """Ids of the boards that contain the pattern."""
+        ids = self.candidates(pattern)
+        found = np.zeros(self.num_boards, dtype=bool)
+        for _, variant in variants(pattern):
+            remaining = ids[~found[ids]]
+            for board, _, _ in self._verify(remaining, variant):
+                found[board] = True
+        return np.flatnonzero(found)
+
+
+def corpus_boards(chunk_dir: str = build_tseumego.OUTPUT_PATH) -> cache_lib.Labeled:
+    """Board tensor of the tseumego written by build-tseumego, labeled by file name."""
+    chunks = build_tseumego.chunk_files(chunk_dir)
+
+    def compute() -> cache_lib.Labeled:
+        boards, labels = list(), list()
+        for chunk in chunks:
+            with open(chunk, "rb") as f:
+                for tseumego in pickle.load(f):
+                    boards.append(tseumego.grid.to_array())
+                    labels.append(tseumego.file_name)
+        return np.stack(boards, axis=0), np.array(labels)
+
+    return cache_lib.cached("corpus_boards", chunks, compute)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Finds boards containing a shape.")
+    parser.add_argument("pattern_file", type=str, help="Rows of X, O, . and ?")
+    parser.add_argument("--source", choices=["classes", "corpus"], default="classes")
+    parser.add_argument("--show", type=int, default=3, help="Print this many matching boards")
+    args = parser.parse_args(argv)
+
+    with open(args.pattern_file, "r") as f:
+        pattern = parse(f.read().splitlines())
+
+    if args.source == "classes":
+        classes = class_loader.load_classes()
+        boards, labels = classes.boards, classes.labels
+    else:
+        boards, labels = corpus_boards()
+
+    index = PatternIndex(boards)
+    ids = index.matching_boards(pattern)
+    print(f"{len(ids)} of {len(index)} boards match")
+    names, counts = np.unique(labels[ids], return_counts=True)
+    if args.source == "classes":
+        for name, count in zip(names, counts):
+            print(f"  {name}: {count}")
+    for i in ids[: args.show]:
+        print()
+        print(labels[i])
+        print(go_types.Grid.from_array(boards[i]).ascii_board())
+
+
+if __name__ == "__main__":
+    main()
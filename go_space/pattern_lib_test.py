@@ -0,0 +1,75 @@
+import unittest
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from go_space import go_types, pattern_lib, symmetry
+
+
+def _brute_force(boards: np.ndarray, pattern: np.ndarray):
+    """Every (board, transform, row, col), trying each transform of the stencil directly."""
+    result = set()
+    boards = pattern_lib._normalize(boards)
+    for k, (transpose, flip_rows, flip_cols) in enumerate(symmetry.TRANSFORMS):
+        variant = pattern.T if transpose else pattern
+        variant = variant[:: -1 if flip_rows else 1, :: -1 if flip_cols else 1]
+        if variant.shape[0] > boards.shape[1] or variant.shape[1] > boards.shape[2]:
+            continue
+        windows = sliding_window_view(boards, variant.shape, axis=(1, 2))
+        fits = np.all((windows == variant) | (variant == pattern_lib.ANY), axis=(-2, -1))
+        result |= {(b, variant.tobytes(), variant.shape, r, c) for b, r, c in np.argwhere(fits)}
+    return result
+
+
+class PatternTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # Sparse-ish boards, with some Spec1 markers
+        self.boards = rng.choice([0, 0, 0, 1, 2, 3], size=(300, 9, 9), p=[0.3, 0.2, 0.2, 0.14, 0.14, 0.02])
+        self.boards = self.boards.astype(np.int8)
+        self.index = pattern_lib.PatternIndex(self.boards)
+
+    def test_parse(self):
+        np.testing.assert_array_equal(
+            pattern_lib.parse(["X O", "? ."]),
+            [[go_types.Player.Black.value, go_types.Player.White.value], [pattern_lib.ANY, 0]],
+        )
+        for bad in (["XO", "X"], ["XZ"], ["??"], []):
+            with self.assertRaises(ValueError):
+                pattern_lib.parse(bad)
+
+    def test_variants(self):
+        self.assertEqual(len(pattern_lib.variants(pattern_lib.parse(["X"]))), 1)
+        self.assertEqual(len(pattern_lib.variants(pattern_lib.parse(["XO"]))), 4)
+        self.assertEqual(len(pattern_lib.variants(pattern_lib.parse(["XO.", "X??"]))), 8)
+
+    def test_matches_brute_force(self):
+        for rows in (["XO", "OX"], ["X.X", "?O?"], ["XXX"], ["O"], ["X.", ".O", "?X"], [".."]):
+            pattern = pattern_lib.parse(rows)
+            expected = _brute_force(self.boards, pattern)
+            variants = dict(pattern_lib.variants(pattern))
+            actual = {
+                (b, variants[k].tobytes(), variants[k].shape, r, c)
+                for b, k, r, c in self.index.search(pattern)
+            }
+            self.assertEqual(actual, expected, rows)
+            np.testing.assert_array_equal(
+                self.index.matching_boards(pattern), sorted({b for b, *_ in expected})
+            )
+
+    def test_candidates_cover_matches(self):
+        pattern = pattern_lib.parse(["XO?", "OX."])
+        candidates = set(self.index.candidates(pattern).tolist())
+        matches = set(self.index.matching_boards(pattern).tolist())
+        self.assertTrue(matches <= candidates)
+        self.assertLess(len(candidates), len(self.boards))
+
+    def test_full_size_boards(self):
+        boards = np.zeros((2, 19, 19), dtype=np.int8)
+        boards[1, 18, 16:19] = go_types.Player.White.value
+        index = pattern_lib.PatternIndex(boards)
+        self.assertEqual(index.matching_boards(pattern_lib.parse(["O", "O", "O"])).tolist(), [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,281 @@
+"""An index of the corner positions reached in a folder of SGF games.
+
+Run with `python -m go_space position-index build` to index the games, and
+`python -m go_space position-index lookup <tseumego or class json>` to see what
+was played next from a position.
+
+Every game is replayed once.  Before each triggering move (see
+build_nn_data.TriggerConfig; by default any move in the 4x4 box of a corner),
+we record the corner region around the move, cropped and canonicalized like a
+Datum: flipped into the top-left corner, colors swapped so that Black is to
+move, then reflected across the diagonal if that's lexicographically smaller.
+The Zobrist hash of that crop is stored in sqlite, with the game, the move
+number and the next move in the canonical frame.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import attr
+import numpy as np
+
+from go_space import board_lib, consts, go_types, symmetry, zobrist
+from go_space.nn import build_nn_data, datum_lib, manifest_lib
+
+
+INDEX_PATH = os.path.join(consts.TOP_LEVEL_PATH, "data", "_position_index.sqlite")
+DEFAULT_SRC_DIR = os.path.join(consts.TOP_LEVEL_PATH, "data", "_data")
+# Hashes per query, under sqlite's limit on parameters
+LOOKUP_BATCH = 500
+# Games indexed between commits
+COMMIT_EVERY = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id INTEGER PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    sha1 TEXT NOT NULL UNIQUE,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS positions (
+    hash INTEGER NOT NULL,
+    game_id INTEGER NOT NULL,
+    move_number INTEGER NOT NULL,
+    next_row INTEGER NOT NULL,
+    next_col INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS positions_by_hash ON positions (hash);
+"""
+
+
+@attr.s(frozen=True)
+class Hit(object):
+    file_name: str = attr.ib()
+    # Number of moves played before the position
+    move_number: int = attr.ib()
+    # The next move, in the frame of the queried crop
+    next_pt: go_types.Point = attr.ib()
+
+
+def canonical_corners(crops: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashes (n, DATA_BOARD_SIZE, DATA_BOARD_SIZE) corner crops, Black to move.
+
+    Returns the (n,) int64 hashes, and the transform (from symmetry.CORNER_TRANSFORMS)
+    that took each crop to its canonical form.
+    """
+    canonical, transforms = symmetry.canonical(crops, symmetry.CORNER_TRANSFORMS)
+    # sqlite integers are signed
+    return zobrist.hash_boards(canonical).view(np.int64), transforms
+
+
+def game_positions(sgf: str, trigger: build_nn_data.TriggerConfig) -> np.ndarray:
+    """Replays a game, and returns its positions as rows of the positions table.
+
+    The result is an (n, 4) int64 array of (hash, move_number, next_row, next_col).
+    """
+    board = board_lib.Board()
+    crops, moves, next_pts = list(), list(), list()
+    for move_number, (pt, player) in enumerate(build_nn_data.loop_game(sgf)):
+        if trigger.triggers(board._grid, pt, player):
+            crop = datum_lib.corner_crop(board._grid.to_array(), pt)
+            if player == go_types.Player.White:
+                crop = datum_lib.swap_colors(crop)
+            crops.append(crop)
+            moves.append(move_number)
+            next_pts.append(pt.mod_row_col())
+        board.place(pt, player)
+
+    if not crops:
+        return np.zeros((0, 4), dtype=np.int64)
+    hashes, transforms = canonical_corners(np.stack(crops, axis=0))
+    next_pts = np.array(next_pts)
+    transposed = transforms != 0
+    next_pts[transposed] = next_pts[transposed][:, ::-1]
+    return np.column_stack([hashes, moves, next_pts]).astype(np.int64)
+
+
+def _index_file(
+    file: str, trigger: build_nn_data.TriggerConfig
+) -> Tuple[str, str, Optional[np.ndarray], Optional[str]]:
+    with open(file, "rb") as f:
+        bites = f.read()
+    try:
+        rows = game_positions(build_nn_data.decode_game(bites), trigger)
+    except Exception as e:
+        return file, manifest_lib.sha1(bites), None, repr(e)
+    return file, manifest_lib.sha1(bites), rows, None
+
+
+class PositionIndex(object):
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "PositionIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def has_game(self, sha1: str) -> bool:
+        cursor = self.conn.execute("SELECT 1 FROM games WHERE sha1 = ?", (sha1,))
+        return cursor.fetchone() is not None
+
+    def add_game(
+        self, file_name: str, sha1: str, rows: Optional[np.ndarray], error: Optional[str] = None
+    ) -> None:
+        cursor = self.conn.execute(
+            "INSERT INTO games (file_name, sha1, error) VALUES (?, ?, ?)",
+            (os.path.basename(file_name), sha1, error),
+        )
+        if rows is not None and len(rows):
+            game_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO positions VALUES (?, ?, ?, ?, ?)",
+                ((h, game_id, m, r, c) for h, m, r, c in rows.tolist()),
+            )
+
+    def build(
+        self,
+        files: List[str],
+        trigger: build_nn_data.TriggerConfig = build_nn_data.DEFAULT_TRIGGER,
+        num_workers: int = 1,
+    ) -> int:
+        """Indexes the games in files that aren't yet indexed.  Returns the number added.
+
+        Games are recognized by a hash of their content.
+        """
+        todo = list()
+        for file in files:
+            with open(file, "rb") as f:
+                if not self.has_game(manifest_lib.sha1(f.read())):
+                    todo.append(file)
+
+        added = 0
+        with multiprocessing.Pool(num_workers) as pool:
+            results = pool.imap_unordered(
+                _IndexTask(trigger), todo, chunksize=max(1, len(todo) // (8 * num_workers))
+            )
+            for file, sha1, rows, error in results:
+                # In case of duplicate files
+                if self.has_game(sha1):
+                    continue
+                self.add_game(file, sha1, rows, error)
+                added += 1
+                if added % COMMIT_EVERY == 0:
+                    self.conn.commit()
+                    print(f"Indexed {added} games")
+        self.conn.commit()
+        return added
+
+    def _lookup_rows(self, hashes: Iterable[int]) -> List[Tuple[int, str, int, int, int]]:
+        hashes = list(dict.fromkeys(int(h) for h in hashes))
+        result = list()
+        for start in range(0, len(hashes), LOOKUP_BATCH):
+            batch = hashes[start : start + LOOKUP_BATCH]
+            result.extend(
+                self.conn.execute(
+                    "SELECT p.hash, g.file_name, p.move_number, p.next_row, p.next_col "
+                    "FROM positions p JOIN games g ON p.game_id = g.game_id "
+                    f"WHERE p.hash IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+            )
+        return result
+
+    def lookup(self, crops: np.ndarray) -> List[List[Hit]]:
+        """The games that reached each crop, with Black to move.
+
+        crops is an (n, DATA_BOARD_SIZE, DATA_BOARD_SIZE) stack, as made by
+        datum_lib.corner_crop.
+        """
+        hashes, transforms = canonical_corners(crops)
+        by_hash: Dict[int, List[Tuple[str, int, int, int]]] = dict()
+        for h, file_name, move_number, row, col in self._lookup_rows(hashes.tolist()):
+            by_hash.setdefault(h, list()).append((file_name, move_number, row, col))
+
+        result = list()
+        for h, transform in zip(hashes.tolist(), transforms.tolist()):
+            hits = list()
+            for file_name, move_number, row, col in by_hash.get(h, list()):
+                # Back from the canonical frame.  The corner transforms are their own inverses.
+                if transform != 0:
+                    row, col = col, row
+                hits.append(Hit(file_name, move_number, go_types.Point(row, col)))
+            result.append(hits)
+        return result
+
+    def next_moves(self, crop: np.ndarray) -> List[Tuple[go_types.Point, int]]:
+        """How often each next move was played from crop, most common first."""
+        counts: Dict[go_types.Point, int] = dict()
+        for hit in self.lookup(crop[np.newaxis])[0]:
+            counts[hit.next_pt] = counts.get(hit.next_pt, 0) + 1
+        return sorted(counts.items(), key=lambda kv: (-kv[1], kv[0].row, kv[0].col))
+
+
+@attr.s(frozen=True)
+class _IndexTask(object):
+    """_index_file with the trigger bound, picklable for the worker pool."""
+
+    trigger: build_nn_data.TriggerConfig = attr.ib()
+
+    def __call__(self, file: str):
+        return _index_file(file, self.trigger)
+
+
+def _crop_from_board(board: board_lib.Board) -> np.ndarray:
+    """The crop around the board's first stone, for querying with tseumego and class files."""
+    pt = next(board._grid.sparse_iter())
+    return datum_lib.corner_crop(board.to_array(), pt)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Indexes and searches corner positions.")
+    parser.add_argument("--index_path", type=str, default=INDEX_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Index the SGFs in src_dir")
+    build.add_argument("--src_dir", type=str, default=DEFAULT_SRC_DIR)
+    build.add_argument("--workers", type=int, default=os.cpu_count())
+    build.add_argument(
+        "--min_stones",
+        type=int,
+        default=0,
+        help="Only index positions with this many stones in the corner region",
+    )
+
+    lookup = commands.add_parser("lookup", help="Print next moves from a position")
+    lookup.add_argument("json_file", type=str, help="A file with black and white fields")
+    lookup.add_argument(
+        "--fields", nargs=2, default=["AB", "AW"], help="Names of the black and white fields"
+    )
+    args = parser.parse_args(argv)
+
+    with PositionIndex(args.index_path) as index:
+        if args.command == "build":
+            trigger = build_nn_data.TriggerConfig(min_stones=args.min_stones)
+            files = build_nn_data.sgf_files(args.src_dir)
+            added = index.build(files, trigger, args.workers)
+            print(f"Added {added} games")
+            return
+
+        with open(args.json_file, "r") as f:
+            bw = json.load(f)
+        board = board_lib.boardFromBwBoardStr(
+            bw, {"black": args.fields[0], "white": args.fields[1]}
+        )
+        print(board.ascii_board())
+        for pt, count in index.next_moves(_crop_from_board(board)):
+            print(f"{pt.row},{pt.col}: {count}")
+
+
+if __name__ == "__main__":
+    main()
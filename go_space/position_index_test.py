@@ -0,0 +1,80 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from go_space import board_lib, go_types, position_index
+from go_space.nn import build_nn_data, datum_lib
+from go_space.nn.build_nn_data_test import _random_sgf
+
+
+class PositionIndexTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_dir = self._tmp_dir.name
+        self.files = list()
+        for i in range(6):
+            self.files.append(os.path.join(self.tmp_dir, f"game_{i}.sgf"))
+            with open(self.files[-1], "w") as f:
+                f.write(_random_sgf(100))
+        self.index_path = os.path.join(self.tmp_dir, "index.sqlite")
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _positions(self, file: str):
+        """(crop, move number, next point) for each triggering move, by replaying."""
+        with open(file, "r") as f:
+            sgf = f.read()
+        board = board_lib.Board()
+        for move_number, (pt, player) in enumerate(build_nn_data.loop_game(sgf)):
+            if build_nn_data.DEFAULT_TRIGGER.triggers(board._grid, pt, player):
+                crop = datum_lib.corner_crop(board.to_array(), pt)
+                if player == go_types.Player.White:
+                    crop = datum_lib.swap_colors(crop)
+                yield crop, move_number, go_types.Point(*pt.mod_row_col())
+            board.place(pt, player)
+
+    def test_lookup(self):
+        with position_index.PositionIndex(self.index_path) as index:
+            self.assertEqual(index.build(self.files, num_workers=2), 6)
+
+            for file in self.files[:2]:
+                positions = list(self._positions(file))
+                self.assertGreater(len(positions), 0)
+                crops = np.stack([crop for crop, _, _ in positions], axis=0)
+                for (_, move_number, next_pt), hits in zip(positions, index.lookup(crops)):
+                    hit = position_index.Hit(os.path.basename(file), move_number, next_pt)
+                    self.assertIn(hit, hits)
+
+                # Reflecting the position reflects the next moves
+                crop, move_number, next_pt = positions[-1]
+                hits = index.lookup(crop.T[np.newaxis])[0]
+                hit = position_index.Hit(
+                    os.path.basename(file), move_number, go_types.Point(next_pt.col, next_pt.row)
+                )
+                self.assertIn(hit, hits)
+
+    def test_next_moves(self):
+        with position_index.PositionIndex(self.index_path) as index:
+            index.build(self.files)
+            crop, _, _ = next(self._positions(self.files[0]))
+            moves = index.next_moves(crop)
+            self.assertEqual(sum(count for _, count in moves), len(index.lookup(crop[np.newaxis])[0]))
+            counts = [count for _, count in moves]
+            self.assertEqual(counts, sorted(counts, reverse=True))
+
+    def test_build_skips_indexed_games(self):
+        with position_index.PositionIndex(self.index_path) as index:
+            index.build(self.files[:3])
+        with position_index.PositionIndex(self.index_path) as index:
+            self.assertEqual(index.build(self.files), 3)
+            (num_games,) = index.conn.execute("SELECT COUNT(*) FROM games").fetchone()
+            self.assertEqual(num_games, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
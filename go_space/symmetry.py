@@ -0,0 +1,129 @@
+"""The 8 symmetries of a square board: rotations, reflections and the transpose.
+
+Transform k is the k-th entry of TRANSFORMS, (transpose, flip_rows, flip_cols),
+applied in that order to each point.  For each board size we precompute, for
+every transform, where each point goes, and where each point comes from, as
+permutations of the flat point index row * size + col.  So a transform is a
+single np.take on boards or point indices.
+"""
+
+import functools
+import itertools
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# (transpose, flip_rows, flip_cols).  Transform 0 is the identity.
+TRANSFORMS: List[Tuple[bool, bool, bool]] = list(itertools.product((False, True), repeat=3))
+NUM_TRANSFORMS = len(TRANSFORMS)
+
+
+def index(transpose: bool = False, flip_rows: bool = False, flip_cols: bool = False) -> int:
+    return TRANSFORMS.index((transpose, flip_rows, flip_cols))
+
+
+@functools.lru_cache(maxsize=None)
+def point_maps(size: int) -> np.ndarray:
+    """(NUM_TRANSFORMS, size * size) array: where transform k sends each point index."""
+    rows, cols = np.divmod(np.arange(size * size), size)
+    result = np.empty((NUM_TRANSFORMS, size * size), dtype=np.intp)
+    for k, (transpose, flip_rows, flip_cols) in enumerate(TRANSFORMS):
+        r, c = (cols, rows) if transpose else (rows, cols)
+        if flip_rows:
+            r = size - 1 - r
+        if flip_cols:
+            c = size - 1 - c
+        result[k] = r * size + c
+    result.setflags(write=False)
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def permutations(size: int) -> np.ndarray:
+    """(NUM_TRANSFORMS, size * size) array: which point each point index comes from.
+
+    The inverse of point_maps, so that transformed boards are a take on the flat boards.
+    """
+    maps = point_maps(size)
+    result = np.empty_like(maps)
+    for k in range(NUM_TRANSFORMS):
+        result[k, maps[k]] = np.arange(size * size)
+    result.setflags(write=False)
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def _inverses() -> Tuple[int, ...]:
+    maps = point_maps(2)
+    identity = np.arange(4)
+    return tuple(
+        next(j for j in range(NUM_TRANSFORMS) if np.array_equal(maps[j][maps[k]], identity))
+        for k in range(NUM_TRANSFORMS)
+    )
+
+
+def inverse(k: int) -> int:
+    """The transform that undoes transform k."""
+    return _inverses()[k]
+
+
+# The reflections that keep the top-left corner in place
+CORNER_TRANSFORMS = (0, index(transpose=True))
+
+
+def transform_boards(boards: np.ndarray, k: int) -> np.ndarray:
+    """Applies transform k to a (..., size, size) array of boards."""
+    size = boards.shape[-1]
+    flat = boards.reshape(boards.shape[:-2] + (size * size,))
+    return np.take(flat, permutations(size)[k], axis=-1).reshape(boards.shape)
+
+
+def all_transforms(boards: np.ndarray) -> np.ndarray:
+    """Every transform of an (n, size, size) board tensor, as (n, NUM_TRANSFORMS, size, size)."""
+    n, size = boards.shape[0], boards.shape[-1]
+    flat = boards.reshape(n, size * size)
+    return np.take(flat, permutations(size), axis=-1).reshape(n, NUM_TRANSFORMS, size, size)
+
+
+def transform_indices(indices: np.ndarray, k: int, size: int) -> np.ndarray:
+    """Applies transform k to flat point indices (row * size + col)."""
+    return np.take(point_maps(size)[k], indices)
+
+
+def transform_points(points: np.ndarray, k: int, size: int) -> np.ndarray:
+    """Applies transform k to an (m, 2) array of (row, col)."""
+    points = np.asarray(points)
+    moved = transform_indices(points[:, 0] * size + points[:, 1], k, size)
+    return np.stack(np.divmod(moved, size), axis=-1)
+
+
+def canonical(
+    boards: np.ndarray, transforms: Optional[Sequence[int]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """The lexicographically smallest transform of each board.
+
+    Takes an (n, size, size) board tensor, and returns the canonical boards
+    along with the transform that made each.  Boards that are symmetric get the
+    lowest such transform.
+
+    If transforms is passed, only those are considered.  It should be a
+    subgroup, such as CORNER_TRANSFORMS for positions in a corner.
+    """
+    if transforms is None:
+        transforms = range(NUM_TRANSFORMS)
+    transforms = np.asarray(transforms)
+    n, size = boards.shape[0], boards.shape[-1]
+    flat = boards.reshape(n, size * size)
+    candidates = np.take(flat, permutations(size)[transforms], axis=-1)
+    alive = np.ones((n, len(transforms)), dtype=bool)
+    # Compare one point at a time, dropping transforms that are larger, until
+    # only one (or a tie of identical boards) is left per board.
+    big = np.iinfo(np.int64).max
+    for i in range(size * size):
+        values = np.where(alive, candidates[:, :, i].astype(np.int64), big)
+        alive &= values == values.min(axis=1, keepdims=True)
+        if np.all(alive.sum(axis=1) == 1):
+            break
+    best = np.argmax(alive, axis=1)
+    return candidates[np.arange(n), best].reshape(boards.shape), transforms[best]
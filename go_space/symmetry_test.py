@@ -0,0 +1,91 @@
+import unittest
+
+import numpy as np
+
+from go_space import go_types, symmetry
+
+
+def _manual(board: np.ndarray, k: int) -> np.ndarray:
+    transpose, flip_rows, flip_cols = symmetry.TRANSFORMS[k]
+    if transpose:
+        board = board.T
+    if flip_rows:
+        board = board[::-1]
+    if flip_cols:
+        board = board[:, ::-1]
+    return board
+
+
+class SymmetryTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def _boards(self, n: int, size: int) -> np.ndarray:
+        return self.rng.integers(0, 3, size=(n, size, size)).astype(np.int8)
+
+    def test_transform_boards(self):
+        for size in (5, 9, 19):
+            boards = self._boards(4, size)
+            all_boards = symmetry.all_transforms(boards)
+            for k in range(symmetry.NUM_TRANSFORMS):
+                for i in range(4):
+                    expected = _manual(boards[i], k)
+                    np.testing.assert_array_equal(symmetry.transform_boards(boards[i], k), expected)
+                    np.testing.assert_array_equal(all_boards[i, k], expected)
+
+    def test_all_distinct(self):
+        board = np.arange(49).reshape(7, 7)
+        transformed = {symmetry.transform_boards(board, k).tobytes() for k in range(8)}
+        self.assertEqual(len(transformed), symmetry.NUM_TRANSFORMS)
+
+    def test_points_follow_boards(self):
+        size = 7
+        for k in range(symmetry.NUM_TRANSFORMS):
+            for row, col in [(0, 0), (1, 5), (6, 2), (3, 3)]:
+                board = np.zeros((size, size), dtype=np.int8)
+                board[row, col] = 1
+                moved = symmetry.transform_boards(board, k)
+                np.testing.assert_array_equal(
+                    symmetry.transform_points(np.array([[row, col]]), k, size),
+                    np.argwhere(moved == 1),
+                )
+
+    def test_inverse(self):
+        board = self._boards(1, 6)[0]
+        for k in range(symmetry.NUM_TRANSFORMS):
+            back = symmetry.transform_boards(symmetry.transform_boards(board, k), symmetry.inverse(k))
+            np.testing.assert_array_equal(back, board)
+
+    def test_canonical(self):
+        boards = self._boards(10, 9)
+        canonical, transforms = symmetry.canonical(boards)
+        for i in range(10):
+            np.testing.assert_array_equal(
+                canonical[i], symmetry.transform_boards(boards[i], transforms[i])
+            )
+            smallest = min(symmetry.transform_boards(boards[i], k).tobytes() for k in range(8))
+            self.assertEqual(canonical[i].tobytes(), smallest)
+            # Every transform of a board has the same canonical form
+            others, _ = symmetry.canonical(symmetry.all_transforms(boards[i : i + 1])[0])
+            for other in others:
+                np.testing.assert_array_equal(other, canonical[i])
+
+    def test_canonical_symmetric_board(self):
+        board = np.zeros((1, 5, 5), dtype=np.int8)
+        board[0, 2, 2] = 1
+        _, transforms = symmetry.canonical(board)
+        self.assertEqual(transforms.tolist(), [0])
+
+    def test_grid_transform(self):
+        grid = go_types.Grid(size=6)
+        for row, col, player in [(0, 1, go_types.Player.Black), (4, 2, go_types.Player.White)]:
+            grid[go_types.Point(row, col)] = go_types.Chonk(player, set(), set())
+        board = grid.to_array()
+        for k in range(symmetry.NUM_TRANSFORMS):
+            moved = grid.copy()
+            moved.transform(k)
+            np.testing.assert_array_equal(moved.to_array(), symmetry.transform_boards(board, k))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+"""Whole-board embeddings of every position along a game.
+
+Run with `python -m go_space trajectory <sgf file>` to save a (moves, dim)
+matrix, one row for the position after each move.
+
+Each row is what NNEmbed.whole_board_embedding_batch gives for that position,
+but the game is replayed only once.  A move only changes the corners holding
+the new stone or the stones it captures, so only those corners are cropped
+again.  The crops from the whole game are deduplicated, then embedded in a few
+large batches.
+"""
+
+import argparse
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from go_space import board_lib, consts, embeddings, symmetry
+from go_space.go_types import bitboard_lib
+from go_space.nn import build_nn_data, datum_lib
+
+
+# Crops per call to the model
+BATCH_SIZE = 4096
+# In trajectory_crops, for corners with no stones
+EMPTY = -1
+
+
+def _corner_masks(size: int) -> List[bitboard_lib.Bitboard]:
+    return [
+        datum_lib.flipped_corner_mask(*datum_lib.corner_flips(pt), size)
+        for pt in datum_lib.CORNER_POINTS
+    ]
+
+
+def trajectory_crops(sgf: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Replays a game, cropping each corner whenever it changes.
+
+    Returns the (c, DATA_BOARD_SIZE, DATA_BOARD_SIZE) distinct crops, and a
+    (moves, NUM_CORNERS) array with the crop of each corner after each move, or
+    EMPTY.
+    """
+    board = board_lib.Board()
+    array = board.to_array()
+    masks = _corner_masks(consts.SIZE)
+    crops, crop_ids = list(), dict()
+    current = [EMPTY] * datum_lib.NUM_CORNERS
+    result = list()
+    for pt, player in build_nn_data.loop_game(sgf):
+        before = board._grid.bitboard()
+        board.place(pt, player)
+        after = board._grid.bitboard()
+        array[pt.row, pt.col] = player.value
+        for captured in bitboard_lib.to_points(before & ~after, consts.SIZE):
+            array[captured.row, captured.col] = 0
+
+        changed = before ^ after
+        for corner, (corner_pt, mask) in enumerate(zip(datum_lib.CORNER_POINTS, masks)):
+            if not changed & mask:
+                continue
+            if not after & mask:
+                current[corner] = EMPTY
+                continue
+            crop = datum_lib.corner_crop(array, corner_pt)
+            key = crop.tobytes()
+            if key not in crop_ids:
+                crop_ids[key] = len(crops)
+                crops.append(crop)
+            current[corner] = crop_ids[key]
+        result.append(list(current))
+
+    size = consts.DATA_BOARD_SIZE
+    crops = np.stack(crops, axis=0) if crops else np.zeros((0, size, size), dtype=np.int8)
+    return crops, np.array(result, dtype=np.intp).reshape(-1, datum_lib.NUM_CORNERS)
+
+
+def game_trajectory(
+    sgf: str,
+    embed_features: Callable[[np.ndarray], np.ndarray],
+    pooling: str = "mean",
+    batch_size: int = BATCH_SIZE,
+) -> np.ndarray:
+    """The whole-board embedding of the position after each move of a game.
+
+    embed_features is NNEmbed.embed_features, or anything else taking a stack
+    of model inputs.
+    """
+    crops, crop_of_corner = trajectory_crops(sgf)
+    canonical, _ = symmetry.canonical(crops, symmetry.CORNER_TRANSFORMS)
+    features = datum_lib.crop_features(canonical)
+    if not len(features):
+        # Still run the model on something, to get the dimension
+        features = np.zeros((1,) + datum_lib.FEATURE_SHAPE)
+    vectors = np.concatenate(
+        [
+            embed_features(features[start : start + batch_size])
+            for start in range(0, len(features), batch_size)
+        ],
+        axis=0,
+    )
+
+    slots = np.flatnonzero(crop_of_corner != EMPTY)
+    return embeddings.pool_corners(
+        vectors[crop_of_corner.ravel()[slots]], slots, len(crop_of_corner), pooling
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Embeds every position along a game.")
+    parser.add_argument("sgf_file", type=str)
+    parser.add_argument("--output", type=str, default=None, help="Defaults to <sgf>.npy")
+    parser.add_argument("--pooling", choices=embeddings.POOLINGS, default="mean")
+    parser.add_argument("--batch_size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    with open(args.sgf_file, "rb") as f:
+        sgf = build_nn_data.decode_game(f.read())
+    nn_embed = embeddings.NNEmbed()
+
+    start = time.time()
+    result = game_trajectory(sgf, nn_embed.embed_features, args.pooling, args.batch_size)
+    print(f"Embedded {len(result)} moves in {time.time() - start:.2f}s")
+
+    output = args.output or f"{args.sgf_file}.npy"
+    np.save(output, result)
+    print(f"Saved {result.shape} to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import random
+import unittest
+
+import numpy as np
+
+from go_space import board_lib, embeddings, trajectory
+from go_space.nn import build_nn_data
+from go_space.nn.build_nn_data_test import _random_sgf
+
+_WEIGHTS = np.random.default_rng(0).normal(size=(11 * 11, 6))
+
+
+def _fake_embed_features(features: np.ndarray) -> np.ndarray:
+    return features.reshape(len(features), -1) @ _WEIGHTS
+
+
+def _replayed_boards(sgf: str) -> np.ndarray:
+    board = board_lib.Board()
+    result = list()
+    for pt, player in build_nn_data.loop_game(sgf):
+        board.place(pt, player)
+        result.append(board.to_array())
+    return np.stack(result, axis=0)
+
+
+class TrajectoryTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        # Black captures a white stone in the top-left corner
+        self.capture_sgf = "(;GM[1]SZ[19];B[ba];W[aa];B[ab];W[ss];B[rs];W[sr];B[sq];W[ca])"
+
+    def test_matches_whole_board(self):
+        for sgf in [self.capture_sgf] + [_random_sgf(n) for n in (1, 60, 180)]:
+            boards = _replayed_boards(sgf)
+            features, slots = embeddings.whole_board_features(boards)
+            for pooling in embeddings.POOLINGS:
+                expected = embeddings.pool_corners(
+                    _fake_embed_features(features), slots, len(boards), pooling
+                )
+                actual = trajectory.game_trajectory(
+                    sgf, _fake_embed_features, pooling, batch_size=16
+                )
+                np.testing.assert_allclose(actual, expected, atol=1e-9)
+
+    def test_crops_only_when_changed(self):
+        crops, crop_of_corner = trajectory.trajectory_crops(self.capture_sgf)
+        self.assertEqual(crop_of_corner.shape, (8, 4))
+        # Stones go in the top-left and bottom-right corners only
+        self.assertTrue(np.all(crop_of_corner[:, 1:3] == trajectory.EMPTY))
+        # Each move makes one new crop, and the other corners keep theirs
+        self.assertTrue(np.all(crop_of_corner[3:7, 0] == crop_of_corner[2, 0]))
+        # Except that the bottom-right after move 5 repeats the top-left after move 2
+        self.assertEqual(len(crops), 7)
+        self.assertEqual(crop_of_corner[4, 3], crop_of_corner[1, 0])
+        self.assertEqual(crop_of_corner[2, 3], trajectory.EMPTY)
+        # The capture
+        np.testing.assert_array_equal(np.flatnonzero(crops[crop_of_corner[2, 0]]), [1, 11])
+
+    def test_no_moves(self):
+        result = trajectory.game_trajectory("(;GM[1]SZ[19])", _fake_embed_features)
+        self.assertEqual(result.shape, (0, 6))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,25 +1,53 @@
 """Computes Buhlmann credibility on some informationless embeddings."""
 
+import argparse
+import functools
+from typing import List, Optional
+
 from go_space import embeddings
 from go_space.validation import buhlmann
 
 
-if __name__ == "__main__":
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Scores the embeddings on the classes.")
+    parser.parse_args(argv)
+
     nn_embed = embeddings.NNEmbed()
 
     # We found that random scores drop quickly until ~40, then level out.
     for d in range(10, 110, 10):
         print("=================")
         print(f"Random embedding (dim {d}):")
-        print(buhlmann.computeBuhlmannOnClasses(embeddings.make_random_embedding(d)))
+        print(
+            buhlmann.computeBuhlmannOnClasses(
+                embeddings.make_random_embedding_batch(d), batched=True
+            )
+        )
         print()
 
     print("=================")
     print("Dumb embedding:")
-    print(buhlmann.computeBuhlmannOnClasses(embeddings.dumb_embedding))
+    print(
+        buhlmann.computeBuhlmannOnClasses(embeddings.dumb_embedding_batch, batched=True)
+    )
     print()
 
     print("==================")
     print("NN embedding:")
-    print(buhlmann.computeBuhlmannOnClasses(nn_embed.nn_embedding))
+    print(buhlmann.computeBuhlmannOnClasses(nn_embed.nn_embedding_batch, batched=True))
     print()
+
+    for pooling in embeddings.POOLINGS:
+        print("==================")
+        print(f"Whole-board NN embedding ({pooling}):")
+        print(
+            buhlmann.computeBuhlmannOnClasses(
+                functools.partial(nn_embed.whole_board_embedding_batch, pooling=pooling),
+                batched=True,
+            )
+        )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,14 @@
 
 Embeddings are score with Buhlmann credibility.  A smaller number is better."""
 
-import json
-import os
 from typing import List
 
 import attr
 import numpy as np
 
-from go_space import board_lib, consts
-from go_space.embeddings import Embedding
+from go_space import board_lib
+from go_space.embeddings import BatchEmbedding, Embedding
+from go_space.validation import class_loader
 
 
 @attr.s
@@ -20,26 +19,27 @@ class Moments(object):
 
 
 def _momentsFromPoints(points: List[np.ndarray]) -> Moments:
+    points = np.asarray(points)
     mean = np.average(points, axis=0)
-    var = 0
-    for point in points:
-        # Loop through dimensions
-        for i, di in enumerate(point):
-            var += (di - mean[i]) ** 2
-    var /= len(points)
+    # Summed over dimensions
+    var = np.sum((points - mean) ** 2) / len(points)
 
     return Moments(mean=mean, var=var)
 
 
-def classMoments(embedding: Embedding, clss: List[board_lib.BwBoardStr]) -> Moments:
+def classMoments(embedding: Embedding, boards: np.ndarray) -> Moments:
+    """boards is a board tensor, see board_lib.stack_boards."""
     points = list()
-    for brd in clss:
-        this_board = board_lib.boardFromBwBoardStr(brd)
-        points.append(embedding(this_board))
+    for brd in boards:
+        points.append(embedding(board_lib.Board.from_array(brd)))
 
     return _momentsFromPoints(points)
 
 
+def batchClassMoments(batch_embedding: BatchEmbedding, boards: np.ndarray) -> Moments:
+    return _momentsFromPoints(batch_embedding(boards))
+
+
 def buhlmannCredibility(moments: List[Moments]):
     epv = np.average([m.var for m in moments])
     vhm = _momentsFromPoints([m.mean for m in moments]).var
@@ -47,16 +47,20 @@ def buhlmannCredibility(moments: List[Moments]):
     return epv / vhm
 
 
-def computeBuhlmannOnClasses(embedding: Embedding):
-    """Loops through classes folder and calculates Buhlmann on these data"""
-    classes_folder = os.path.join(consts.TOP_LEVEL_PATH, "validation", "classes")
+def computeBuhlmannOnClasses(
+    embedding: Embedding,
+    batched: bool = False,
+    classes_folder: str = class_loader.CLASSES_FOLDER,
+):
+    """Calculates Buhlmann on the classes in classes_folder
+
+    If batched, then embedding is a BatchEmbedding, called once per class.
+    """
+    moments_func = batchClassMoments if batched else classMoments
+    classes = class_loader.load_classes(classes_folder)
 
     all_moments = list()
-    for file in os.listdir(classes_folder):
-        rel_path = os.path.join(classes_folder, file)
-        with open(rel_path, "r") as f:
-            raw_json = f.read()
-        clss = json.loads(raw_json)
-        all_moments.append(classMoments(embedding, clss["boards"]))
+    for _, boards in classes.iter_classes():
+        all_moments.append(moments_func(embedding, boards))
 
     return buhlmannCredibility(all_moments)
@@ -0,0 +1,48 @@
+"""Arrays computed from files, cached on disk until the files change.
+
+A cache file is an .npz of an array and its labels, along with a fingerprint of
+the files they were computed from (paths, sizes and mtimes).  The arrays are
+recomputed whenever the fingerprint changes.
+"""
+
+import hashlib
+import os
+from typing import Callable, Iterable, List, Tuple
+
+import numpy as np
+
+from go_space import consts
+
+
+CACHE_DIR = os.path.join(consts.TOP_LEVEL_PATH, "data", "_validation_cache")
+
+# An array with one row per example, and (n,) labels
+Labeled = Tuple[np.ndarray, np.ndarray]
+
+
+def fingerprint(paths: Iterable[str]) -> str:
+    """Changes if any of the files are added, removed or modified."""
+    h = hashlib.sha1()
+    for path in sorted(paths):
+        stat = os.stat(path)
+        h.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def cached(
+    name: str, sources: List[str], compute: Callable[[], Labeled], cache_dir: str = CACHE_DIR
+) -> Labeled:
+    """Returns compute(), from cache_dir/<name>.npz if sources haven't changed."""
+    path = os.path.join(cache_dir, f"{name}.npz")
+    key = fingerprint(sources)
+    if os.path.exists(path):
+        with np.load(path) as data:
+            if str(data["fingerprint"]) == key:
+                return data["values"], data["labels"]
+
+    values, labels = compute()
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, values=values, labels=labels, fingerprint=np.array(key))
+    os.replace(path + ".tmp", path)
+    return values, labels
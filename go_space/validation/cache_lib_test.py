@@ -0,0 +1,36 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from go_space.validation import cache_lib
+
+
+class CacheTest(unittest.TestCase):
+    def test_recomputes_when_sources_change(self):
+        calls = list()
+
+        def compute():
+            calls.append(1)
+            return np.full((2, 3), len(calls), dtype=np.float32), np.array(["x", "y"])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "source.json")
+            with open(source, "w") as f:
+                f.write("{}")
+            values, labels = cache_lib.cached("test", [source], compute, tmp)
+            again, _ = cache_lib.cached("test", [source], compute, tmp)
+            self.assertEqual(len(calls), 1)
+            np.testing.assert_array_equal(values, again)
+            self.assertEqual(labels.tolist(), ["x", "y"])
+
+            stat = os.stat(source)
+            os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            values, _ = cache_lib.cached("test", [source], compute, tmp)
+            self.assertEqual(len(calls), 2)
+            self.assertEqual(values[0, 0], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Loads the validation classes as one stacked board tensor, with labels.
+
+The class JSON files are parsed once, and the result cached until any of the
+files change.  See README.md in this folder for the file format.
+"""
+
+import json
+import os
+from typing import Iterator, List, Tuple
+
+import attr
+import numpy as np
+
+from go_space import board_lib, consts
+from go_space.validation import cache_lib
+
+
+CLASSES_FOLDER = os.path.join(consts.TOP_LEVEL_PATH, "validation", "classes")
+
+
+@attr.s
+class Classes(object):
+    # (n, SIZE, SIZE) board tensor, see board_lib.stack_boards
+    boards: np.ndarray = attr.ib()
+    # (n,) class names, grouped together in the order of names
+    labels: np.ndarray = attr.ib()
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def names(self) -> List[str]:
+        return list(dict.fromkeys(self.labels.tolist()))
+
+    def class_boards(self, name: str) -> np.ndarray:
+        return self.boards[self.labels == name]
+
+    def iter_classes(self) -> Iterator[Tuple[str, np.ndarray]]:
+        """Loops through (name, board tensor) for each class."""
+        for name in self.names:
+            yield name, self.class_boards(name)
+
+    def board(self, i: int) -> board_lib.Board:
+        return board_lib.Board.from_array(self.boards[i])
+
+
+def class_files(classes_folder: str = CLASSES_FOLDER) -> List[str]:
+    return sorted(
+        os.path.join(classes_folder, file)
+        for file in os.listdir(classes_folder)
+        if file.endswith(".json")
+    )
+
+
+def class_name(file: str) -> str:
+    return os.path.basename(file).split(".")[0]
+
+
+def _parse_classes(files: List[str]) -> cache_lib.Labeled:
+    boards, labels = list(), list()
+    for file in files:
+        with open(file, "r") as f:
+            clss = json.load(f)
+        for brd in clss["boards"]:
+            boards.append(board_lib.boardFromBwBoardStr(brd).to_array())
+            labels.append(class_name(file))
+    return np.stack(boards, axis=0), np.array(labels)
+
+
+def load_classes(
+    classes_folder: str = CLASSES_FOLDER, cache_dir: str = cache_lib.CACHE_DIR
+) -> Classes:
+    files = class_files(classes_folder)
+    boards, labels = cache_lib.cached(
+        "class_boards", files, lambda: _parse_classes(files), cache_dir
+    )
+    return Classes(boards=boards, labels=labels)
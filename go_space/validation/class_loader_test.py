@@ -0,0 +1,37 @@
+import json
+import tempfile
+import unittest
+
+from go_space import board_lib
+from go_space.validation import class_loader
+
+
+class ClassLoaderTest(unittest.TestCase):
+    def test_matches_class_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            classes = class_loader.load_classes(cache_dir=tmp)
+            # Second load comes from the cache
+            cached = class_loader.load_classes(cache_dir=tmp)
+
+        files = class_loader.class_files()
+        self.assertEqual(classes.names, [class_loader.class_name(f) for f in files])
+
+        i = 0
+        for file in files:
+            with open(file, "r") as f:
+                boards = json.load(f)["boards"]
+            name = class_loader.class_name(file)
+            self.assertEqual(len(classes.class_boards(name)), len(boards))
+            for brd in boards:
+                expected = board_lib.boardFromBwBoardStr(brd)
+                self.assertEqual(classes.labels[i], name)
+                self.assertEqual(cached.board(i).ascii_board(), expected.ascii_board())
+                self.assertEqual(
+                    sorted(classes.board(i).stones(), key=str), sorted(expected.stones(), key=str)
+                )
+                i += 1
+        self.assertEqual(len(classes), i)
+
+
+if __name__ == "__main__":
+    unittest.main()
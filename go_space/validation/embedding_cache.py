@@ -0,0 +1,50 @@
+"""Embeddings of the validation classes and the tseumego corpus, cached on disk.
+
+See cache_lib for when the caches are recomputed.
+"""
+
+import os
+import pickle
+
+import numpy as np
+
+from go_space import build_tseumego, embeddings
+from go_space.nn import numpy_model
+from go_space.validation import cache_lib, class_loader
+
+
+def class_embeddings(
+    model_path: str = numpy_model.NPZ_MODEL_PATH,
+    classes_folder: str = class_loader.CLASSES_FOLDER,
+    cache_dir: str = cache_lib.CACHE_DIR,
+) -> cache_lib.Labeled:
+    """NN embeddings of the class boards, labeled by class name."""
+
+    def compute() -> cache_lib.Labeled:
+        classes = class_loader.load_classes(classes_folder, cache_dir)
+        nn_embed = embeddings.NNEmbed(model_path)
+        return nn_embed.nn_embedding_batch(classes.boards), classes.labels
+
+    sources = class_loader.class_files(classes_folder) + [model_path]
+    return cache_lib.cached("class_embeddings", sources, compute, cache_dir)
+
+
+def corpus_embeddings(
+    chunk_dir: str = build_tseumego.OUTPUT_PATH, cache_dir: str = cache_lib.CACHE_DIR
+) -> cache_lib.Labeled:
+    """Embeddings written by build-tseumego, labeled by the problem's folder.
+
+    Reads one chunk at a time, and keeps only the embeddings.
+    """
+    chunks = build_tseumego.chunk_files(chunk_dir)
+
+    def compute() -> cache_lib.Labeled:
+        vectors, labels = list(), list()
+        for chunk in chunks:
+            with open(chunk, "rb") as f:
+                tseumegos = pickle.load(f)
+            vectors.append(np.stack([t.embedding for t in tseumegos], axis=0))
+            labels.extend(os.path.basename(os.path.dirname(t.file_name)) for t in tseumegos)
+        return np.concatenate(vectors, axis=0), np.array(labels)
+
+    return cache_lib.cached("corpus_embeddings", chunks, compute, cache_dir)
@@ -0,0 +1,34 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from go_space import build_tseumego, go_types
+from go_space.go_types import tseumego_lib
+from go_space.validation import embedding_cache
+
+
+class EmbeddingCacheTest(unittest.TestCase):
+    def test_corpus_embeddings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = build_tseumego.ChunkWriter(os.path.join(tmp, "chunks"), chunk_size=2)
+            for i in range(5):
+                writer.add(
+                    tseumego_lib.Tseumego(
+                        file_name=os.path.join("problems", f"level{i % 2}", f"{i}.json"),
+                        grid=go_types.Grid(),
+                        embedding=np.full(4, i, dtype=np.float32),
+                    )
+                )
+            writer.close()
+
+            vectors, labels = embedding_cache.corpus_embeddings(
+                os.path.join(tmp, "chunks"), cache_dir=os.path.join(tmp, "cache")
+            )
+            np.testing.assert_array_equal(vectors[:, 0], np.arange(5))
+            self.assertEqual(labels.tolist(), ["level0", "level1", "level0", "level1", "level0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,49 +1,100 @@
+"""Interactively browse tseumego problems by nearest neighbor in the embedding.
+
+Run with `python -m go_space nearest-neighbor`.  Searches an EmbeddingStore, at
+the precision chosen with --precision, and reports its recall against exact
+search on start-up.  After that, only the store and the problems' grids are kept
+in memory, and a problem's neighbors are found from its stored vector.
+"""
+
+import argparse
 import os
 import pickle
 import random
+from typing import List, Optional, Tuple
 
 import numpy as np
 
-from go_space import consts
+from go_space import build_tseumego, embedding_store
+from go_space.go_types import grid_lib
 # TODO: Better way to do this.
 # Needed for the pickle.
 from go_space.go_types.tseumego_lib import Tseumego
 
 
-with open(
-    os.path.join(consts.TOP_LEVEL_PATH, "data", "_pickled_tseumego", "basics.pickle"),
-    "rb",
-) as f:
-    tseumegos = pickle.load(f)
-num = len(tseumegos)
-
-similarity = np.zeros([num, num])
-for i in range(num):
-    for j in range(num):
-        xi, xj = tseumegos[i].embedding, tseumegos[j].embedding
-        similarity[i, j] = np.dot(xi, xj) / np.sqrt(np.dot(xi, xi) * np.dot(xj, xj))
-
-action = "d"
-while action != "e":
-    if action == "d":
-        ind = random.randrange(num)
-        grid = tseumegos[ind].grid
-    if action == "n":
-        best_score = -1
-        best_i = None
-        for i in range(num):
-            if i == ind:
-                continue
-            if similarity[i, ind] > best_score:
-                best_score = similarity[i, ind]
-                best_i = i
-        ind = best_i
-        grid = tseumegos[ind].grid
-
-    print(grid.ascii_board())
-
-    print("Type 'd' for new board, 'n' for neighbor, or 'e' to exit.")
-    action = input()
-
-print("")
-print("Good bye")
+PICKLE_PATH = build_tseumego.OUTPUT_PATH
+
+
+def load_corpus(path: str = PICKLE_PATH) -> Tuple[List[grid_lib.Grid], np.ndarray]:
+    """The grids and (n, dim) embeddings of the problems written by build-tseumego.
+
+    Reads the chunks one at a time, or a single pickled list.
+    """
+    if os.path.isdir(path):
+        files = build_tseumego.chunk_files(path)
+    else:
+        files = [path]
+    grids, vectors = list(), list()
+    for file in files:
+        with open(file, "rb") as f:
+            tseumegos: List[Tseumego] = pickle.load(f)
+        grids.extend(t.grid for t in tseumegos)
+        vectors.append(np.stack([t.embedding for t in tseumegos], axis=0))
+    return grids, np.concatenate(vectors, axis=0)
+
+
+def build_store(
+    vectors: np.ndarray, precision: embedding_store.Precision, rerank: int = 0
+) -> embedding_store.EmbeddingStore:
+    return embedding_store.EmbeddingStore.from_vectors(
+        vectors, precision, keep_originals=rerank > 0
+    )
+
+
+def browse(
+    grids: List[grid_lib.Grid], store: embedding_store.EmbeddingStore, rerank: int = 0
+) -> None:
+    num = len(grids)
+
+    action = "d"
+    while action != "e":
+        if action == "d":
+            ind = random.randrange(num)
+        if action == "n":
+            neighbors, _ = store.search(store.vector(ind), 1, rerank=rerank, exclude=ind)
+            ind = int(neighbors[0])
+        grid = grids[ind]
+
+        print(grid.ascii_board())
+
+        print("Type 'd' for new board, 'n' for neighbor, or 'e' to exit.")
+        action = input()
+
+    print("")
+    print("Good bye")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Browses tseumego by nearest neighbor.")
+    parser.add_argument("--pickle_path", type=str, default=PICKLE_PATH)
+    parser.add_argument(
+        "--precision",
+        choices=[p.value for p in embedding_store.Precision],
+        default=embedding_store.Precision.INT8.value,
+    )
+    parser.add_argument(
+        "--rerank", type=int, default=0, help="Re-rank this many candidates in float32"
+    )
+    args = parser.parse_args(argv)
+
+    grids, vectors = load_corpus(args.pickle_path)
+    store = build_store(vectors, embedding_store.Precision(args.precision), args.rerank)
+    sample = vectors[np.random.default_rng(0).permutation(len(vectors))[:100]]
+    recall = embedding_store.recall_at_k(store, vectors, sample, 10, rerank=args.rerank)
+    print(f"{args.precision}: {store.nbytes()} bytes, recall@10 {recall:.3f}")
+    # Only the store is searched from here on.
+    del vectors
+    browse(grids, store, args.rerank)
+
+
+if __name__ == "__main__":
+    main()
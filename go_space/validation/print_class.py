@@ -1,30 +1,32 @@
 """Prints all the boards in a class.  Used for debugging."""
 
-import json
-import os
-
 import argparse
+from typing import List, Optional
 
-from go_space import board_lib
-import consts
+import numpy as np
 
+from go_space import exceptions
+from go_space.validation import class_loader
 
-if __name__ == "__main__":
+
+def main(argv: Optional[List[str]] = None) -> None:
     parser = argparse.ArgumentParser(description="Prints all the boards in a class.")
     parser.add_argument(
         "name", type=str, help="Filename without .json (e.g. make-eyes)"
     )
-    args = parser.parse_args()
-
-    rel_path = os.path.join(
-        consts.TOP_LEVEL_PATH, "validation", "classes", f"{args.name}.json"
-    )
+    args = parser.parse_args(argv)
 
-    with open(rel_path, "r") as f:
-        raw_json = f.read()
+    classes = class_loader.load_classes()
+    if args.name not in classes.names:
+        raise exceptions.DataException(
+            f"No class named {args.name}.  Classes are: {', '.join(classes.names)}"
+        )
 
-    all_boards = json.loads(raw_json)
-    for b in all_boards["boards"]:
-        print(board_lib.boardFromBwBoardStr(b).ascii_board())
+    for i in np.flatnonzero(classes.labels == args.name):
+        print(classes.board(i).ascii_board())
         print()
         print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Plots a 2-D projection (t-SNE or UMAP) of cached embeddings.
+
+Run with `python -m go_space project --source classes` (or `--source corpus`
+for the embeddings written by build-tseumego).  Large corpora are subsampled
+evenly across labels, and reduced with PCA before the projection.
+
+The projection and plotting libraries are imported inside the functions, so
+that importing this module is cheap.
+"""
+
+import argparse
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from go_space.validation import embedding_cache
+
+
+PCA_DIM = 50
+MAX_POINTS = 20000
+
+
+def pca(vectors: np.ndarray, dim: int) -> np.ndarray:
+    """Projects onto the top dim principal components."""
+    centered = vectors - vectors.mean(axis=0)
+    if centered.shape[1] <= dim:
+        return centered
+    # Right singular vectors are the principal directions
+    _, _, vt = np.linalg.svd(centered, full_matrices=False)
+    return centered @ vt[:dim].T
+
+
+def stratified_sample(labels: np.ndarray, max_points: int, seed: int = 0) -> np.ndarray:
+    """Indices of at most about max_points rows, with each label kept in proportion.
+
+    Every label keeps at least one row.
+    """
+    if len(labels) <= max_points:
+        return np.arange(len(labels))
+    rng = np.random.default_rng(seed)
+    keep = list()
+    for label in np.unique(labels):
+        rows = np.flatnonzero(labels == label)
+        num = max(1, int(round(max_points * len(rows) / len(labels))))
+        keep.append(rng.choice(rows, size=num, replace=False))
+    return np.sort(np.concatenate(keep))
+
+
+def project(vectors: np.ndarray, method: str, threads: int, seed: int = 0) -> np.ndarray:
+    if method == "tsne":
+        from sklearn.manifold import TSNE
+
+        return TSNE(2, n_jobs=threads, random_state=seed).fit_transform(vectors)
+    if method == "umap":
+        try:
+            import umap
+        except ImportError:
+            raise ImportError("UMAP projection needs umap-learn: pip install umap-learn")
+        return umap.UMAP(n_components=2, n_jobs=threads, random_state=seed).fit_transform(
+            vectors
+        )
+    raise ValueError(f"Unknown projection method {method}")
+
+
+def load(source: str) -> Tuple[np.ndarray, np.ndarray]:
+    if source == "classes":
+        return embedding_cache.class_embeddings()
+    return embedding_cache.corpus_embeddings()
+
+
+def plot(projected: np.ndarray, labels: np.ndarray, output: str) -> None:
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import seaborn as sns
+
+    projected_df = pd.DataFrame({"x": projected[:, 0], "y": projected[:, 1], "label": labels})
+    fig, ax = plt.subplots(1)
+    sns.scatterplot(x="x", y="y", hue="label", data=projected_df)
+    margin = 0.05 * (projected.max() - projected.min())
+    lim = (projected.min() - margin, projected.max() + margin)
+    ax.set_xlim(lim)
+    ax.set_ylim(lim)
+    ax.set_aspect("equal")
+    ax.legend(bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.0)
+
+    plt.savefig(output)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Plots a 2-D projection of the embeddings.")
+    parser.add_argument("--source", choices=["classes", "corpus"], default="classes")
+    parser.add_argument("--method", choices=["tsne", "umap"], default="tsne")
+    parser.add_argument(
+        "--pca_dim", type=int, default=PCA_DIM, help="Reduce to this many dimensions, 0 to skip"
+    )
+    parser.add_argument(
+        "--max_points", type=int, default=MAX_POINTS, help="Subsample to about this many points"
+    )
+    parser.add_argument("--threads", type=int, default=-1, help="-1 for all cores")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="Defaults to <method>.png")
+    args = parser.parse_args(argv)
+
+    vectors, labels = load(args.source)
+    rows = stratified_sample(labels, args.max_points, args.seed)
+    vectors, labels = vectors[rows], labels[rows]
+    print(f"Projecting {len(rows)} points")
+
+    if args.pca_dim:
+        vectors = pca(vectors, args.pca_dim)
+    projected = project(vectors, args.method, args.threads, args.seed)
+    plot(projected, labels, args.output or f"{args.method}.png")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import unittest
+
+import numpy as np
+
+from go_space.validation import projection
+
+
+class ProjectionTest(unittest.TestCase):
+    def test_pca_keeps_variance(self):
+        rng = np.random.default_rng(0)
+        # 3 real dimensions, embedded in 10
+        vectors = rng.normal(size=(200, 3)) @ rng.normal(size=(3, 10))
+        reduced = projection.pca(vectors, 3)
+        self.assertEqual(reduced.shape, (200, 3))
+        centered = vectors - vectors.mean(axis=0)
+        # Distances are unchanged
+        np.testing.assert_allclose(
+            np.linalg.norm(reduced[:, np.newaxis] - reduced, axis=-1),
+            np.linalg.norm(centered[:, np.newaxis] - centered, axis=-1),
+            atol=1e-8,
+        )
+
+    def test_stratified_sample(self):
+        labels = np.array(["a"] * 900 + ["b"] * 98 + ["c"] * 2)
+        rows = projection.stratified_sample(labels, 100)
+        self.assertEqual(len(set(rows.tolist())), len(rows))
+        counts = {label: int(np.sum(labels[rows] == label)) for label in "abc"}
+        self.assertEqual(counts, {"a": 90, "b": 10, "c": 1})
+
+        np.testing.assert_array_equal(projection.stratified_sample(labels, 1000), np.arange(1000))
+
+
+if __name__ == "__main__":
+    unittest.main()
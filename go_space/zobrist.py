@@ -0,0 +1,36 @@
+"""Zobrist hashes of board tensors.
+
+A board tensor is an integer array of shape (..., size, size) holding
+Player values, with 0 for an empty point.  The hash of a position is the XOR of
+one fixed random 64-bit number per (point, player), so it's stable across runs
+and processes, unlike Python's hash of a string.
+"""
+
+import functools
+
+import numpy as np
+
+from go_space import go_types
+
+
+SEED = 19
+
+
+@functools.lru_cache(maxsize=None)
+def _table(size: int) -> np.ndarray:
+    """One row per Player value; row 0 (empty) is all zeros."""
+    rng = np.random.default_rng(SEED)
+    num_values = max(p.value for p in go_types.Player) + 1
+    result = rng.integers(
+        0, np.iinfo(np.uint64).max, size=(num_values, size * size), dtype=np.uint64, endpoint=True
+    )
+    result[0] = 0
+    return result
+
+
+def hash_boards(boards: np.ndarray) -> np.ndarray:
+    """Hashes an (n, size, size) board tensor to an (n,) uint64 array."""
+    n, size = boards.shape[0], boards.shape[-1]
+    flat = boards.reshape(n, size * size).astype(np.intp)
+    values = _table(size)[flat, np.arange(size * size)]
+    return np.bitwise_xor.reduce(values, axis=1)
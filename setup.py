@@ -1,4 +1,4 @@
-from setuptools import setup
+from setuptools import find_packages, setup
 
 setup(
     name="go_space",
@@ -7,5 +7,6 @@ setup(
         ...
     """,
     author="T.J. Gaffney",
-    packages=["go_space"],
+    packages=find_packages(),
+    entry_points={"console_scripts": ["go-space=go_space.__main__:main"]},
 )